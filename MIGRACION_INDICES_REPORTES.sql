@@ -0,0 +1,46 @@
+-- Script de migración - Índices para las queries de ia_reportes
+-- Ejecutar este script (con psql, fuera de una transacción: usa CREATE INDEX CONCURRENTLY)
+-- Verificar su uso con: python ia_reportes/analizar_planes.py
+
+-- PEDIDO: todos los reportes de ventas/clientes filtran por rango de FECHA_PEDIDO.
+-- Índice cubriente para que el filtro + join se resuelvan con index-only scan
+CREATE INDEX CONCURRENTLY IF NOT EXISTS IDX_PEDIDO_FECHA
+ON PEDIDO(FECHA_PEDIDO) INCLUDE (ID, CI_CLIENTE, TOTAL);
+
+-- PEDIDO_PRODUCTO: la PK empieza por ID_PRODUCTO, así que no sirve para el join por ID_PEDIDO
+CREATE INDEX CONCURRENTLY IF NOT EXISTS IDX_PEDIDO_PRODUCTO_PEDIDO
+ON PEDIDO_PRODUCTO(ID_PEDIDO) INCLUDE (ID_PRODUCTO, CANTIDAD, PRECIO, TOTAL);
+
+-- PRODUCTO: join con CATEGORIA en ventas por categoría e inventario
+CREATE INDEX CONCURRENTLY IF NOT EXISTS IDX_PRODUCTO_CATEGORIA
+ON PRODUCTO(ID_CATEGORIA);
+
+-- PRODUCCION: se registra en orden de fecha, un BRIN ocupa unas pocas páginas
+CREATE INDEX CONCURRENTLY IF NOT EXISTS IDX_PRODUCCION_FECHA
+ON PRODUCCION USING BRIN(FECHA);
+
+-- NOTA_COMPRA: reporte de compras por rango de FECHA_PEDIDO
+CREATE INDEX CONCURRENTLY IF NOT EXISTS IDX_NOTA_COMPRA_FECHA
+ON NOTA_COMPRA(FECHA_PEDIDO);
+
+-- Estadísticas actualizadas para que el planificador considere los índices nuevos
+ANALYZE PEDIDO;
+ANALYZE PEDIDO_PRODUCTO;
+ANALYZE PRODUCTO;
+ANALYZE PRODUCCION;
+ANALYZE NOTA_COMPRA;
+
+-- Opcional (discos SSD / BD en memoria): con el valor por defecto 4.0 el planificador
+-- prefiere recorrer PEDIDO_PRODUCTO completo en reportes de un mes o más
+-- ALTER DATABASE PANADERIA SET RANDOM_PAGE_COST = 1.1;
+
+-- Verificar que los índices fueron creados y son válidos
+SELECT c.relname AS indice, t.relname AS tabla, i.indisvalid AS valido,
+	pg_size_pretty(pg_relation_size(c.oid)) AS tamanio
+FROM pg_index i
+JOIN pg_class c ON c.oid = i.indexrelid
+JOIN pg_class t ON t.oid = i.indrelid
+WHERE c.relname IN (
+	'idx_pedido_fecha', 'idx_pedido_producto_pedido', 'idx_producto_categoria',
+	'idx_produccion_fecha', 'idx_nota_compra_fecha'
+);
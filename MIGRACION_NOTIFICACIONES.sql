@@ -0,0 +1,74 @@
+-- Script de migración - Notificaciones de cambios para la cache de ia_reportes
+-- Ejecutar este script para que ia_reportes invalide su cache al momento en que cambian
+-- los datos (LISTEN REPORTES_CAMBIOS), en lugar de esperar a que expire el TTL
+
+-- Payload: {"tabla": "PEDIDO", "fecha": "2025-01-31"}; fecha es null en las tablas sin fecha
+-- (PRODUCTO, INSUMO). Postgres entrega una sola vez las notificaciones con el mismo payload
+-- dentro de una transacción, así que una carga masiva produce una por tabla y día
+CREATE OR REPLACE FUNCTION NOTIFICAR_CAMBIO_REPORTES() RETURNS TRIGGER AS $$
+DECLARE
+	FECHAS DATE[];
+	F DATE;
+BEGIN
+	IF TG_TABLE_NAME = 'pedido' THEN
+		FECHAS := ARRAY[
+			CASE WHEN TG_OP IN ('UPDATE', 'DELETE') THEN OLD.FECHA_PEDIDO END,
+			CASE WHEN TG_OP IN ('INSERT', 'UPDATE') THEN NEW.FECHA_PEDIDO END
+		];
+	ELSIF TG_TABLE_NAME = 'pedido_producto' THEN
+		FECHAS := ARRAY(
+			SELECT FECHA_PEDIDO FROM PEDIDO
+			WHERE ID IN (
+				CASE WHEN TG_OP IN ('UPDATE', 'DELETE') THEN OLD.ID_PEDIDO END,
+				CASE WHEN TG_OP IN ('INSERT', 'UPDATE') THEN NEW.ID_PEDIDO END
+			)
+		);
+	ELSIF TG_TABLE_NAME = 'produccion' THEN
+		FECHAS := ARRAY[
+			CASE WHEN TG_OP IN ('UPDATE', 'DELETE') THEN OLD.FECHA END,
+			CASE WHEN TG_OP IN ('INSERT', 'UPDATE') THEN NEW.FECHA END
+		];
+	ELSE
+		-- Sin fecha: se invalidan todas las entradas que leen la tabla
+		PERFORM PG_NOTIFY('reportes_cambios', JSON_BUILD_OBJECT('tabla', UPPER(TG_TABLE_NAME), 'fecha', NULL)::TEXT);
+		RETURN NULL;
+	END IF;
+
+	FOREACH F IN ARRAY FECHAS LOOP
+		IF F IS NOT NULL THEN
+			PERFORM PG_NOTIFY('reportes_cambios', JSON_BUILD_OBJECT('tabla', UPPER(TG_TABLE_NAME), 'fecha', F)::TEXT);
+		END IF;
+	END LOOP;
+	RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS TRG_NOTIFICAR_PEDIDO ON PEDIDO;
+CREATE TRIGGER TRG_NOTIFICAR_PEDIDO
+AFTER INSERT OR UPDATE OR DELETE ON PEDIDO
+FOR EACH ROW EXECUTE FUNCTION NOTIFICAR_CAMBIO_REPORTES();
+
+DROP TRIGGER IF EXISTS TRG_NOTIFICAR_PEDIDO_PRODUCTO ON PEDIDO_PRODUCTO;
+CREATE TRIGGER TRG_NOTIFICAR_PEDIDO_PRODUCTO
+AFTER INSERT OR UPDATE OR DELETE ON PEDIDO_PRODUCTO
+FOR EACH ROW EXECUTE FUNCTION NOTIFICAR_CAMBIO_REPORTES();
+
+DROP TRIGGER IF EXISTS TRG_NOTIFICAR_PRODUCTO ON PRODUCTO;
+CREATE TRIGGER TRG_NOTIFICAR_PRODUCTO
+AFTER INSERT OR UPDATE OR DELETE ON PRODUCTO
+FOR EACH ROW EXECUTE FUNCTION NOTIFICAR_CAMBIO_REPORTES();
+
+DROP TRIGGER IF EXISTS TRG_NOTIFICAR_INSUMO ON INSUMO;
+CREATE TRIGGER TRG_NOTIFICAR_INSUMO
+AFTER INSERT OR UPDATE OR DELETE ON INSUMO
+FOR EACH ROW EXECUTE FUNCTION NOTIFICAR_CAMBIO_REPORTES();
+
+DROP TRIGGER IF EXISTS TRG_NOTIFICAR_PRODUCCION ON PRODUCCION;
+CREATE TRIGGER TRG_NOTIFICAR_PRODUCCION
+AFTER INSERT OR UPDATE OR DELETE ON PRODUCCION
+FOR EACH ROW EXECUTE FUNCTION NOTIFICAR_CAMBIO_REPORTES();
+
+-- Verificar que los triggers quedaron creados
+SELECT TGNAME AS TRIGGER, TGRELID::REGCLASS AS TABLA
+FROM PG_TRIGGER
+WHERE TGNAME LIKE 'trg_notificar_%';
@@ -0,0 +1,129 @@
+-- Script de migración - Rollup diario de ventas para ia_reportes
+-- Ejecutar este script para que los reportes VENTAS/CLIENTES puedan leer agregados diarios
+-- en lugar de recorrer PEDIDO/PEDIDO_PRODUCTO completos (ver REPORTES_USAR_ROLLUP)
+
+-- Ventas por día × producto × categoría × cliente
+CREATE TABLE IF NOT EXISTS VENTA_DIARIA(
+	FECHA DATE NOT NULL,
+	ID_PRODUCTO INT NOT NULL,
+	ID_CATEGORIA INT NOT NULL,
+	CI_CLIENTE VARCHAR(10) NOT NULL,
+	CANTIDAD INT NOT NULL,
+	TOTAL DECIMAL(14, 2) NOT NULL,
+	LINEAS INT NOT NULL,
+	SUMA_PRECIO DECIMAL(14, 2) NOT NULL,
+	PRIMARY KEY(FECHA, ID_PRODUCTO, ID_CATEGORIA, CI_CLIENTE)
+);
+
+-- Pedidos distintos por día × categoría × cliente (COUNT DISTINCT no es sumable desde VENTA_DIARIA)
+CREATE TABLE IF NOT EXISTS VENTA_DIARIA_CATEGORIA(
+	FECHA DATE NOT NULL,
+	ID_CATEGORIA INT NOT NULL,
+	CI_CLIENTE VARCHAR(10) NOT NULL,
+	PEDIDOS INT NOT NULL,
+	PRIMARY KEY(FECHA, ID_CATEGORIA, CI_CLIENTE)
+);
+
+-- Totales de PEDIDO por día × cliente
+CREATE TABLE IF NOT EXISTS PEDIDO_DIARIO(
+	FECHA DATE NOT NULL,
+	CI_CLIENTE VARCHAR(10) NOT NULL,
+	PEDIDOS INT NOT NULL,
+	TOTAL DECIMAL(14, 2) NOT NULL,
+	LINEAS INT NOT NULL,
+	PRIMARY KEY(FECHA, CI_CLIENTE)
+);
+
+-- Días modificados pendientes de recalcular (los consume el job de refresco)
+CREATE TABLE IF NOT EXISTS VENTA_DIARIA_CAMBIO(
+	ID BIGSERIAL PRIMARY KEY,
+	FECHA DATE NOT NULL,
+	REGISTRADO_EN TIMESTAMP NOT NULL DEFAULT CLOCK_TIMESTAMP()
+);
+
+CREATE INDEX IF NOT EXISTS IDX_VENTA_DIARIA_CAMBIO_FECHA ON VENTA_DIARIA_CAMBIO(FECHA);
+
+-- Marca de agua del último refresco
+CREATE TABLE IF NOT EXISTS ROLLUP_ESTADO(
+	NOMBRE VARCHAR(30) NOT NULL PRIMARY KEY,
+	MARCA TIMESTAMP NOT NULL,
+	ULTIMO_CAMBIO BIGINT NOT NULL DEFAULT 0,
+	DIAS_RECALCULADOS INT NOT NULL DEFAULT 0
+);
+
+-- Registrar los días tocados por cualquier escritura sobre ventas
+CREATE OR REPLACE FUNCTION REGISTRAR_CAMBIO_VENTA() RETURNS TRIGGER AS $$
+BEGIN
+	IF TG_TABLE_NAME = 'pedido' THEN
+		IF TG_OP IN ('UPDATE', 'DELETE') THEN
+			INSERT INTO VENTA_DIARIA_CAMBIO(FECHA) VALUES (OLD.FECHA_PEDIDO);
+		END IF;
+		IF TG_OP IN ('INSERT', 'UPDATE') THEN
+			INSERT INTO VENTA_DIARIA_CAMBIO(FECHA) VALUES (NEW.FECHA_PEDIDO);
+		END IF;
+	ELSIF TG_TABLE_NAME = 'pedido_producto' THEN
+		IF TG_OP IN ('UPDATE', 'DELETE') THEN
+			INSERT INTO VENTA_DIARIA_CAMBIO(FECHA)
+			SELECT FECHA_PEDIDO FROM PEDIDO WHERE ID = OLD.ID_PEDIDO;
+		END IF;
+		IF TG_OP IN ('INSERT', 'UPDATE') THEN
+			INSERT INTO VENTA_DIARIA_CAMBIO(FECHA)
+			SELECT FECHA_PEDIDO FROM PEDIDO WHERE ID = NEW.ID_PEDIDO;
+		END IF;
+	ELSIF TG_TABLE_NAME = 'producto' THEN
+		-- Cambio de categoría: recalcular los días en que se vendió el producto
+		INSERT INTO VENTA_DIARIA_CAMBIO(FECHA)
+		SELECT DISTINCT FECHA FROM VENTA_DIARIA WHERE ID_PRODUCTO = NEW.ID;
+	END IF;
+	RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS TRG_CAMBIO_VENTA_PEDIDO ON PEDIDO;
+CREATE TRIGGER TRG_CAMBIO_VENTA_PEDIDO
+AFTER INSERT OR UPDATE OF FECHA_PEDIDO, TOTAL, CI_CLIENTE OR DELETE ON PEDIDO
+FOR EACH ROW EXECUTE FUNCTION REGISTRAR_CAMBIO_VENTA();
+
+DROP TRIGGER IF EXISTS TRG_CAMBIO_VENTA_PEDIDO_PRODUCTO ON PEDIDO_PRODUCTO;
+CREATE TRIGGER TRG_CAMBIO_VENTA_PEDIDO_PRODUCTO
+AFTER INSERT OR UPDATE OR DELETE ON PEDIDO_PRODUCTO
+FOR EACH ROW EXECUTE FUNCTION REGISTRAR_CAMBIO_VENTA();
+
+DROP TRIGGER IF EXISTS TRG_CAMBIO_VENTA_PRODUCTO ON PRODUCTO;
+CREATE TRIGGER TRG_CAMBIO_VENTA_PRODUCTO
+AFTER UPDATE OF ID_CATEGORIA ON PRODUCTO
+FOR EACH ROW EXECUTE FUNCTION REGISTRAR_CAMBIO_VENTA();
+
+-- Carga inicial completa
+TRUNCATE VENTA_DIARIA, VENTA_DIARIA_CATEGORIA, PEDIDO_DIARIO, VENTA_DIARIA_CAMBIO;
+
+INSERT INTO VENTA_DIARIA(FECHA, ID_PRODUCTO, ID_CATEGORIA, CI_CLIENTE, CANTIDAD, TOTAL, LINEAS, SUMA_PRECIO)
+SELECT P.FECHA_PEDIDO, PP.ID_PRODUCTO, PR.ID_CATEGORIA, P.CI_CLIENTE,
+	SUM(PP.CANTIDAD), SUM(PP.TOTAL), COUNT(*), SUM(PP.PRECIO)
+FROM PEDIDO P
+JOIN PEDIDO_PRODUCTO PP ON P.ID = PP.ID_PEDIDO
+JOIN PRODUCTO PR ON PP.ID_PRODUCTO = PR.ID
+GROUP BY P.FECHA_PEDIDO, PP.ID_PRODUCTO, PR.ID_CATEGORIA, P.CI_CLIENTE;
+
+INSERT INTO VENTA_DIARIA_CATEGORIA(FECHA, ID_CATEGORIA, CI_CLIENTE, PEDIDOS)
+SELECT P.FECHA_PEDIDO, PR.ID_CATEGORIA, P.CI_CLIENTE, COUNT(DISTINCT P.ID)
+FROM PEDIDO P
+JOIN PEDIDO_PRODUCTO PP ON P.ID = PP.ID_PEDIDO
+JOIN PRODUCTO PR ON PP.ID_PRODUCTO = PR.ID
+GROUP BY P.FECHA_PEDIDO, PR.ID_CATEGORIA, P.CI_CLIENTE;
+
+INSERT INTO PEDIDO_DIARIO(FECHA, CI_CLIENTE, PEDIDOS, TOTAL, LINEAS)
+SELECT P.FECHA_PEDIDO, P.CI_CLIENTE, COUNT(*), SUM(P.TOTAL),
+	SUM((SELECT COUNT(*) FROM PEDIDO_PRODUCTO PP WHERE PP.ID_PEDIDO = P.ID))
+FROM PEDIDO P
+GROUP BY P.FECHA_PEDIDO, P.CI_CLIENTE;
+
+INSERT INTO ROLLUP_ESTADO(NOMBRE, MARCA) VALUES ('VENTA_DIARIA', CLOCK_TIMESTAMP())
+ON CONFLICT (NOMBRE) DO UPDATE SET MARCA = EXCLUDED.MARCA, ULTIMO_CAMBIO = 0, DIAS_RECALCULADOS = 0;
+
+-- Verificar que el rollup cuadra con las tablas originales
+SELECT
+	(SELECT SUM(TOTAL) FROM PEDIDO_PRODUCTO) AS TOTAL_LINEAS,
+	(SELECT SUM(TOTAL) FROM VENTA_DIARIA) AS TOTAL_ROLLUP,
+	(SELECT COUNT(*) FROM PEDIDO) AS PEDIDOS,
+	(SELECT SUM(PEDIDOS) FROM PEDIDO_DIARIO) AS PEDIDOS_ROLLUP;
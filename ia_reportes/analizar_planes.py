@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Analiza los planes de ejecución de las queries de DatabaseService
+
+Ejecuta EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) para cada query de reportes y
+reporta seq scans sobre tablas grandes, índices usados y errores de estimación
+de filas del planificador. Sirve para comprobar MIGRACION_INDICES_REPORTES.sql.
+
+Uso:
+    python analizar_planes.py --desde 2024-01-01 --hasta 2024-03-31
+    python analizar_planes.py --generar-pedidos 1000000   # SOLO en una BD de prueba
+"""
+
+import sys
+import os
+import json
+import argparse
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from src.services.database_service import DatabaseService
+
+# (método de DatabaseService, recibe rango de fechas)
+CONSULTAS = [
+    ('get_ventas_data', True),
+    ('get_ventas_por_categoria', True),
+    ('get_productos_mas_vendidos', True),
+    ('get_ventas_agregado', True),
+    ('get_clientes_datos', True),
+    ('get_inventario_datos', False),
+    ('get_productos_stock', False),
+    ('get_produccion_datos', True),
+    ('get_compras_datos', True),
+]
+
+# Pedidos repartidos en orden de fecha (como llegan en producción) sobre los catálogos existentes
+SQL_DATOS_SINTETICOS = """
+WITH catalogo AS (
+    SELECT ARRAY(SELECT ci FROM CLIENTE ORDER BY ci) as clientes
+)
+INSERT INTO PEDIDO(FECHA_PEDIDO, PAGADO, FECHA_ENTREGA, TIPO, TOTAL, CI_CLIENTE, ENTREGADO)
+SELECT
+    CURRENT_DATE - %(dias)s + (g::bigint * %(dias)s / %(pedidos)s)::int,
+    TRUE,
+    CURRENT_DATE - %(dias)s + (g::bigint * %(dias)s / %(pedidos)s)::int,
+    'LOCAL',
+    0,
+    clientes[1 + g %% array_length(clientes, 1)],
+    TRUE
+FROM catalogo, generate_series(1, %(pedidos)s) g;
+
+WITH catalogo AS (
+    SELECT ARRAY(SELECT id FROM PRODUCTO ORDER BY id) as productos
+)
+INSERT INTO PEDIDO_PRODUCTO(ID_PRODUCTO, ID_PEDIDO, CANTIDAD, PRECIO, TOTAL)
+SELECT pr.id, l.id_pedido, l.cantidad, pr.precio, pr.precio * l.cantidad
+FROM (
+    SELECT
+        p.id as id_pedido,
+        productos[1 + (p.id * 7 + j * 11) %% array_length(productos, 1)] as id_producto,
+        1 + (p.id + j) %% 5 as cantidad
+    FROM catalogo, PEDIDO p, generate_series(0, 2) j
+    WHERE p.id > %(id_inicial)s AND j <= p.id %% 3
+) l
+JOIN PRODUCTO pr ON pr.id = l.id_producto
+ON CONFLICT DO NOTHING;
+
+UPDATE PEDIDO p SET TOTAL = s.total
+FROM (
+    SELECT id_pedido, SUM(total) as total
+    FROM PEDIDO_PRODUCTO
+    WHERE id_pedido > %(id_inicial)s
+    GROUP BY id_pedido
+) s
+WHERE p.id = s.id_pedido;
+
+WITH catalogo AS (
+    SELECT ARRAY(SELECT id FROM RECETA ORDER BY id) as recetas
+)
+INSERT INTO PRODUCCION(DESCRIPCION, FECHA, HORA_INICIO, TERMINADO, ID_RECETA)
+SELECT 'Producción sintética', CURRENT_DATE - %(dias)s + (g::bigint * %(dias)s / (%(pedidos)s / 50 + 1))::int,
+    TIME '06:00', TRUE, recetas[1 + g %% array_length(recetas, 1)]
+FROM catalogo, generate_series(1, %(pedidos)s / 50) g;
+
+WITH catalogo AS (
+    SELECT
+        ARRAY(SELECT id FROM USUARIO ORDER BY id) as usuarios,
+        ARRAY(SELECT codigo FROM PROVEEDOR ORDER BY codigo) as proveedores
+)
+INSERT INTO NOTA_COMPRA(FECHA_PEDIDO, FECHA_ENTREGA, ID_USUARIO, CODIGO_PROVEEDOR)
+SELECT
+    CURRENT_DATE - %(dias)s + (g::bigint * %(dias)s / (%(pedidos)s / 200 + 1))::int,
+    CURRENT_DATE - %(dias)s + (g::bigint * %(dias)s / (%(pedidos)s / 200 + 1))::int + 2,
+    usuarios[1 + g %% array_length(usuarios, 1)],
+    proveedores[1 + g %% array_length(proveedores, 1)]
+FROM catalogo, generate_series(1, %(pedidos)s / 200) g;
+
+WITH catalogo AS (
+    SELECT ARRAY(SELECT id FROM INSUMO ORDER BY id) as insumos
+)
+INSERT INTO COMPRA_INSUMO(ID_INSUMO, ID_NOTA_COMPRA, CANTIDAD, PRECIO, TOTAL)
+SELECT insumos[1 + (nc.id * 3 + j) %% array_length(insumos, 1)], nc.id, 10, 5.50, 55.00
+FROM catalogo, NOTA_COMPRA nc, generate_series(0, 1) j
+WHERE nc.id > %(nota_inicial)s
+ON CONFLICT DO NOTHING;
+"""
+
+class ExplainDatabaseService(DatabaseService):
+    """DatabaseService que, en lugar de devolver filas, guarda el plan de cada query"""
+
+    def __init__(self):
+        super().__init__()
+        # Medir siempre contra la BD
+        self.cache = None
+        self.registry.habilitado = False
+        self.planes = []
+
+    def execute_query(self, query: str, params=None, usar_cache: bool = True, nombre: str = None):
+        """Ejecuta EXPLAIN (ANALYZE, BUFFERS) de la query y retorna una lista vacía"""
+        with self._cursor(cursor_factory=None) as cursor:
+            cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {query}", params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        self.planes.append((nombre or 'sin_nombre', plan[0]))
+        return []
+
+def recorrer(nodo):
+    """Itera todos los nodos de un plan"""
+    yield nodo
+    for hijo in nodo.get('Plans', []):
+        yield from recorrer(hijo)
+
+def analizar_plan(plan: dict, min_filas: int, factor_error: float) -> dict:
+    """Extrae seq scans, índices usados y errores de estimación de un plan JSON"""
+    raiz = plan['Plan']
+    seq_scans = []
+    errores = []
+    indices = set()
+
+    for nodo in recorrer(raiz):
+        loops = nodo.get('Actual Loops', 0)
+        reales = nodo.get('Actual Rows', 0)
+
+        if nodo['Node Type'] == 'Seq Scan':
+            leidas = (reales + nodo.get('Rows Removed by Filter', 0)) * max(loops, 1)
+            seq_scans.append({
+                'tabla': nodo.get('Relation Name'),
+                'filas_leidas': leidas,
+                'relevante': leidas >= min_filas
+            })
+
+        if 'Index Name' in nodo:
+            indices.add(nodo['Index Name'])
+
+        # Nodos nunca ejecutados no tienen filas reales comparables
+        if loops:
+            estimadas = nodo.get('Plan Rows', 0)
+            mayor, menor = max(estimadas, reales), min(estimadas, reales)
+            factor = mayor / max(menor, 1)
+            if factor >= factor_error and mayor >= 100:
+                errores.append({
+                    'nodo': nodo['Node Type'],
+                    'tabla': nodo.get('Relation Name') or nodo.get('Index Name'),
+                    'estimadas': estimadas,
+                    'reales': reales,
+                    'factor': round(factor, 1)
+                })
+
+    return {
+        'tiempo_ms': plan.get('Execution Time'),
+        'planificacion_ms': plan.get('Planning Time'),
+        'buffers_hit': raiz.get('Shared Hit Blocks', 0),
+        'buffers_read': raiz.get('Shared Read Blocks', 0),
+        'indices': sorted(indices),
+        'seq_scans': seq_scans,
+        'errores_estimacion': errores
+    }
+
+def generar_datos(db: DatabaseService, pedidos: int, dias: int):
+    """Carga pedidos, producciones y compras sintéticos sobre los catálogos existentes"""
+    print(f"⏳ Generando {pedidos} pedidos en {dias} días...")
+    with db.sesion() as conexion:
+        try:
+            with conexion.cursor() as cursor:
+                cursor.execute("SELECT COALESCE(MAX(ID), 0) FROM PEDIDO")
+                id_inicial = cursor.fetchone()[0]
+                cursor.execute("SELECT COALESCE(MAX(ID), 0) FROM NOTA_COMPRA")
+                nota_inicial = cursor.fetchone()[0]
+                cursor.execute(SQL_DATOS_SINTETICOS, {
+                    'pedidos': pedidos,
+                    'dias': dias,
+                    'id_inicial': id_inicial,
+                    'nota_inicial': nota_inicial
+                })
+            conexion.commit()
+        except Exception:
+            conexion.rollback()
+            raise
+
+        # VACUUM (fuera de transacción) deja el visibility map listo para index-only scans
+        conexion.autocommit = True
+        try:
+            with conexion.cursor() as cursor:
+                cursor.execute("VACUUM ANALYZE")
+        finally:
+            conexion.autocommit = False
+    print("✓ Datos sintéticos cargados")
+
+def imprimir_reporte(resultados: list):
+    """Imprime el análisis de cada query"""
+    for metodo, nombre, analisis in resultados:
+        print(f"\n▶ {metodo} ({nombre})")
+        print(f"   tiempo: {analisis['tiempo_ms']:.2f} ms  (planificación {analisis['planificacion_ms']:.2f} ms)"
+              f"  buffers hit/read: {analisis['buffers_hit']}/{analisis['buffers_read']}")
+        print(f"   índices: {', '.join(analisis['indices']) or '-'}")
+        for scan in analisis['seq_scans']:
+            marca = '⚠️ ' if scan['relevante'] else '  '
+            print(f"   {marca}Seq Scan {scan['tabla']}: {scan['filas_leidas']} filas leídas")
+        for error in analisis['errores_estimacion']:
+            print(f"   ⚠️  Estimación x{error['factor']} en {error['nodo']} {error['tabla'] or ''}:"
+                  f" estimadas {error['estimadas']}, reales {error['reales']}")
+
+def main():
+    parser = argparse.ArgumentParser(description="EXPLAIN (ANALYZE, BUFFERS) de las queries de reportes")
+    parser.add_argument('--desde', default=(date.today() - timedelta(days=30)).isoformat())
+    parser.add_argument('--hasta', default=date.today().isoformat())
+    parser.add_argument('--min-filas', type=int, default=10000,
+                        help="Seq scans que leen al menos estas filas se marcan como relevantes")
+    parser.add_argument('--factor-error', type=float, default=10,
+                        help="Factor entre filas estimadas y reales a partir del cual se reporta")
+    parser.add_argument('--rollup', action='store_true', help="Analizar también las variantes del rollup diario")
+    parser.add_argument('--generar-pedidos', type=int, default=0,
+                        help="Cargar N pedidos sintéticos antes de analizar (SOLO BD de prueba)")
+    parser.add_argument('--dias', type=int, default=730, help="Días que abarcan los datos sintéticos")
+    parser.add_argument('--json', action='store_true', help="Salida en JSON")
+    args = parser.parse_args()
+
+    db = ExplainDatabaseService()
+    db.usar_rollup = args.rollup
+
+    if args.generar_pedidos:
+        generar_datos(db, args.generar_pedidos, args.dias)
+
+    resultados = []
+    with db.sesion():
+        for metodo, con_fechas in CONSULTAS:
+            db.planes.clear()
+            argumentos = (args.desde, args.hasta) if con_fechas else ()
+            getattr(db, metodo)(*argumentos)
+            for nombre, plan in db.planes:
+                resultados.append((metodo, nombre, analizar_plan(plan, args.min_filas, args.factor_error)))
+    db.cerrar_pool()
+
+    if args.json:
+        print(json.dumps([
+            {'metodo': metodo, 'nombre': nombre, **analisis} for metodo, nombre, analisis in resultados
+        ], indent=2, ensure_ascii=False))
+    else:
+        imprimir_reporte(resultados)
+
+    relevantes = sum(1 for _, _, a in resultados for s in a['seq_scans'] if s['relevante'])
+    if not args.json:
+        print(f"\n{'⚠️ ' if relevantes else '✓'} {relevantes} seq scans sobre tablas grandes")
+    return 1 if relevantes else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
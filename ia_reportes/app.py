@@ -39,4 +39,12 @@ def internal_error(error):
 if __name__ == '__main__':
     print(f"🚀 Iniciando servicio IA Reportes en puerto {FLASK_PORT}")
     print(f"📍 Entorno: {FLASK_ENV}")
+    
+    # Abrir conexiones del pool antes de recibir requests
+    from db.connection import db
+    try:
+        db.connect()
+    except Exception:
+        print("⚠️  No se pudo calentar el pool de conexiones; se abrirá bajo demanda")
+    
     app.run(host='0.0.0.0', port=FLASK_PORT, debug=(FLASK_ENV == 'development'))
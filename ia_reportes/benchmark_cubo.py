@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Compara el cubo de ventas en memoria (CuboVentas) contra las queries SQL de DatabaseService
+
+Carga el cubo, verifica que ambos caminos den los mismos resultados (valores y
+tipos: Decimal, date, int) y mide el tiempo por consulta sobre ventanas de distinta longitud.
+
+Uso:
+    python benchmark_cubo.py --hasta 2024-12-31 --repeticiones 20
+"""
+
+import sys
+import os
+import time
+import argparse
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from src.services.database_service import DatabaseService
+from src.services.sales_cube import CuboVentas
+
+# Métodos con el mismo nombre y firma en DatabaseService y CuboVentas
+CONSULTAS = ['get_ventas_por_categoria', 'get_productos_mas_vendidos', 'get_resumen_ventas', 'get_clientes_datos']
+
+VENTANAS = [('dia', 1), ('semana', 7), ('mes', 30), ('trimestre', 91), ('año', 365)]
+
+def _tipado(valor):
+    """Cada valor con su tipo y su texto: 1.5, Decimal('1.5') y Decimal('1.50') son distintos"""
+    if isinstance(valor, dict):
+        return {clave: _tipado(v) for clave, v in valor.items()}
+    if isinstance(valor, list):
+        return [_tipado(v) for v in valor]
+    return (type(valor).__name__, str(valor))
+
+def _sin_orden(valor):
+    """Las filas empatadas pueden venir en distinto orden: comparar como conjunto"""
+    if isinstance(valor, list):
+        return sorted((repr(sorted(fila.items())) for fila in valor))
+    return valor
+
+def _medir(funcion, repeticiones: int) -> float:
+    """Mediana en milisegundos"""
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    tiempos.sort()
+    return tiempos[len(tiempos) // 2]
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del cubo de ventas contra SQL")
+    parser.add_argument('--hasta', default=date.today().isoformat())
+    parser.add_argument('--repeticiones', type=int, default=10)
+    args = parser.parse_args()
+
+    db = DatabaseService()
+    # Sin caché de resultados para medir la BD en cada repetición
+    db.cache = None
+    cubo = CuboVentas(db)
+
+    inicio = time.perf_counter()
+    cubo.actualizar()
+    print(f"Cubo cargado en {time.perf_counter() - inicio:.1f}s: {cubo.estadisticas()}")
+
+    hasta = date.fromisoformat(args.hasta)
+    diferencias = 0
+    print(f"\n{'ventana':<10} {'consulta':<28} {'sql ms':>10} {'cubo ms':>10} {'x':>8}")
+    for etiqueta, dias in VENTANAS:
+        desde = (hasta - timedelta(days=dias - 1)).isoformat()
+        for consulta in CONSULTAS:
+            sql = getattr(db, consulta)
+            memoria = getattr(cubo, consulta)
+            # Top productos completo: con LIMIT los empates en el corte pueden diferir
+            extra = {'limite': 10 ** 6} if consulta == 'get_productos_mas_vendidos' else {}
+            if _sin_orden(_tipado(sql(desde, args.hasta, **extra))) != \
+                    _sin_orden(_tipado(memoria(desde, args.hasta, **extra))):
+                diferencias += 1
+                print(f"  DIFERENCIA en {consulta} {desde}..{args.hasta}")
+            ms_sql = _medir(lambda: sql(desde, args.hasta), args.repeticiones)
+            ms_cubo = _medir(lambda: memoria(desde, args.hasta), args.repeticiones)
+            print(f"{etiqueta:<10} {consulta:<28} {ms_sql:>10.2f} {ms_cubo:>10.3f} {ms_sql / ms_cubo:>8.0f}")
+
+    db.cerrar_pool()
+    return 1 if diferencias else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -17,6 +17,14 @@ DB_CONFIG = {
     "user": os.getenv("DB_USER", "postgres"),
     "password": os.getenv("DB_PASSWORD", ""),
 }
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", 1))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", 10))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))
+DB_PREPARED_STATEMENTS = os.getenv("DB_PREPARED_STATEMENTS", "False").lower() == "true"
+
+# Ejecución concurrente de queries independientes
+REPORTES_CONSULTAS_PARALELAS = os.getenv("REPORTES_CONSULTAS_PARALELAS", "False").lower() == "true"
+DB_FANOUT_WORKERS = int(os.getenv("DB_FANOUT_WORKERS", 4))
 
 # Backend API
 BACKEND_URL = os.getenv("BACKEND_URL", "http://localhost:5000")
@@ -28,6 +36,7 @@ FLASK_PORT = int(os.getenv("FLASK_PORT", 5001))
 # Report Limits
 MAX_FILAS_REPORTE = int(os.getenv("MAX_FILAS_REPORTE", 1000))
 CONTEXTO_EMPRESA_LIMIT = int(os.getenv("CONTEXTO_EMPRESA_LIMIT", 50))
+CLIENTES_LOTE_MAX = int(os.getenv("CLIENTES_LOTE_MAX", 500))
 
 # Tipos de reportes disponibles
 TIPOS_REPORTES = {
@@ -1,6 +1,8 @@
-import psycopg2
 from psycopg2.extras import RealDictCursor
-from config import DB_CONFIG
+from config import DB_CONFIG, DB_POOL_MIN, DB_POOL_MAX, DB_POOL_TIMEOUT, DB_PREPARED_STATEMENTS
+from src.services.connection_pool import ConnectionPool
+from src.services.query_registry import QueryRegistry
+import threading
 import logging
 
 logger = logging.getLogger(__name__)
@@ -9,54 +11,76 @@ class DatabaseConnection:
     """Maneja conexiones a PostgreSQL"""
     
     def __init__(self):
-        self.connection = None
+        self.pool = None
+        self._lock = threading.Lock()
+        self.registry = QueryRegistry(habilitado=DB_PREPARED_STATEMENTS)
     
     def connect(self):
-        """Establecer conexión"""
+        """Inicializar pool y abrir conexiones mínimas"""
         try:
-            self.connection = psycopg2.connect(**DB_CONFIG)
-            logger.info("✅ Conectado a la base de datos")
-            return self.connection
+            with self._lock:
+                if self.pool is None:
+                    self.pool = ConnectionPool(
+                        DB_CONFIG,
+                        minimo=DB_POOL_MIN,
+                        maximo=DB_POOL_MAX,
+                        timeout_espera=DB_POOL_TIMEOUT
+                    )
+                    self.pool.calentar()
+                    logger.info("✅ Conectado a la base de datos")
+            return self.pool
         except Exception as e:
             logger.error(f"❌ Error conectando BD: {e}")
             raise
     
     def disconnect(self):
-        """Cerrar conexión"""
-        if self.connection:
-            self.connection.close()
-            logger.info("❌ Desconectado de la base de datos")
+        """Cerrar pool de conexiones"""
+        with self._lock:
+            if self.pool:
+                self.pool.cerrar()
+                self.pool = None
+                logger.info("❌ Desconectado de la base de datos")
     
-    def execute_query(self, query, params=None):
+    def estadisticas(self):
+        """Métricas del pool de conexiones"""
+        return self.pool.estadisticas() if self.pool else {}
+    
+    def estadisticas_consultas(self):
+        """Tiempos de preparación/ejecución por sentencia con nombre"""
+        return self.registry.estadisticas()
+    
+    def _ejecutar(self, query, params, uno=False, nombre=None):
+        """Toma una conexión del pool solo durante la query"""
+        pool = self.pool or self.connect()
+        with pool.conexion() as connection:
+            try:
+                with connection.cursor(cursor_factory=RealDictCursor) as cursor:
+                    if nombre:
+                        self.registry.ejecutar(cursor, nombre, query, params or ())
+                    else:
+                        cursor.execute(query, params or ())
+                    resultado = cursor.fetchone() if uno else cursor.fetchall()
+                connection.commit()
+                return resultado
+            except Exception:
+                if not connection.closed:
+                    connection.rollback()
+                raise
+    
+    def execute_query(self, query, params=None, nombre=None):
         """Ejecutar query y retornar resultados"""
         try:
-            if not self.connection:
-                self.connect()
-            
-            cursor = self.connection.cursor(cursor_factory=RealDictCursor)
-            cursor.execute(query, params or ())
-            self.connection.commit()
-            
-            return cursor.fetchall()
+            return self._ejecutar(query, params, nombre=nombre)
         except Exception as e:
             logger.error(f"❌ Error ejecutando query: {e}")
-            self.connection.rollback()
             raise
     
-    def execute_single(self, query, params=None):
+    def execute_single(self, query, params=None, nombre=None):
         """Ejecutar query y retornar un solo resultado"""
         try:
-            if not self.connection:
-                self.connect()
-            
-            cursor = self.connection.cursor(cursor_factory=RealDictCursor)
-            cursor.execute(query, params or ())
-            self.connection.commit()
-            
-            return cursor.fetchone()
+            return self._ejecutar(query, params, uno=True, nombre=nombre)
         except Exception as e:
             logger.error(f"❌ Error ejecutando query: {e}")
-            self.connection.rollback()
             raise
 
 # Instancia global
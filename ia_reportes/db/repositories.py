@@ -18,7 +18,7 @@ class VentasRepository:
         JOIN PEDIDO_PRODUCTO pp ON p.id = pp.id_pedido
         WHERE p.fecha_pedido BETWEEN %s AND %s
         """
-        return db.execute_single(query, (fecha_inicio, fecha_fin))
+        return db.execute_single(query, (fecha_inicio, fecha_fin), nombre='total_ventas')
     
     @staticmethod
     def obtener_ventas_por_categoria(fecha_inicio, fecha_fin):
@@ -37,7 +37,7 @@ class VentasRepository:
         GROUP BY c.id, c.nombre
         ORDER BY total_ventas DESC
         """
-        return db.execute_query(query, (fecha_inicio, fecha_fin))
+        return db.execute_query(query, (fecha_inicio, fecha_fin), nombre='ventas_por_categoria')
     
     @staticmethod
     def obtener_clientes_top(fecha_inicio, fecha_fin, limite=10):
@@ -56,7 +56,7 @@ class VentasRepository:
         ORDER BY total_gastado DESC
         LIMIT %s
         """
-        return db.execute_query(query, (fecha_inicio, fecha_fin, limite))
+        return db.execute_query(query, (fecha_inicio, fecha_fin, limite), nombre='clientes_top')
     
     @staticmethod
     def obtener_productos_top(fecha_inicio, fecha_fin, limite=10):
@@ -77,7 +77,7 @@ class VentasRepository:
         ORDER BY total_vendido DESC
         LIMIT %s
         """
-        return db.execute_query(query, (fecha_inicio, fecha_fin, limite))
+        return db.execute_query(query, (fecha_inicio, fecha_fin, limite), nombre='productos_top')
 
 class InventarioRepository:
     """Acceso a datos de inventario"""
@@ -97,7 +97,7 @@ class InventarioRepository:
         JOIN CATEGORIA c ON pr.id_categoria = c.id
         ORDER BY pr.stock ASC
         """
-        return db.execute_query(query)
+        return db.execute_query(query, nombre='estado_stock')
     
     @staticmethod
     def obtener_bajo_stock():
@@ -114,7 +114,7 @@ class InventarioRepository:
         WHERE pr.stock < pr.stock_minimo
         ORDER BY (pr.stock_minimo - pr.stock) DESC
         """
-        return db.execute_query(query)
+        return db.execute_query(query, nombre='bajo_stock')
 
 class ClientesRepository:
     """Acceso a datos de clientes"""
@@ -135,4 +135,28 @@ class ClientesRepository:
         WHERE cl.ci = %s
         GROUP BY cl.ci, cl.nombre, cl.telefono
         """
-        return db.execute_single(query, (ci_cliente,))
+        return db.execute_single(query, (ci_cliente,), nombre='informacion_cliente')
+    
+    @staticmethod
+    def obtener_informacion_clientes(cis):
+        """Información de varios clientes en una sola query: {ci: fila o None si no existe}"""
+        cis = list(dict.fromkeys(str(ci) for ci in cis))
+        if not cis:
+            return {}
+        
+        query = """
+        SELECT 
+            cl.nombre,
+            cl.ci,
+            cl.telefono,
+            COUNT(p.id) as total_pedidos,
+            SUM(pp.total) as total_gastado
+        FROM CLIENTE cl
+        LEFT JOIN PEDIDO p ON cl.ci = p.ci_cliente
+        LEFT JOIN PEDIDO_PRODUCTO pp ON p.id = pp.id_pedido
+        WHERE cl.ci = ANY(%s)
+        GROUP BY cl.ci, cl.nombre, cl.telefono
+        """
+        filas = db.execute_query(query, (cis,), nombre='informacion_clientes')
+        por_ci = {fila['ci']: fila for fila in filas}
+        return {ci: por_ci.get(ci) for ci in cis}
@@ -15,7 +15,7 @@ import os
 # Agregar src al path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 
-from src.api.routes import app
+from src.api.routes import app, db_service, rollup_service, cubo_ventas, snapshot_service, notification_listener
 from src.utils.helpers import configurar_logging
 
 # Configurar logging
@@ -29,11 +29,40 @@ if __name__ == '__main__':
     logger.info("Documentacion: /docs o accede a /api/health")
     
     # Importar y ejecutar app Flask
-    from src.config.settings import FLASK_HOST, FLASK_PORT, GEMINI_API_KEY
+    from src.config.settings import (
+        FLASK_HOST, FLASK_PORT, GEMINI_API_KEY, ROLLUP_REFRESCO_SEGUNDOS, CUBO_REFRESCO_SEGUNDOS,
+        SNAPSHOTS_REFRESCO_SEGUNDOS
+    )
     
     if not GEMINI_API_KEY or GEMINI_API_KEY == 'your_gemini_api_key_here':
         logger.error("⚠️  ERROR: GEMINI_API_KEY no configurada correctamente")
         logger.error("Por favor configura tu .env con una API key válida de Google Gemini")
         sys.exit(1)
     
-    app.run(host=FLASK_HOST, port=FLASK_PORT, debug=True)
+    # Con debug=True el reloader de Werkzeug ejecuta este script en un proceso vigilante y
+    # otro que sirve (WERKZEUG_RUN_MAIN=true); los hilos de fondo van solo en el que sirve
+    debug = True
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        # Abrir conexiones del pool antes de recibir requests
+        try:
+            db_service.iniciar_pool()
+        except Exception:
+            logger.warning("⚠️  No se pudo calentar el pool de conexiones; se abrirán bajo demanda")
+    
+        # Invalidar la cache cuando la BD notifica cambios (MIGRACION_NOTIFICACIONES.sql)
+        if notification_listener is not None:
+            notification_listener.iniciar()
+    
+        # Mantener al día el rollup diario de ventas
+        if ROLLUP_REFRESCO_SEGUNDOS > 0:
+            rollup_service.iniciar_refresco_periodico(ROLLUP_REFRESCO_SEGUNDOS)
+    
+        # Cargar el cubo de ventas en segundo plano (hasta entonces se consulta la BD)
+        if cubo_ventas is not None:
+            cubo_ventas.iniciar_refresco_periodico(CUBO_REFRESCO_SEGUNDOS)
+    
+        # Escribir los snapshots de los meses que se van cerrando
+        if snapshot_service is not None:
+            snapshot_service.iniciar_generacion_periodica(SNAPSHOTS_REFRESCO_SEGUNDOS)
+    
+    app.run(host=FLASK_HOST, port=FLASK_PORT, debug=debug)
@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify
 from services.interpret_service import InterpretService
 from services.report_service import ReportService
+from config import CLIENTES_LOTE_MAX
 
 def create_routes(app):
     """Crear todas las rutas del servicio"""
@@ -131,3 +132,34 @@ def create_routes(app):
             }), 200
         except Exception as e:
             return jsonify({"error": str(e)}), 500
+    
+    # ==========================================
+    # RUTAS DE CLIENTES
+    # ==========================================
+    
+    @app.route('/ia/clientes/lote', methods=['POST'])
+    def obtener_clientes_lote():
+        """
+        Información de varios clientes en una sola consulta (en lugar de una por cliente)
+        
+        Request JSON:
+        {
+            "cis": ["1234567", "7654321"]
+        }
+        """
+        try:
+            data = request.get_json(silent=True) or {}
+            cis = data.get('cis')
+            
+            if not isinstance(cis, list) or not cis:
+                return jsonify({"error": "cis debe ser una lista no vacía"}), 400
+            if len(cis) > CLIENTES_LOTE_MAX:
+                return jsonify({"error": f"Máximo {CLIENTES_LOTE_MAX} clientes por consulta"}), 400
+            
+            resultado = report_service.obtener_informacion_clientes(cis)
+            return jsonify({
+                "success": True,
+                **resultado
+            }), 200
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
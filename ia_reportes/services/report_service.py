@@ -1,6 +1,8 @@
 from db.repositories import VentasRepository, InventarioRepository, ClientesRepository
 from utils.helpers import DateUtils, Formatters, Validators
 from constants.report_types import EJEMPLOS_PROMPTS, TIPOS_REPORTES
+from config import REPORTES_CONSULTAS_PARALELAS, DB_FANOUT_WORKERS, DB_POOL_MAX
+from concurrent.futures import ThreadPoolExecutor
 import logging
 
 logger = logging.getLogger(__name__)
@@ -8,6 +10,22 @@ logger = logging.getLogger(__name__)
 class ReportService:
     """Servicio para generar reportes basados en interpretación"""
     
+    def __init__(self, consultas_paralelas=REPORTES_CONSULTAS_PARALELAS):
+        self.consultas_paralelas = consultas_paralelas
+        # El hilo que llama no retiene conexión mientras espera (cada repositorio toma la suya
+        # solo durante la query), así que los workers no pueden quedar esperando a un pool
+        # agotado por sus propios llamadores; igual se deja una conexión para el resto de la app
+        workers = min(DB_FANOUT_WORKERS, DB_POOL_MAX - 1)
+        self._executor = ThreadPoolExecutor(max_workers=workers) if consultas_paralelas and workers > 0 else None
+    
+    def _ejecutar_consultas(self, tareas):
+        """Ejecuta queries independientes, en paralelo si está habilitado"""
+        if not self._executor:
+            return {clave: metodo(*args) for clave, (metodo, *args) in tareas.items()}
+        
+        futuros = {clave: self._executor.submit(metodo, *args) for clave, (metodo, *args) in tareas.items()}
+        return {clave: futuro.result() for clave, futuro in futuros.items()}
+    
     def generar_reporte(self, texto_solicitud, modulo, usuario_id=None, formato="json"):
         """
         Generar reporte completo
@@ -53,11 +71,17 @@ class ReportService:
         try:
             inicio, fin = DateUtils.get_current_month_range()
             
-            # Obtener datos
-            total = VentasRepository.obtener_total_ventas(inicio, fin)
-            por_categoria = VentasRepository.obtener_ventas_por_categoria(inicio, fin)
-            clientes_top = VentasRepository.obtener_clientes_top(inicio, fin)
-            productos_top = VentasRepository.obtener_productos_top(inicio, fin)
+            # Obtener datos (cada repositorio toma su propia conexión del pool)
+            resultados = self._ejecutar_consultas({
+                'total': (VentasRepository.obtener_total_ventas, inicio, fin),
+                'por_categoria': (VentasRepository.obtener_ventas_por_categoria, inicio, fin),
+                'clientes_top': (VentasRepository.obtener_clientes_top, inicio, fin),
+                'productos_top': (VentasRepository.obtener_productos_top, inicio, fin),
+            })
+            total = resultados['total']
+            por_categoria = resultados['por_categoria']
+            clientes_top = resultados['clientes_top']
+            productos_top = resultados['productos_top']
             
             # Formatear respuesta
             return {
@@ -184,6 +208,18 @@ class ReportService:
             logger.error(f"❌ Error obteniendo contexto: {e}")
             raise
     
+    def obtener_informacion_clientes(self, cis):
+        """Información de varios clientes en una query, en el orden pedido, separando los CI inexistentes"""
+        try:
+            informacion = ClientesRepository.obtener_informacion_clientes(cis)
+            return {
+                "clientes": [fila for fila in informacion.values() if fila is not None],
+                "no_encontrados": [ci for ci, fila in informacion.items() if fila is None]
+            }
+        except Exception as e:
+            logger.error(f"❌ Error obteniendo clientes: {e}")
+            raise
+    
     def _exportar_excel(self, datos, modulo):
         """Exportar reporte a Excel"""
         # Implementar con openpyxl
@@ -1,18 +1,30 @@
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, request, jsonify, send_file, Response
 from flask_cors import CORS
 from datetime import datetime, timedelta
 import logging
 import json
 import os
 
-from src.config.settings import FLASK_HOST, FLASK_PORT, GEMINI_API_KEY, REPORTS_OUTPUT_DIR
-from src.services.database_service import DatabaseService
+from src.config.settings import (
+    FLASK_HOST, FLASK_PORT, GEMINI_API_KEY, REPORTS_OUTPUT_DIR, REPORTES_VENTAS_CONSULTA_UNICA,
+    MAX_FILAS_REPORTE, PREVIEW_FILAS_DEFECTO, REPORTES_MAX_PERIODOS_COMPARACION, REPORTES_USAR_CUBO,
+    REPORTES_USAR_SNAPSHOTS, CACHE_NOTIFICACIONES, JOBS_WORKERS, JOBS_MAX_COLA, JOBS_RETENCION_SEGUNDOS,
+    PROMPT_PRESUPUESTO_TOKENS
+)
+from src.services.database_service import DatabaseService, EXPORTACIONES, SERIES
+from src.services.rollup_service import RollupService
+from src.services.sales_cube import CuboVentas
+from src.services.snapshot_service import SnapshotService
+from src.services.notification_listener import NotificationListener
 from src.services.ia_service import IAService
+from src.services.job_service import JobService, ColaLlenaError
 from src.generators.pdf_generator import PDFGenerator
 from src.generators.excel_generator import ExcelGenerator
 from src.generators.chart_generator import ChartGenerator
+from src.generators.csv_generator import CSVGenerator
 from src.prompts.report_prompts import obtener_prompt
-from src.utils.helpers import configurar_logging
+from src.prompts.prompt_builder import construir_prompt_reporte
+from src.utils.helpers import configurar_logging, resumir_ventas, codificar_cursor, decodificar_cursor, contar_filas
 
 # Configurar logging
 logger = configurar_logging()
@@ -23,10 +35,22 @@ CORS(app)
 
 # Inicializar servicios
 db_service = DatabaseService()
+rollup_service = RollupService(db_service)
+cubo_ventas = CuboVentas(db_service) if REPORTES_USAR_CUBO else None
+snapshot_service = SnapshotService(db_service) if REPORTES_USAR_SNAPSHOTS else None
+notification_listener = (
+    NotificationListener(db_service, cubo=cubo_ventas)
+    if CACHE_NOTIFICACIONES and (
+        db_service.cache is not None or db_service.dimensiones is not None or cubo_ventas is not None
+    ) else None
+)
 ia_service = IAService()
+# Reportes asíncronos: el pipeline corre en workers propios y no ocupa hilos de Flask
+job_service = JobService(workers=JOBS_WORKERS, max_cola=JOBS_MAX_COLA, retencion=JOBS_RETENCION_SEGUNDOS)
 pdf_generator = PDFGenerator()
 excel_generator = ExcelGenerator()
 chart_generator = ChartGenerator()
+csv_generator = CSVGenerator()
 
 # ===== RUTAS PRINCIPALES =====
 
@@ -85,7 +109,12 @@ def index():
             
             <div class="endpoint">
                 <span class="method get">GET</span> <strong>/api/reportes/preview/{tipo}</strong><br>
-                Preview de reporte sin generar archivos
+                Preview de reporte sin generar archivos (paginado: limite, despues, solo_resumen=1)
+            </div>
+            
+            <div class="endpoint">
+                <span class="method get">GET</span> <strong>/api/reportes/series/{tipo}</strong><br>
+                Serie temporal (granularidad=day|week|month) con buckets vacíos en 0
             </div>
             
             <div class="endpoint">
@@ -93,6 +122,11 @@ def index():
                 Genera un reporte completo con IA
             </div>
             
+            <div class="endpoint">
+                <span class="method post">POST</span> <strong>/api/reportes/jobs</strong><br>
+                Encola un reporte y retorna su job_id; avance y resultado en GET /api/reportes/jobs/{job_id}
+            </div>
+            
             <h2>📊 Tipos de Reportes</h2>
             <ul>
                 <li><strong>VENTAS:</strong> Análisis completo de ventas</li>
@@ -149,6 +183,115 @@ def health_check():
         'service': 'IA Reportes API'
     }), 200
 
+@app.route('/api/db/pool', methods=['GET'])
+def estado_pool():
+    """Estadísticas del pool de conexiones a BD"""
+    return jsonify(db_service.estadisticas_pool()), 200
+
+@app.route('/api/metrics', methods=['GET'])
+def metricas_prometheus():
+    """Métricas de queries, pool y cola de jobs en formato de exposición de Prometheus"""
+    texto = db_service.metricas.exportar_prometheus(db_service.estadisticas_pool(), job_service.estadisticas())
+    return Response(texto, mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+@app.route('/api/db/consultas', methods=['GET'])
+def estado_consultas():
+    """Tiempos de preparación y ejecución por sentencia con nombre"""
+    return jsonify({**db_service.estadisticas_consultas(), 'latencias': db_service.metricas.resumen()}), 200
+
+@app.route('/api/cache', methods=['GET'])
+def estado_cache():
+    """Estadísticas de la cache de queries (hits, misses, evictions), del listener de cambios, de las dimensiones y de respuestas IA"""
+    estadisticas = db_service.estadisticas_cache()
+    if notification_listener is not None:
+        estadisticas['notificaciones'] = notification_listener.estadisticas()
+    if db_service.dimensiones is not None:
+        estadisticas['dimensiones'] = db_service.dimensiones.estadisticas()
+    estadisticas['ia'] = ia_service.estadisticas()
+    return jsonify(estadisticas), 200
+
+@app.route('/api/cache/invalidar', methods=['POST'])
+def invalidar_cache():
+    """
+    Invalida la cache de queries
+    
+    POST body (opcional):
+    {
+        "tablas": ["PEDIDO", "PEDIDO_PRODUCTO"],
+        "fecha_inicio": "2024-01-01",
+        "fecha_fin": "2024-01-31"
+    }
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        invalidadas = db_service.invalidar_cache(
+            tablas=data.get('tablas'),
+            fecha_inicio=data.get('fecha_inicio'),
+            fecha_fin=data.get('fecha_fin')
+        )
+        return jsonify({'success': True, 'invalidadas': invalidadas}), 200
+    except Exception as e:
+        logger.error(f"Error invalidando cache: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/rollup/refrescar', methods=['POST'])
+def refrescar_rollup():
+    """Recalcula los días del rollup de ventas modificados desde el último refresco"""
+    try:
+        return jsonify({'success': True, **rollup_service.refrescar()}), 200
+    except Exception as e:
+        logger.error(f"Error refrescando rollup: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/cubo', methods=['GET'])
+def estado_cubo():
+    """Tamaño y rango de fechas del cubo de ventas en memoria"""
+    if cubo_ventas is None:
+        return jsonify({'habilitado': False}), 200
+    return jsonify({'habilitado': True, **cubo_ventas.estadisticas()}), 200
+
+@app.route('/api/cubo/actualizar', methods=['POST'])
+def actualizar_cubo():
+    """Relee en el cubo los días recientes o con cambios y agrega los pedidos nuevos; con {"completo": true} lo recarga entero"""
+    if cubo_ventas is None:
+        return jsonify({'error': 'Cubo de ventas deshabilitado (REPORTES_USAR_CUBO)'}), 400
+    try:
+        cuerpo = request.get_json(silent=True) or {}
+        resultado = cubo_ventas.recargar() if cuerpo.get('completo') else cubo_ventas.actualizar()
+        return jsonify({'success': True, **resultado}), 200
+    except Exception as e:
+        logger.error(f"Error actualizando cubo de ventas: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/snapshots', methods=['GET'])
+def estado_snapshots():
+    """Meses con snapshot y tamaño en disco de cada dataset"""
+    if snapshot_service is None:
+        return jsonify({'habilitado': False}), 200
+    return jsonify({'habilitado': True, **snapshot_service.estadisticas()}), 200
+
+@app.route('/api/snapshots/generar', methods=['POST'])
+def generar_snapshots():
+    """
+    Escribe los snapshots faltantes de los meses cerrados
+    
+    POST body (opcional):
+    {
+        "desde": "2024-01-01",
+        "hasta": "2024-12-31",
+        "forzar": true    // reescribe los existentes (p. ej. tras corregir un mes cerrado)
+    }
+    """
+    if snapshot_service is None:
+        return jsonify({'error': 'Snapshots deshabilitados (REPORTES_USAR_SNAPSHOTS)'}), 400
+    try:
+        cuerpo = request.get_json(silent=True) or {}
+        resultado = snapshot_service.generar(cuerpo.get('desde'), cuerpo.get('hasta'), bool(cuerpo.get('forzar')))
+        return jsonify({'success': True, **resultado}), 200
+    except Exception as e:
+        logger.error(f"Error generando snapshots: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
 # ===== RUTAS DE REPORTES =====
 
 @app.route('/api/reportes/generar', methods=['POST'])
@@ -162,99 +305,223 @@ def generar_reporte():
         "prompt_custom": "Tu pregunta específica",
         "fecha_inicio": "2024-01-01",
         "fecha_fin": "2024-12-31",
-        "formatos": ["pdf", "excel", "json"],
-        "incluir_graficos": true
+        "formatos": ["pdf", "excel", "excel_detalle", "csv", "json"],
+        "incluir_graficos": true,
+        "comparar_periodos": 3,
+        "usar_cache_ia": true
     }
     """
     try:
-        datos = request.get_json()
+        resultado = _ejecutar_pipeline_reporte(request.get_json())
+        return jsonify(resultado), 200
+        
+    except Exception as e:
+        logger.error(f"Error generando reporte: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/reportes/generar/stream', methods=['POST'])
+def generar_reporte_stream():
+    """
+    Igual que /api/reportes/generar, pero responde con Server-Sent Events
+    
+    POST body: el mismo de /api/reportes/generar (sin incluir_graficos).
+    Eventos, en orden:
+      datos             tipo_reporte, periodo y datos de la BD (apenas terminan las queries)
+      analisis_parcial  {"texto": ...} por cada fragmento que genera el modelo
+      analisis          análisis final estructurado (igual a analisis_ia)
+      fin               {"archivos_generados": [...]}
+      error             {"error": ...} si falla la IA o la generación de archivos
+    """
+    try:
+        datos = request.get_json() or {}
         
         tipo_reporte = datos.get('tipo_reporte', 'GENERAL').upper()
         prompt_custom = datos.get('prompt_custom')
+        fecha_inicio, fecha_fin = _rango_fechas_reporte(datos)
+        formatos = datos.get('formatos', ['json'])
+        comparar_periodos = _periodos_comparacion(datos.get('comparar_periodos'))
+        usar_cache_ia = datos.get('usar_cache_ia', True)
         
-        # Manejar fechas con valores por defecto (últimos 30 días)
-        fecha_inicio = datos.get('fecha_inicio', '')
-        fecha_fin = datos.get('fecha_fin', '')
+        logger.info(f"Generando reporte (streaming): {tipo_reporte} para período {fecha_inicio} a {fecha_fin}")
         
-        # Función para convertir fechas de DD/MM/YYYY a YYYY-MM-DD
-        def convertir_fecha(fecha_str):
-            if not fecha_str or fecha_str.strip() == '':
-                return None
-            try:
-                # Intenta formato DD/MM/YYYY
-                from datetime import datetime as dt
-                return dt.strptime(fecha_str.strip(), '%d/%m/%Y').strftime('%Y-%m-%d')
-            except:
-                try:
-                    # Si no funciona, intenta formato YYYY-MM-DD
-                    from datetime import datetime as dt
-                    return dt.strptime(fecha_str.strip(), '%Y-%m-%d').strftime('%Y-%m-%d')
-                except:
-                    return None
-        
-        # Convertir fechas y aplicar valores por defecto
-        fecha_inicio_convertida = convertir_fecha(fecha_inicio)
-        fecha_fin_convertida = convertir_fecha(fecha_fin)
-        
-        if not fecha_inicio_convertida:
-            fecha_inicio_convertida = (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')
-        if not fecha_fin_convertida:
-            fecha_fin_convertida = datetime.now().strftime('%Y-%m-%d')
-        
-        fecha_inicio = fecha_inicio_convertida
-        fecha_fin = fecha_fin_convertida
+        # Las queries corren antes de responder para que un error de BD sea un 500
+        with db_service.sesion():
+            datos_reporte = _obtener_datos_reporte(tipo_reporte, fecha_inicio, fecha_fin,
+                                                   comparar_periodos=comparar_periodos)
         
-        formatos = datos.get('formatos', ['json'])
-        incluir_graficos = datos.get('incluir_graficos', False)
-        
-        logger.info(f"Generando reporte: {tipo_reporte} para período {fecha_inicio} a {fecha_fin}")
+        prompt = prompt_custom or obtener_prompt(tipo_reporte)
+        prompt_final = construir_prompt_reporte(prompt, datos_reporte, PROMPT_PRESUPUESTO_TOKENS)
+    except Exception as e:
+        logger.error(f"Error generando reporte: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+    
+    def _eventos():
+        yield _evento_sse('datos', {
+            'tipo_reporte': tipo_reporte,
+            'fecha_generacion': datetime.now().isoformat(),
+            'periodo': f"{fecha_inicio} a {fecha_fin}",
+            'datos': datos_reporte
+        })
+        try:
+            analisis_ia = None
+            for tipo, valor in ia_service.generar_reporte_stream(prompt_final, usar_cache=usar_cache_ia):
+                if tipo == 'fragmento':
+                    yield _evento_sse('analisis_parcial', {'texto': valor})
+                else:
+                    analisis_ia = valor
+            yield _evento_sse('analisis', analisis_ia)
+            
+            archivos_generados = []
+            for formato in formatos:
+                archivo = _generar_archivo_reporte(tipo_reporte, datos_reporte, analisis_ia, formato,
+                                                   fecha_inicio, fecha_fin)
+                if archivo:
+                    archivos_generados.append({'formato': formato, 'ruta': archivo})
+            yield _evento_sse('fin', {'archivos_generados': archivos_generados})
+        except Exception as e:
+            logger.error(f"Error generando reporte (streaming): {str(e)}")
+            yield _evento_sse('error', {'error': str(e)})
+    
+    return Response(
+        _eventos(),
+        mimetype='text/event-stream',
+        # Sin buffer en proxies (nginx) para que cada evento llegue al momento
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/api/reportes/jobs', methods=['POST'])
+def crear_job_reporte():
+    """
+    Encola la generación de un reporte y responde de inmediato con su job_id (202)
+    
+    POST body: el mismo de /api/reportes/generar. El avance y el resultado se
+    consultan en GET /api/reportes/jobs/<job_id>. Con la cola llena responde 503.
+    """
+    datos = request.get_json(silent=True)
+    if not isinstance(datos, dict):
+        return jsonify({'error': 'Se requiere un body JSON'}), 400
+    
+    try:
+        job = job_service.enviar('reporte', _ejecutar_pipeline_reporte, datos)
+    except ColaLlenaError as e:
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '5'}
+    
+    url = f"/api/reportes/jobs/{job.id}"
+    return jsonify({**job.a_dict(incluir_resultado=False), 'url': url}), 202, {'Location': url}
+
+@app.route('/api/reportes/jobs', methods=['GET'])
+def estado_jobs():
+    """Profundidad de la cola, jobs en ejecución y totales por estado"""
+    return jsonify(job_service.estadisticas()), 200
+
+@app.route('/api/reportes/jobs/<job_id>', methods=['GET'])
+def obtener_job_reporte(job_id):
+    """
+    Estado de un job: estado (en_cola|ejecutando|completado|error|cancelado), etapa,
+    progreso (0-100) y, si terminó bien, el mismo resultado de /api/reportes/generar
+    """
+    job = job_service.obtener(job_id)
+    if job is None:
+        return jsonify({'error': 'Job no encontrado (inexistente o vencido)'}), 404
+    return jsonify(job.a_dict()), 200
+
+@app.route('/api/reportes/jobs/<job_id>', methods=['DELETE'])
+def cancelar_job_reporte(job_id):
+    """Cancela un job: si está en cola no se ejecuta; si está corriendo se detiene al terminar la etapa actual"""
+    job = job_service.cancelar(job_id)
+    if job is None:
+        return jsonify({'error': 'Job no encontrado (inexistente o vencido)'}), 404
+    return jsonify(job.a_dict(incluir_resultado=False)), 200
+
+@app.route('/api/reportes/exportar/<tipo>', methods=['GET'])
+def exportar_reporte(tipo):
+    """
+    Exporta filas crudas en CSV/TSV con COPY, enviadas al cliente por bloques
+    
+    Query params: fecha_inicio, fecha_fin (YYYY-MM-DD), formato=csv|tsv, gzip=1
+    """
+    try:
+        tipo = tipo.upper()
+        if tipo not in EXPORTACIONES:
+            return jsonify({'error': f"Tipo no exportable. Opciones: {', '.join(EXPORTACIONES)}"}), 400
         
-        # Conectar a BD
-        db_service.connect()
+        fecha_inicio = request.args.get('fecha_inicio') or (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')
+        fecha_fin = request.args.get('fecha_fin') or datetime.now().strftime('%Y-%m-%d')
+        for fecha in (fecha_inicio, fecha_fin):
+            datetime.strptime(fecha, '%Y-%m-%d')
         
-        # Obtener datos según tipo de reporte
-        datos_reporte = _obtener_datos_reporte(tipo_reporte, fecha_inicio, fecha_fin)
+        formato = request.args.get('formato', 'csv').lower()
+        if formato not in ('csv', 'tsv'):
+            return jsonify({'error': 'formato debe ser csv o tsv'}), 400
+        comprimir = request.args.get('gzip', '').lower() in ('1', 'true')
         
-        # Generar análisis con IA
-        if prompt_custom:
-            prompt = prompt_custom
-        else:
-            prompt = obtener_prompt(tipo_reporte)
+        bloques = db_service.exportar(tipo, fecha_inicio, fecha_fin,
+                                      separador='\t' if formato == 'tsv' else ',',
+                                      comprimir=comprimir)
         
-        prompt_final = prompt.format(datos=json.dumps(datos_reporte, indent=2, default=str))
+        # Leer el primer bloque antes de responder para que un error de BD sea un 500
+        primero = next(bloques, b'')
         
-        analisis_ia = ia_service.generar_reporte(prompt_final, datos_reporte)
+        nombre = f"{tipo.lower()}_{fecha_inicio}_{fecha_fin}.{formato}"
+        if comprimir:
+            nombre += '.gz'
+            mimetype = 'application/gzip'
+        else:
+            mimetype = 'text/tab-separated-values' if formato == 'tsv' else 'text/csv'
         
-        # Agregar metadatos
-        resultado = {
-            'tipo_reporte': tipo_reporte,
-            'fecha_generacion': datetime.now().isoformat(),
-            'periodo': f"{fecha_inicio} a {fecha_fin}",
-            'datos': datos_reporte,
-            'analisis_ia': analisis_ia,
-            'archivos_generados': []
-        }
+        logger.info(f"Exportando {tipo} ({formato}{', gzip' if comprimir else ''}) {fecha_inicio} a {fecha_fin}")
+        def _stream():
+            # Al cerrar la respuesta (cliente desconectado) se cancela el COPY
+            try:
+                yield primero
+                yield from bloques
+            finally:
+                bloques.close()
         
-        # Generar archivos según formatos solicitados
-        for formato in formatos:
-            archivo = _generar_archivo_reporte(tipo_reporte, datos_reporte, analisis_ia, formato)
-            if archivo:
-                resultado['archivos_generados'].append({
-                    'formato': formato,
-                    'ruta': archivo
-                })
+        return Response(
+            _stream(),
+            mimetype=mimetype,
+            headers={'Content-Disposition': f'attachment; filename="{nombre}"'}
+        )
         
-        # Generar gráficos si se solicita
-        if incluir_graficos:
-            graficos = _generar_graficos_reporte(tipo_reporte, datos_reporte)
-            resultado['graficos'] = graficos
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error exportando reporte: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/reportes/series/<tipo>', methods=['GET'])
+def serie_temporal(tipo):
+    """
+    Serie temporal agregada en la BD, con buckets vacíos en 0
+    
+    Query params: fecha_inicio, fecha_fin (YYYY-MM-DD), granularidad=day|week|month
+    (por defecto según la longitud del período). Las fechas de origen son DATE, por eso
+    no hay granularidad por hora: hour/hora responde 400
+    """
+    try:
+        tipo = tipo.upper()
+        if tipo not in SERIES:
+            return jsonify({'error': f"Tipo sin serie temporal. Opciones: {', '.join(SERIES)}"}), 400
         
-        db_service.disconnect()
+        fecha_inicio = request.args.get('fecha_inicio') or (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')
+        fecha_fin = request.args.get('fecha_fin') or datetime.now().strftime('%Y-%m-%d')
+        for fecha in (fecha_inicio, fecha_fin):
+            datetime.strptime(fecha, '%Y-%m-%d')
+        granularidad = request.args.get('granularidad') or _granularidad_para(fecha_inicio, fecha_fin)
         
-        return jsonify(resultado), 200
+        serie = db_service.get_serie_temporal(tipo, fecha_inicio, fecha_fin, granularidad)
+        return jsonify({
+            'tipo': tipo,
+            'periodo': f"{fecha_inicio} a {fecha_fin}",
+            'granularidad': granularidad,
+            'serie': serie
+        }), 200
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
-        logger.error(f"Error generando reporte: {str(e)}")
+        logger.error(f"Error obteniendo serie temporal: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/reportes/tipos', methods=['GET'])
@@ -272,60 +539,295 @@ def listar_tipos_reportes():
     }
     return jsonify(tipos), 200
 
+# Sección paginada por keyset (fecha, id) de cada tipo; el resto se recorta al límite
+SECCION_PAGINADA = {'VENTAS': 'ventas', 'PRODUCCION': 'produccion', 'COMPRAS': 'compras'}
+
 @app.route('/api/reportes/preview/<tipo>', methods=['GET'])
 def preview_reporte(tipo):
-    """Obtiene una vista previa de un reporte sin generar archivos"""
+    """
+    Obtiene una vista previa de un reporte sin generar archivos
+    
+    Query params: fecha_inicio, fecha_fin, limite (o limit, máx. MAX_FILAS_REPORTE),
+    despues (o after: cursor de paginacion.siguiente), solo_resumen=1, comparar_periodos=N
+    """
     try:
         fecha_inicio = request.args.get('fecha_inicio', (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d'))
         fecha_fin = request.args.get('fecha_fin', datetime.now().strftime('%Y-%m-%d'))
+        tipo_reporte = tipo.upper()
         
-        db_service.connect()
-        datos_reporte = _obtener_datos_reporte(tipo.upper(), fecha_inicio, fecha_fin)
-        db_service.disconnect()
+        limite = request.args.get('limite') or request.args.get('limit')
+        limite = int(limite) if limite else PREVIEW_FILAS_DEFECTO
+        if limite < 1:
+            raise ValueError('limite debe ser mayor que 0')
+        limite = min(limite, MAX_FILAS_REPORTE)
+        solo_resumen = request.args.get('solo_resumen', '').lower() in ('1', 'true')
+        comparar_periodos = _periodos_comparacion(request.args.get('comparar_periodos'))
         
-        return jsonify({
+        seccion = SECCION_PAGINADA.get(tipo_reporte)
+        despues = request.args.get('despues') or request.args.get('after')
+        if despues and (seccion is None or solo_resumen):
+            raise ValueError(f"El reporte {tipo_reporte} no admite paginación con cursor")
+        cursor = decodificar_cursor(despues) if despues else None
+        
+        # Secciones fila a fila sin paginar (catálogos): se traen completas y se recortan
+        recortadas = {} if solo_resumen or cursor else {
+            'VENTAS': {'clientes': (_fuente_ventas().get_clientes_datos, fecha_inicio, fecha_fin)},
+            'INVENTARIO': {
+                'inventario': (db_service.get_inventario_datos,),
+                'productos': (db_service.get_productos_stock,)
+            },
+            'CLIENTES': {'clientes': (_fuente_ventas().get_clientes_datos, fecha_inicio, fecha_fin)},
+        }.get(tipo_reporte, {})
+        
+        with db_service.sesion():
+            # Las páginas siguientes solo traen filas; los agregados vienen en la primera
+            datos_reporte = {} if cursor else _obtener_datos_reporte(tipo_reporte, fecha_inicio, fecha_fin,
+                                                                     incluir_filas=False,
+                                                                     comparar_periodos=comparar_periodos)
+            filas_recortadas = db_service.ejecutar_consultas(recortadas) if recortadas else {}
+            if seccion and not solo_resumen:
+                pagina, siguiente = db_service.get_pagina(seccion, fecha_inicio, fecha_fin, limite, cursor)
+        
+        respuesta = {
             'tipo': tipo,
             'datos_preview': datos_reporte,
             'periodo': f"{fecha_inicio} a {fecha_fin}"
-        }), 200
+        }
+        
+        truncado = {}
+        for nombre, filas in filas_recortadas.items():
+            datos_reporte[nombre] = filas[:limite]
+            if len(filas) > limite:
+                truncado[nombre] = {'total': len(filas), 'mostradas': limite}
+        
+        if seccion and not solo_resumen:
+            datos_reporte[seccion] = pagina
+            respuesta['paginacion'] = {
+                'seccion': seccion,
+                'limite': limite,
+                'siguiente': codificar_cursor(*siguiente) if siguiente else None
+            }
+        if truncado:
+            respuesta['truncado'] = truncado
+        
+        return jsonify(respuesta), 200
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Error en preview: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
 # ===== FUNCIONES AUXILIARES =====
 
-def _obtener_datos_reporte(tipo_reporte: str, fecha_inicio: str, fecha_fin: str) -> dict:
-    """Obtiene datos de BD según tipo de reporte"""
+def _ejecutar_pipeline_reporte(datos: dict, avanzar=None) -> dict:
+    """
+    Pipeline completo de /api/reportes/generar: datos de BD, análisis IA, archivos y gráficos
+    
+    `avanzar(etapa, progreso)` se llama al empezar cada etapa (lo usan los jobs
+    para informar el progreso y como punto de cancelación).
+    """
+    avanzar = avanzar or (lambda etapa, progreso: None)
+    
+    tipo_reporte = datos.get('tipo_reporte', 'GENERAL').upper()
+    prompt_custom = datos.get('prompt_custom')
+    
+    # Manejar fechas con valores por defecto (últimos 30 días)
+    fecha_inicio, fecha_fin = _rango_fechas_reporte(datos)
+    
+    formatos = datos.get('formatos', ['json'])
+    incluir_graficos = datos.get('incluir_graficos', False)
+    comparar_periodos = _periodos_comparacion(datos.get('comparar_periodos'))
+    
+    logger.info(f"Generando reporte: {tipo_reporte} para período {fecha_inicio} a {fecha_fin}")
+    
+    # Obtener datos según tipo de reporte (la conexión vuelve al pool antes de llamar a la IA)
+    avanzar('datos', 5)
+    with db_service.sesion():
+        datos_reporte = _obtener_datos_reporte(tipo_reporte, fecha_inicio, fecha_fin,
+                                               comparar_periodos=comparar_periodos)
+    
+    # Generar análisis con IA
+    avanzar('analisis_ia', 30)
+    if prompt_custom:
+        prompt = prompt_custom
+    else:
+        prompt = obtener_prompt(tipo_reporte)
+    
+    # Los datos van una sola vez y compactos (no también como contexto adicional)
+    prompt_final = construir_prompt_reporte(prompt, datos_reporte, PROMPT_PRESUPUESTO_TOKENS)
+    
+    analisis_ia = ia_service.generar_reporte(prompt_final, usar_cache=datos.get('usar_cache_ia', True))
+    
+    # Agregar metadatos
+    resultado = {
+        'tipo_reporte': tipo_reporte,
+        'fecha_generacion': datetime.now().isoformat(),
+        'periodo': f"{fecha_inicio} a {fecha_fin}",
+        'datos': datos_reporte,
+        'analisis_ia': analisis_ia,
+        'archivos_generados': []
+    }
+    
+    # Generar archivos según formatos solicitados
+    for i, formato in enumerate(formatos):
+        avanzar(f'archivo_{formato}', 70 + 20 * i // len(formatos))
+        archivo = _generar_archivo_reporte(tipo_reporte, datos_reporte, analisis_ia, formato,
+                                           fecha_inicio, fecha_fin)
+        if archivo:
+            resultado['archivos_generados'].append({
+                'formato': formato,
+                'ruta': archivo
+            })
+    
+    # Generar gráficos si se solicita
+    if incluir_graficos:
+        avanzar('graficos', 90)
+        graficos = _generar_graficos_reporte(tipo_reporte, datos_reporte)
+        resultado['graficos'] = graficos
+    
+    return resultado
+
+def _rango_fechas_reporte(datos: dict) -> tuple:
+    """(fecha_inicio, fecha_fin) en YYYY-MM-DD desde DD/MM/YYYY o YYYY-MM-DD; por defecto los últimos 30 días"""
+    def convertir_fecha(fecha_str):
+        if not fecha_str or fecha_str.strip() == '':
+            return None
+        for formato in ('%d/%m/%Y', '%Y-%m-%d'):
+            try:
+                return datetime.strptime(fecha_str.strip(), formato).strftime('%Y-%m-%d')
+            except ValueError:
+                continue
+        return None
+    
+    fecha_inicio = convertir_fecha(datos.get('fecha_inicio', ''))
+    fecha_fin = convertir_fecha(datos.get('fecha_fin', ''))
+    if not fecha_inicio:
+        fecha_inicio = (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')
+    if not fecha_fin:
+        fecha_fin = datetime.now().strftime('%Y-%m-%d')
+    return fecha_inicio, fecha_fin
+
+def _evento_sse(evento: str, datos) -> str:
+    """Serializa un evento Server-Sent Events (JSON en una sola línea data:)"""
+    return f"event: {evento}\ndata: {json.dumps(datos, default=str)}\n\n"
+
+def _periodos_comparacion(valor) -> int:
+    """Cantidad de períodos anteriores a comparar (0 = sin comparación), acotada al máximo"""
+    if valor in (None, ''):
+        return 0
+    periodos = int(valor)
+    if periodos < 0:
+        raise ValueError('comparar_periodos no puede ser negativo')
+    return min(periodos, REPORTES_MAX_PERIODOS_COMPARACION)
+
+def _fuente_ventas():
+    """Cubo de ventas si está cargado; si no, la BD (mismos métodos get_*)"""
+    return cubo_ventas if cubo_ventas is not None and cubo_ventas.cargado else db_service
+
+def _fuente_historica():
+    """Snapshots de meses cerrados si están habilitados; si no, la BD (mismos métodos get_*)"""
+    return snapshot_service if snapshot_service is not None and snapshot_service.disponible else db_service
+
+def _granularidad_para(fecha_inicio: str, fecha_fin: str) -> str:
+    """Granularidad por defecto: día hasta ~3 meses, semana hasta 2 años, luego mes"""
+    dias = (datetime.strptime(fecha_fin, '%Y-%m-%d') - datetime.strptime(fecha_inicio, '%Y-%m-%d')).days + 1
+    if dias <= 92:
+        return 'day'
+    if dias <= 731:
+        return 'week'
+    return 'month'
+
+def _obtener_datos_reporte(tipo_reporte: str, fecha_inicio: str, fecha_fin: str, incluir_filas: bool = True,
+                           comparar_periodos: int = 0) -> dict:
+    """
+    Obtiene datos de BD según tipo de reporte
+    
+    Con incluir_filas=False no se traen las secciones fila a fila (ventas, clientes,
+    inventario, productos, produccion, compras): las métricas de resumen salen de
+    queries de agregación con los mismos valores.
+    
+    Con comparar_periodos=N (VENTAS) agrega 'comparacion': el período actual y los N
+    anteriores de igual duración por categoría, producto y cliente, en una sola query.
+    
+    Con el cubo de ventas cargado, VENTAS y CLIENTES salen de memoria (salvo las
+    filas de pedidos de VENTAS).
+    
+    Con snapshots, VENTAS, PRODUCCION y COMPRAS leen los meses cerrados de los
+    archivos Arrow y consultan la BD solo para los días sin snapshot.
+    """
     datos = {
         'tipo': tipo_reporte,
         'periodo': f"{fecha_inicio} a {fecha_fin}"
     }
+    usar_cubo = cubo_ventas is not None and cubo_ventas.cargado
+    historico = _fuente_historica()
     
-    if tipo_reporte == 'VENTAS':
-        datos['ventas'] = db_service.get_ventas_data(fecha_inicio, fecha_fin)
-        datos['por_categoria'] = db_service.get_ventas_por_categoria(fecha_inicio, fecha_fin)
-        datos['top_productos'] = db_service.get_productos_mas_vendidos(fecha_inicio, fecha_fin)
-        datos['clientes'] = db_service.get_clientes_datos(fecha_inicio, fecha_fin)
-        
-        # Calcular métricas de resumen para VENTAS
-        ventas = datos.get('ventas', [])
-        if ventas:
-            datos['total_ventas'] = sum(float(v.get('total', 0)) for v in ventas)
-            datos['cantidad_ordenes'] = len(ventas)
-            datos['ticket_promedio'] = datos['total_ventas'] / datos['cantidad_ordenes'] if datos['cantidad_ordenes'] > 0 else 0
-            datos['productos_vendidos'] = sum(int(v.get('cantidad_items', 0)) for v in ventas)
-            datos['clientes_unicos'] = len(set(str(v.get('cliente', '')) for v in ventas))
+    if tipo_reporte == 'VENTAS' and usar_cubo:
+        datos['por_categoria'] = cubo_ventas.get_ventas_por_categoria(fecha_inicio, fecha_fin)
+        datos['top_productos'] = cubo_ventas.get_productos_mas_vendidos(fecha_inicio, fecha_fin)
+        if incluir_filas:
+            datos['ventas'] = historico.get_ventas_data(fecha_inicio, fecha_fin)
+            datos['clientes'] = cubo_ventas.get_clientes_datos(fecha_inicio, fecha_fin)
+        datos.update(cubo_ventas.get_resumen_ventas(fecha_inicio, fecha_fin))
+    
+    elif tipo_reporte == 'VENTAS' and historico is not db_service:
+        datos['por_categoria'] = historico.get_ventas_por_categoria(fecha_inicio, fecha_fin)
+        datos['top_productos'] = historico.get_productos_mas_vendidos(fecha_inicio, fecha_fin)
+        if incluir_filas:
+            datos['ventas'] = historico.get_ventas_data(fecha_inicio, fecha_fin)
+            datos['clientes'] = db_service.get_clientes_datos(fecha_inicio, fecha_fin)
+        datos.update(historico.get_resumen_ventas(fecha_inicio, fecha_fin))
+    
+    elif tipo_reporte == 'VENTAS':
+        if not incluir_filas:
+            if REPORTES_VENTAS_CONSULTA_UNICA:
+                agregado = db_service.get_ventas_agregado(fecha_inicio, fecha_fin)
+                datos['por_categoria'] = agregado['por_categoria']
+                datos['top_productos'] = agregado['top_productos']
+                datos.update(agregado['resumen'])
+            else:
+                resultados = db_service.ejecutar_consultas({
+                    'por_categoria': (db_service.get_ventas_por_categoria, fecha_inicio, fecha_fin),
+                    'top_productos': (db_service.get_productos_mas_vendidos, fecha_inicio, fecha_fin),
+                    'resumen': (db_service.get_resumen_ventas, fecha_inicio, fecha_fin),
+                })
+                datos['por_categoria'] = resultados['por_categoria']
+                datos['top_productos'] = resultados['top_productos']
+                datos.update(resultados['resumen'])
+        elif REPORTES_VENTAS_CONSULTA_UNICA:
+            # Categorías, top productos y totales salen de un único recorrido del join
+            resultados = db_service.ejecutar_consultas({
+                'ventas': (db_service.get_ventas_data, fecha_inicio, fecha_fin),
+                'agregado': (db_service.get_ventas_agregado, fecha_inicio, fecha_fin),
+                'clientes': (db_service.get_clientes_datos, fecha_inicio, fecha_fin),
+            })
+            agregado = resultados['agregado']
+            datos['ventas'] = resultados['ventas']
+            datos['por_categoria'] = agregado['por_categoria']
+            datos['top_productos'] = agregado['top_productos']
+            datos['clientes'] = resultados['clientes']
+            datos.update(agregado['resumen'])
         else:
-            datos['total_ventas'] = 0
-            datos['cantidad_ordenes'] = 0
-            datos['ticket_promedio'] = 0
-            datos['productos_vendidos'] = 0
-            datos['clientes_unicos'] = 0
+            # Queries independientes: en modo paralelo cada una usa su propia conexión del pool
+            datos.update(db_service.ejecutar_consultas({
+                'ventas': (db_service.get_ventas_data, fecha_inicio, fecha_fin),
+                'por_categoria': (db_service.get_ventas_por_categoria, fecha_inicio, fecha_fin),
+                'top_productos': (db_service.get_productos_mas_vendidos, fecha_inicio, fecha_fin),
+                'clientes': (db_service.get_clientes_datos, fecha_inicio, fecha_fin),
+            }))
+        
+            # Calcular métricas de resumen para VENTAS
+            datos.update(resumir_ventas(datos.get('ventas', [])))
+    
+    elif tipo_reporte == 'INVENTARIO' and not incluir_filas:
+        datos.update(db_service.get_resumen_inventario())
     
     elif tipo_reporte == 'INVENTARIO':
-        datos['inventario'] = db_service.get_inventario_datos()
-        datos['productos'] = db_service.get_productos_stock()
+        datos.update(db_service.ejecutar_consultas({
+            'inventario': (db_service.get_inventario_datos,),
+            'productos': (db_service.get_productos_stock,),
+        }))
         
         # Calcular métricas de resumen para INVENTARIO
         productos = datos.get('productos', [])
@@ -340,30 +842,45 @@ def _obtener_datos_reporte(tipo_reporte: str, fecha_inicio: str, fecha_fin: str)
             datos['items_bajo_stock'] = 0
             datos['rotacion_promedio'] = 0
     
+    elif tipo_reporte == 'PRODUCCION' and not incluir_filas:
+        datos.update(historico.get_resumen_produccion(fecha_inicio, fecha_fin))
+    
     elif tipo_reporte == 'PRODUCCION':
-        datos['produccion'] = db_service.get_produccion_datos(fecha_inicio, fecha_fin)
+        datos['produccion'] = historico.get_produccion_datos(fecha_inicio, fecha_fin)
         
         # Calcular métricas para PRODUCCION
         produccion = datos.get('produccion', [])
         if produccion:
             datos['total_produccion'] = len(produccion)
-            datos['produccion_exitosa'] = len([p for p in produccion if p.get('estado') == 'completada'])
+            datos['produccion_exitosa'] = len([p for p in produccion if p.get('terminado')])
         else:
             datos['total_produccion'] = 0
             datos['produccion_exitosa'] = 0
     
+    elif tipo_reporte == 'COMPRAS' and not incluir_filas:
+        datos.update(historico.get_resumen_compras(fecha_inicio, fecha_fin))
+    
     elif tipo_reporte == 'COMPRAS':
-        datos['compras'] = db_service.get_compras_datos(fecha_inicio, fecha_fin)
+        datos['compras'] = historico.get_compras_datos(fecha_inicio, fecha_fin)
         
         # Calcular métricas para COMPRAS
         compras = datos.get('compras', [])
         if compras:
-            datos['total_compras'] = sum(float(c.get('total', 0)) for c in compras)
+            # Suma de los Decimal (exacta) y recién al final a float, igual que SUM en SQL
+            datos['total_compras'] = float(sum(c.get('total_compra') or 0 for c in compras))
             datos['cantidad_compras'] = len(compras)
         else:
             datos['total_compras'] = 0
             datos['cantidad_compras'] = 0
     
+    elif tipo_reporte == 'CLIENTES' and usar_cubo:
+        if incluir_filas:
+            datos['clientes'] = cubo_ventas.get_clientes_datos(fecha_inicio, fecha_fin)
+        datos.update(cubo_ventas.get_resumen_clientes())
+    
+    elif tipo_reporte == 'CLIENTES' and not incluir_filas:
+        datos.update(db_service.get_resumen_clientes())
+    
     elif tipo_reporte == 'CLIENTES':
         datos['clientes'] = db_service.get_clientes_datos(fecha_inicio, fecha_fin)
         
@@ -374,11 +891,35 @@ def _obtener_datos_reporte(tipo_reporte: str, fecha_inicio: str, fecha_fin: str)
         else:
             datos['cantidad_clientes'] = 0
     
+    elif tipo_reporte == 'TENDENCIAS':
+        # Serie de ventas agregada en la BD: un punto por bucket en vez de cada pedido
+        datos['granularidad'] = _granularidad_para(fecha_inicio, fecha_fin)
+        datos['serie'] = db_service.get_serie_temporal('VENTAS', fecha_inicio, fecha_fin, datos['granularidad'])
+    
+    if comparar_periodos and tipo_reporte == 'VENTAS':
+        datos['comparacion'] = db_service.get_comparacion_ventas(fecha_inicio, fecha_fin, comparar_periodos)
+        datos['variacion_mes_anterior'] = datos['comparacion']['periodos'][0]['variacion']
+    
     return datos
 
-def _generar_archivo_reporte(tipo_reporte: str, datos: dict, analisis_ia: dict, formato: str) -> str:
+def _generar_archivo_reporte(tipo_reporte: str, datos: dict, analisis_ia: dict, formato: str,
+                             fecha_inicio: str = None, fecha_fin: str = None) -> str:
     """Genera archivo de reporte en formato especificado"""
     try:
+        if formato == 'excel_detalle':
+            # Detalle fila a fila leído por lotes desde la BD, sin materializar el período completo
+            if tipo_reporte == 'VENTAS' and fecha_inicio and fecha_fin:
+                lotes = db_service.iterar_ventas_data(fecha_inicio, fecha_fin)
+                return excel_generator.generar_detalle_ventas(db_service.iterar_filas(lotes))
+            return None
+        
+        if formato == 'csv':
+            # Export crudo con COPY, escrito a disco por bloques
+            if tipo_reporte in EXPORTACIONES and fecha_inicio and fecha_fin:
+                bloques = db_service.exportar(tipo_reporte, fecha_inicio, fecha_fin)
+                return csv_generator.guardar_exportacion(bloques, tipo_reporte)
+            return None
+        
         if formato == 'pdf':
             if tipo_reporte == 'VENTAS':
                 return pdf_generator.generar_reporte_ventas({**datos, **analisis_ia})
@@ -407,19 +948,23 @@ def _generar_graficos_reporte(tipo_reporte: str, datos: dict) -> dict:
     
     try:
         if tipo_reporte == 'VENTAS':
-            if datos.get('por_categoria'):
+            if contar_filas(datos.get('por_categoria')):
                 graficos['categorias'] = chart_generator.generar_ventas_por_categoria(datos['por_categoria'])
-            if datos.get('top_productos'):
+            if contar_filas(datos.get('top_productos')):
                 graficos['productos'] = chart_generator.generar_productos_mas_vendidos(datos['top_productos'])
         
         elif tipo_reporte == 'INVENTARIO':
-            if datos.get('inventario'):
+            if contar_filas(datos.get('inventario')):
                 graficos['inventario'] = chart_generator.generar_estado_inventario(datos['inventario'])
         
         elif tipo_reporte == 'CLIENTES':
-            if datos.get('clientes'):
+            if contar_filas(datos.get('clientes')):
                 graficos['clientes'] = chart_generator.generar_pie_clientes(datos['clientes'])
         
+        elif tipo_reporte == 'TENDENCIAS':
+            if contar_filas(datos.get('serie')):
+                graficos['tendencias'] = chart_generator.generar_tendencias_temporales(datos['serie'])
+        
     except Exception as e:
         logger.error(f"Error generando gráficos: {str(e)}")
     
@@ -455,6 +1000,10 @@ def descargar_archivo(ruta_archivo):
             mime_type = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
         elif ruta_archivo.endswith('.png'):
             mime_type = 'image/png'
+        elif ruta_archivo.endswith('.csv'):
+            mime_type = 'text/csv'
+        elif ruta_archivo.endswith('.gz'):
+            mime_type = 'application/gzip'
         else:
             mime_type = 'application/octet-stream'
         
@@ -19,6 +19,72 @@ DB_CONFIG = {
     'sslmode': 'require' if os.getenv('DB_SSL', 'False').lower() == 'true' else 'disable'
 }
 
+# Pool de conexiones
+DB_POOL_MIN = int(os.getenv('DB_POOL_MIN', 2))
+DB_POOL_MAX = int(os.getenv('DB_POOL_MAX', 10))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 30))
+DB_POOL_HEALTH_CHECK = os.getenv('DB_POOL_HEALTH_CHECK', 'True').lower() == 'true'
+
+# Ejecución concurrente de queries independientes (cada una con su conexión del pool)
+REPORTES_CONSULTAS_PARALELAS = os.getenv('REPORTES_CONSULTAS_PARALELAS', 'False').lower() == 'true'
+DB_FANOUT_WORKERS = int(os.getenv('DB_FANOUT_WORKERS', 4))
+
+# VENTAS: categorías, top productos y totales en una sola query (GROUPING SETS)
+REPORTES_VENTAS_CONSULTA_UNICA = os.getenv('REPORTES_VENTAS_CONSULTA_UNICA', 'False').lower() == 'true'
+
+# Comparación con períodos anteriores de igual duración: máximo de períodos por reporte
+REPORTES_MAX_PERIODOS_COMPARACION = int(os.getenv('REPORTES_MAX_PERIODOS_COMPARACION', 12))
+
+# Exportación CSV con COPY: tamaño de cada bloque enviado al cliente
+EXPORT_CHUNK_BYTES = int(os.getenv('EXPORT_CHUNK_BYTES', 256 * 1024))
+
+# Queries con nombre como prepared statements del servidor (por conexión del pool)
+DB_PREPARED_STATEMENTS = os.getenv('DB_PREPARED_STATEMENTS', 'False').lower() == 'true'
+
+# Vista previa: filas por página (por defecto) y tope duro por sección
+MAX_FILAS_REPORTE = int(os.getenv('MAX_FILAS_REPORTE', 1000))
+PREVIEW_FILAS_DEFECTO = int(os.getenv('PREVIEW_FILAS_DEFECTO', 100))
+
+# Cursores del lado del servidor: filas traídas por lote
+DB_STREAM_ITERSIZE = int(os.getenv('DB_STREAM_ITERSIZE', 2000))
+
+# Rollup diario de ventas (MIGRACION_ROLLUP_VENTAS.sql); 0 segundos = sin refresco periódico
+REPORTES_USAR_ROLLUP = os.getenv('REPORTES_USAR_ROLLUP', 'False').lower() == 'true'
+ROLLUP_REFRESCO_SEGUNDOS = float(os.getenv('ROLLUP_REFRESCO_SEGUNDOS', 0))
+
+# Cubo de ventas en memoria (VENTAS/CLIENTES sin consultar la BD); se actualiza cada N segundos
+REPORTES_USAR_CUBO = os.getenv('REPORTES_USAR_CUBO', 'False').lower() == 'true'
+CUBO_REFRESCO_SEGUNDOS = float(os.getenv('CUBO_REFRESCO_SEGUNDOS', 60))
+# Días recientes que cada actualización relee enteros (líneas agregadas tarde, cambios, borrados)
+CUBO_VENTANA_DIAS = int(os.getenv('CUBO_VENTANA_DIAS', 7))
+
+# Snapshots Arrow de meses cerrados (cerrado = terminó hace SNAPSHOTS_DIAS_CIERRE días)
+REPORTES_USAR_SNAPSHOTS = os.getenv('REPORTES_USAR_SNAPSHOTS', 'False').lower() == 'true'
+SNAPSHOTS_DIAS_CIERRE = int(os.getenv('SNAPSHOTS_DIAS_CIERRE', 3))
+SNAPSHOTS_REFRESCO_SEGUNDOS = float(os.getenv('SNAPSHOTS_REFRESCO_SEGUNDOS', 3600))
+
+# Catálogos (categorías, productos, clientes, proveedores, insumos) en memoria: las queries
+# de hechos traen ids y los nombres se unen en Python; se recargan cada N segundos o al invalidarse
+REPORTES_USAR_DIMENSIONES = os.getenv('REPORTES_USAR_DIMENSIONES', 'False').lower() == 'true'
+DIMENSIONES_REFRESCO_SEGUNDOS = float(os.getenv('DIMENSIONES_REFRESCO_SEGUNDOS', 300))
+
+# Reportes asíncronos (/api/reportes/jobs): workers del pipeline, jobs en espera antes de
+# rechazar con 503 y segundos que se conservan los resultados
+JOBS_WORKERS = int(os.getenv('JOBS_WORKERS', 2))
+JOBS_MAX_COLA = int(os.getenv('JOBS_MAX_COLA', 20))
+JOBS_RETENCION_SEGUNDOS = float(os.getenv('JOBS_RETENCION_SEGUNDOS', 3600))
+
+# Cache de resultados de queries (TTL largo para períodos cerrados, corto si incluyen hoy)
+QUERY_CACHE_HABILITADA = os.getenv('QUERY_CACHE_HABILITADA', 'False').lower() == 'true'
+QUERY_CACHE_MAX_BYTES = int(os.getenv('QUERY_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+QUERY_CACHE_TTL_CERRADO = float(os.getenv('QUERY_CACHE_TTL_CERRADO', 3600))
+QUERY_CACHE_TTL_ABIERTO = float(os.getenv('QUERY_CACHE_TTL_ABIERTO', 60))
+
+# Invalidación por LISTEN/NOTIFY (MIGRACION_NOTIFICACIONES.sql): con el listener conectado,
+# los rangos que incluyen hoy sobre tablas notificadas usan QUERY_CACHE_TTL_NOTIFICADO
+CACHE_NOTIFICACIONES = os.getenv('CACHE_NOTIFICACIONES', 'False').lower() == 'true'
+QUERY_CACHE_TTL_NOTIFICADO = float(os.getenv('QUERY_CACHE_TTL_NOTIFICADO', 3600))
+
 # ===== OPENAI / IA =====
 # OpenAI Configuration (Comentado)
 # OPENAI_API_KEY = os.getenv('OPENAI_API_KEY', '')
@@ -33,10 +99,33 @@ GEMINI_BASE_URL = os.getenv('GEMINI_BASE_URL', 'https://generativelanguage.googl
 TEMPERATURE = float(os.getenv('GEMINI_TEMPERATURE', 0.7))
 MAX_TOKENS = int(os.getenv('GEMINI_MAX_TOKENS', 2000))
 
+# Cliente HTTP de Gemini: sesión keep-alive, timeouts (conexión, lectura) y reintentos
+# con backoff para 429/5xx; el cuerpo se comprime con gzip si supera el mínimo
+GEMINI_TIMEOUT_CONEXION = float(os.getenv('GEMINI_TIMEOUT_CONEXION', 5))
+GEMINI_TIMEOUT_LECTURA = float(os.getenv('GEMINI_TIMEOUT_LECTURA', 60))
+GEMINI_REINTENTOS = int(os.getenv('GEMINI_REINTENTOS', 3))
+GEMINI_BACKOFF_BASE = float(os.getenv('GEMINI_BACKOFF_BASE', 0.5))
+GEMINI_BACKOFF_MAX = float(os.getenv('GEMINI_BACKOFF_MAX', 30))
+GEMINI_POOL_CONEXIONES = int(os.getenv('GEMINI_POOL_CONEXIONES', 10))
+GEMINI_COMPRIMIR_REQUEST = os.getenv('GEMINI_COMPRIMIR_REQUEST', 'False').lower() == 'true'
+GEMINI_COMPRIMIR_MIN_BYTES = int(os.getenv('GEMINI_COMPRIMIR_MIN_BYTES', 1024))
+
+# Presupuesto aproximado de tokens para los datos del prompt de reporte (0 = sin límite): al superarlo
+# las secciones fila a fila se reducen a una muestra más un resumen por columna
+PROMPT_PRESUPUESTO_TOKENS = int(os.getenv('PROMPT_PRESUPUESTO_TOKENS', 30000))
+
+# Cache de respuestas IA por hash de modelo + parámetros + prompt (LRU en memoria y archivos en disco)
+LLM_CACHE_HABILITADA = os.getenv('LLM_CACHE_HABILITADA', 'False').lower() == 'true'
+LLM_CACHE_MAX_ENTRADAS_MEMORIA = int(os.getenv('LLM_CACHE_MAX_ENTRADAS_MEMORIA', 256))
+LLM_CACHE_MAX_BYTES_DISCO = int(os.getenv('LLM_CACHE_MAX_BYTES_DISCO', 256 * 1024 * 1024))
+LLM_CACHE_TTL_SEGUNDOS = float(os.getenv('LLM_CACHE_TTL_SEGUNDOS', 7 * 24 * 3600))
+
 # ===== RUTAS =====
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 REPORTS_OUTPUT_DIR = os.path.join(BASE_DIR, os.getenv('REPORTS_OUTPUT_DIR', 'outputs'))
 REPORTS_LOGS_DIR = os.path.join(BASE_DIR, os.getenv('REPORTS_LOGS_DIR', 'logs'))
+SNAPSHOTS_DIR = os.path.join(REPORTS_OUTPUT_DIR, 'snapshots')
+LLM_CACHE_DIR = os.path.join(REPORTS_OUTPUT_DIR, 'cache_ia')
 
 # Crear directorios si no existen
 os.makedirs(REPORTS_OUTPUT_DIR, exist_ok=True)
@@ -82,7 +171,7 @@ ANALYSIS_MODULES = [
 ]
 
 # ===== FORMATOS DE SALIDA =====
-OUTPUT_FORMATS = ['pdf', 'excel', 'json']
+OUTPUT_FORMATS = ['pdf', 'excel', 'excel_detalle', 'csv', 'json']
 GRAPH_FORMATS = ['png', 'svg', 'html']
 
 # ===== CONFIGURACIÓN DE GRÁFICOS =====
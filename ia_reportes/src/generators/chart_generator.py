@@ -6,11 +6,12 @@ from datetime import datetime
 import logging
 import pandas as pd
 from src.config.settings import REPORTS_OUTPUT_DIR, CHART_CONFIG
+from src.utils.helpers import contar_filas
 
 logger = logging.getLogger(__name__)
 
 class ChartGenerator:
-    """Generador de gráficos para reportes"""
+    """Generador de gráficos para reportes (datos como lista de dicts, columnas numpy o DataFrame)"""
     
     def __init__(self):
         self.style = CHART_CONFIG['style']
@@ -191,7 +192,7 @@ class ChartGenerator:
             )
             
             # Ventas por categoría
-            if datos_multiples.get('ventas_categoria'):
+            if contar_filas(datos_multiples.get('ventas_categoria')):
                 df_cat = pd.DataFrame(datos_multiples['ventas_categoria'])
                 fig.add_trace(
                     go.Bar(x=df_cat['categoria'], y=df_cat['total_vendido'], name='Ventas'),
@@ -199,7 +200,7 @@ class ChartGenerator:
                 )
             
             # Top productos
-            if datos_multiples.get('top_productos'):
+            if contar_filas(datos_multiples.get('top_productos')):
                 df_prod = pd.DataFrame(datos_multiples['top_productos']).head(5)
                 fig.add_trace(
                     go.Bar(x=df_prod['producto'], y=df_prod['cantidad'], name='Cantidad'),
@@ -207,7 +208,7 @@ class ChartGenerator:
                 )
             
             # Inventario crítico
-            if datos_multiples.get('inventario_critico'):
+            if contar_filas(datos_multiples.get('inventario_critico')):
                 df_inv = pd.DataFrame(datos_multiples['inventario_critico'])
                 fig.add_trace(
                     go.Bar(x=df_inv['nombre'], y=df_inv['cantidad'], name='Stock'),
@@ -215,7 +216,7 @@ class ChartGenerator:
                 )
             
             # Top clientes
-            if datos_multiples.get('top_clientes'):
+            if contar_filas(datos_multiples.get('top_clientes')):
                 df_cli = pd.DataFrame(datos_multiples['top_clientes']).head(5)
                 fig.add_trace(
                     go.Bar(x=df_cli['nombre'], y=df_cli['total_gastado'], name='Gasto Total'),
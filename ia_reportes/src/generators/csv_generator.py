@@ -0,0 +1,25 @@
+from datetime import datetime
+import logging
+from src.config.settings import REPORTS_OUTPUT_DIR
+
+logger = logging.getLogger(__name__)
+
+class CSVGenerator:
+    """Generador de exportaciones CSV a partir de bloques de bytes (COPY TO STDOUT)"""
+
+    def guardar_exportacion(self, bloques, tipo_reporte: str, comprimido: bool = False) -> str:
+        """Escribe los bloques en un archivo de outputs sin cargarlos completos en memoria"""
+        extension = 'csv.gz' if comprimido else 'csv'
+        filename = f"{REPORTS_OUTPUT_DIR}/Exportacion_{tipo_reporte.capitalize()}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{extension}"
+        try:
+            total = 0
+            with open(filename, 'wb') as archivo:
+                for bloque in bloques:
+                    archivo.write(bloque)
+                    total += len(bloque)
+            logger.info(f"CSV generado: {filename} ({total} bytes)")
+            return filename
+
+        except Exception as e:
+            logger.error(f"Error generando CSV: {str(e)}")
+            raise
@@ -114,6 +114,40 @@ class ExcelGenerator:
             logger.error(f"Error generando Excel de inventario: {str(e)}")
             raise
     
+    def generar_detalle_ventas(self, ventas) -> str:
+        """
+        Genera Excel con el detalle de pedidos a partir de un iterable de filas
+        
+        Usa un workbook write-only: las filas se escriben a medida que llegan
+        (p. ej. desde DatabaseService.iterar_ventas_data) sin retenerlas en memoria.
+        """
+        try:
+            filename = f"{REPORTS_OUTPUT_DIR}/Detalle_Ventas_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+            wb = Workbook(write_only=True)
+            ws = wb.create_sheet("Pedidos")
+            
+            ws.append(['ID', 'Fecha', 'Cliente', 'Items', 'Productos', 'Total'])
+            
+            filas = 0
+            for venta in ventas:
+                ws.append([
+                    venta.get('id'),
+                    venta.get('fecha_pedido'),
+                    venta.get('cliente'),
+                    venta.get('cantidad_items'),
+                    venta.get('productos'),
+                    float(venta.get('total') or 0)
+                ])
+                filas += 1
+            
+            wb.save(filename)
+            logger.info(f"Excel de detalle de ventas generado: {filename} ({filas} filas)")
+            return filename
+            
+        except Exception as e:
+            logger.error(f"Error generando Excel de detalle de ventas: {str(e)}")
+            raise
+    
     def generar_reporte_completo(self, datos_multiples: dict) -> str:
         """Genera Excel con múltiples módulos"""
         try:
@@ -0,0 +1,210 @@
+"""
+Construcción del prompt final con los datos del reporte en formato compacto
+
+Los datos van una sola vez: valores sueltos como `clave: valor`, listas de filas
+como tablas CSV (encabezado una vez en lugar de repetir las claves por fila) y
+estructuras anidadas como JSON minificado. Si se supera el presupuesto de tokens
+se recortan solo las secciones fila a fila (muestra equiespaciada + resumen por
+columna de todas las filas); los agregados se envían completos.
+"""
+
+from collections import Counter
+from datetime import date, datetime
+from decimal import Decimal
+import logging
+import json
+import csv
+import io
+
+logger = logging.getLogger(__name__)
+
+# Secciones fila a fila de _obtener_datos_reporte; el resto son agregados
+SECCIONES_FILAS = ('ventas', 'clientes', 'inventario', 'productos', 'produccion', 'compras')
+
+# Aproximación de Gemini para texto (~4 caracteres por token)
+CARACTERES_POR_TOKEN = 4
+
+# Filas que se codifican para estimar el costo por fila de una sección
+FILAS_MUESTRA_ESTIMACION = 200
+
+def estimar_tokens(texto: str) -> int:
+    """Tokens aproximados de un texto (sin llamar a countTokens)"""
+    return -(-len(texto) // CARACTERES_POR_TOKEN)
+
+def _valor(valor) -> str:
+    if valor is None:
+        return ''
+    if isinstance(valor, (float, Decimal)):
+        # NUMERIC de Postgres llega con 16+ decimales (AVG); 4 alcanzan para el análisis
+        return f"{valor:.4f}".rstrip('0').rstrip('.')
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    return str(valor)
+
+def _es_tabla(valor) -> bool:
+    return isinstance(valor, list) and bool(valor) and all(isinstance(fila, dict) for fila in valor)
+
+def _tabla_csv(filas: list) -> str:
+    """Filas (dicts) como CSV con encabezado; columnas en el orden de aparición"""
+    columnas = list(dict.fromkeys(clave for fila in filas[:FILAS_MUESTRA_ESTIMACION] for clave in fila))
+    salida = io.StringIO()
+    escritor = csv.writer(salida, lineterminator='\n')
+    escritor.writerow(columnas)
+    for fila in filas:
+        escritor.writerow([_valor(fila.get(columna)) for columna in columnas])
+    return salida.getvalue()
+
+def _muestra(filas: list, cantidad: int) -> list:
+    """`cantidad` filas equiespaciadas (cubren todo el período, no solo el inicio)"""
+    if cantidad >= len(filas):
+        return filas
+    if cantidad <= 0:
+        return []
+    paso = len(filas) / cantidad
+    return [filas[int(i * paso)] for i in range(cantidad)]
+
+def _resumen_columnas(filas: list) -> str:
+    """Una línea por columna: suma/min/max/promedio si es numérica, rango si es fecha, top valores si es texto"""
+    lineas = []
+    columnas = list(dict.fromkeys(clave for fila in filas[:FILAS_MUESTRA_ESTIMACION] for clave in fila))
+    for columna in columnas:
+        # Los identificadores no aportan al resumen
+        if columna == 'id' or columna.startswith('id_'):
+            continue
+        valores = [fila.get(columna) for fila in filas if fila.get(columna) is not None]
+        if not valores:
+            continue
+        if all(isinstance(v, (int, float, Decimal)) and not isinstance(v, bool) for v in valores):
+            numeros = [float(v) for v in valores]
+            lineas.append(
+                f"{columna}: suma={_valor(sum(numeros))} min={_valor(min(numeros))} "
+                f"max={_valor(max(numeros))} promedio={_valor(sum(numeros) / len(numeros))}"
+            )
+        elif all(isinstance(v, (datetime, date)) for v in valores):
+            lineas.append(f"{columna}: {_valor(min(valores))} a {_valor(max(valores))}")
+        else:
+            conteo = Counter(_valor(v) for v in valores)
+            frecuentes = ', '.join(f"{valor} ({n})" for valor, n in conteo.most_common(5))
+            lineas.append(f"{columna}: {len(conteo)} distintos; más frecuentes: {frecuentes}")
+    return '\n'.join(lineas)
+
+def _redondear(valor):
+    """Copia de una estructura anidada con floats/Decimals a 4 decimales"""
+    if isinstance(valor, dict):
+        return {clave: _redondear(v) for clave, v in valor.items()}
+    if isinstance(valor, (list, tuple)):
+        return [_redondear(v) for v in valor]
+    if isinstance(valor, (float, Decimal)):
+        return round(float(valor), 4)
+    return valor
+
+def _escalar(clave: str, valor) -> str:
+    if isinstance(valor, (dict, list, tuple)):
+        compacto = json.dumps(_redondear(valor), default=_valor, ensure_ascii=False, separators=(',', ':'))
+        return f"{clave}: {compacto}"
+    return f"{clave}: {_valor(valor)}"
+
+def codificar_datos(datos: dict, presupuesto_tokens: int = 0) -> tuple:
+    """
+    Texto compacto de `datos` y estadísticas (tokens, secciones recortadas)
+
+    Con presupuesto_tokens > 0, si el total estimado lo supera las secciones fila
+    a fila se reducen a una muestra más el resumen de todas sus filas (las chicas
+    que entran en su parte van completas). Los agregados nunca se recortan.
+    """
+    escalares = []
+    agregados = []
+    secciones = {}
+    for clave, valor in datos.items():
+        if clave in SECCIONES_FILAS and _es_tabla(valor):
+            secciones[clave] = valor
+        elif _es_tabla(valor):
+            agregados.append(f"[{clave}] {len(valor)} filas\n{_tabla_csv(valor)}")
+        elif isinstance(valor, list) and not valor:
+            escalares.append(f"{clave}: sin datos")
+        else:
+            escalares.append(_escalar(clave, valor))
+
+    base = '\n'.join(escalares + agregados)
+    tokens_base = estimar_tokens(base)
+
+    # Costo estimado de cada sección completa, a partir de una muestra equiespaciada de filas
+    # (como la que se envía; las primeras pueden ser más angostas, p. ej. ids más cortos)
+    estimados = {}
+    for clave, filas in secciones.items():
+        muestra = _tabla_csv(_muestra(filas, FILAS_MUESTRA_ESTIMACION))
+        por_fila = estimar_tokens(muestra) / min(len(filas), FILAS_MUESTRA_ESTIMACION)
+        estimados[clave] = (por_fila, por_fila * len(filas))
+
+    total_completo = tokens_base + sum(total for _, total in estimados.values())
+    recortadas = {}
+    partes = [base]
+    if presupuesto_tokens <= 0 or total_completo <= presupuesto_tokens:
+        for clave, filas in secciones.items():
+            partes.append(f"[{clave}] {len(filas)} filas\n{_tabla_csv(filas)}")
+    else:
+        resumenes = {clave: _resumen_columnas(filas) for clave, filas in secciones.items()}
+        disponible = max(presupuesto_tokens - tokens_base - sum(estimar_tokens(r) for r in resumenes.values()), 0)
+        
+        # Reparto en partes iguales empezando por la sección más chica: las que entran van
+        # completas y lo que no usan queda para las grandes
+        cantidades = {}
+        pendientes = sorted(secciones, key=lambda clave: estimados[clave][1])
+        while pendientes:
+            clave = pendientes.pop(0)
+            por_fila, total = estimados[clave]
+            cuota = disponible / (len(pendientes) + 1)
+            cantidades[clave] = int(min(total, cuota) / por_fila) if por_fila else 0
+            disponible -= min(total, cuota)
+        
+        for clave, filas in secciones.items():
+            if cantidades[clave] >= len(filas):
+                partes.append(f"[{clave}] {len(filas)} filas\n{_tabla_csv(filas)}")
+                continue
+            muestra = _muestra(filas, cantidades[clave])
+            recortadas[clave] = {'filas': len(filas), 'enviadas': len(muestra)}
+            encabezado = f"[{clave}] muestra equiespaciada de {len(muestra)} de {len(filas)} filas"
+            partes.append(f"{encabezado}\n{_tabla_csv(muestra) if muestra else ''}"
+                          f"[{clave} - resumen de las {len(filas)} filas]\n{resumenes[clave]}\n")
+
+    texto = '\n'.join(partes)
+    tokens = estimar_tokens(texto)
+    if presupuesto_tokens > 0 and tokens_base > presupuesto_tokens:
+        logger.warning(f"Los agregados del reporte ({tokens_base} tokens) superan el presupuesto de {presupuesto_tokens}")
+    return texto, {'tokens': tokens, 'tokens_sin_recorte': round(total_completo), 'recortadas': recortadas}
+
+def _tokens_json_indentado(datos: dict) -> int:
+    """Tokens del formato anterior (JSON con indent=2), extrapolando las secciones grandes desde una muestra"""
+    total = 0
+    for clave, valor in datos.items():
+        if _es_tabla(valor) and len(valor) > FILAS_MUESTRA_ESTIMACION:
+            muestra = json.dumps(valor[:FILAS_MUESTRA_ESTIMACION], indent=2, default=str)
+            total += estimar_tokens(muestra) * len(valor) / FILAS_MUESTRA_ESTIMACION
+        else:
+            total += estimar_tokens(json.dumps({clave: valor}, indent=2, default=str))
+    return round(total)
+
+def construir_prompt_reporte(plantilla: str, datos: dict, presupuesto_tokens: int = 0) -> str:
+    """
+    Prompt final: la plantilla con los datos compactos en {datos}
+
+    Si la plantilla (p. ej. un prompt_custom) no tiene {datos}, se agregan al final.
+    """
+    texto, estadisticas = codificar_datos(datos, presupuesto_tokens)
+    bloque = f"Datos (tablas en CSV con encabezado):\n{texto}"
+    if '{datos}' in plantilla:
+        prompt = plantilla.replace('{datos}', bloque)
+    else:
+        prompt = f"{plantilla}\n\n{bloque}"
+
+    if logger.isEnabledFor(logging.INFO):
+        # Formato anterior: JSON con indent=2 enviado dos veces (en el prompt y como contexto adicional)
+        anterior = 2 * _tokens_json_indentado(datos)
+        ahorro = anterior - estimar_tokens(bloque)
+        logger.info(
+            f"Prompt de reporte: {estimar_tokens(prompt)} tokens estimados "
+            f"(datos {estadisticas['tokens']}, antes {anterior}, ahorro {ahorro} "
+            f"= {100 * ahorro / anterior if anterior else 0:.0f}%)"
+            + (f"; recortadas: {estadisticas['recortadas']}" if estadisticas['recortadas'] else '')
+        )
+    return prompt
@@ -0,0 +1,208 @@
+from collections import OrderedDict
+from datetime import date, datetime
+import threading
+import time
+import sys
+import re
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Tablas referenciadas por una query (FROM/JOIN), sin contar los nombres de CTEs
+_PATRON_TABLAS = re.compile(r'\b(?:FROM|JOIN)\s+([A-Za-z_][\w.]*)', re.IGNORECASE)
+_PATRON_CTES = re.compile(r'\b([A-Za-z_]\w*)\s+AS\s*\(', re.IGNORECASE)
+
+class _Entrada:
+    """Resultado cacheado con su metadata de expiración e invalidación"""
+
+    __slots__ = ('valor', 'bytes', 'expira', 'tablas', 'desde', 'hasta')
+
+    def __init__(self, valor, bytes_estimados, expira, tablas, desde, hasta):
+        self.valor = valor
+        self.bytes = bytes_estimados
+        self.expira = expira
+        self.tablas = tablas
+        self.desde = desde
+        self.hasta = hasta
+
+class QueryCache:
+    """Cache LRU en memoria de resultados de queries, acotada por bytes y con TTL por entrada"""
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, ttl_cerrado: float = 3600,
+                 ttl_abierto: float = 60, ttl_notificado: float = 3600):
+        self.max_bytes = max_bytes
+        self.ttl_cerrado = ttl_cerrado
+        self.ttl_abierto = ttl_abierto
+        self.ttl_notificado = ttl_notificado
+        # Tablas cuyos cambios llegan por LISTEN/NOTIFY mientras el listener está conectado
+        self.tablas_notificadas = frozenset()
+
+        self._entradas = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        # Estadísticas
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expiradas = 0
+        self._invalidadas = 0
+
+    # ===== CLAVES Y POLÍTICA =====
+    @staticmethod
+    def _a_fecha(valor):
+        """Convierte un parámetro a date si representa una fecha; None en otro caso"""
+        if isinstance(valor, datetime):
+            return valor.date()
+        if isinstance(valor, date):
+            return valor
+        if isinstance(valor, str) and len(valor) >= 10:
+            try:
+                return datetime.fromisoformat(valor).date()
+            except ValueError:
+                return None
+        return None
+
+    @staticmethod
+    def clave(query: str, params=None) -> tuple:
+        """Clave normalizada: SQL sin diferencias de espacios + parámetros"""
+        sql = ' '.join(query.split())
+        if params is None:
+            return (sql, ())
+        if isinstance(params, dict):
+            return (sql, tuple(sorted((k, repr(v)) for k, v in params.items())))
+        return (sql, tuple(repr(v) for v in params))
+
+    @staticmethod
+    def tablas_de(query: str) -> frozenset:
+        """Tablas referenciadas por la query, en mayúsculas"""
+        ctes = {nombre.upper() for nombre in _PATRON_CTES.findall(query)}
+        return frozenset(
+            nombre.upper() for nombre in _PATRON_TABLAS.findall(query)
+            if nombre.upper() not in ctes
+        )
+
+    def rango_de(self, params) -> tuple:
+        """(desde, hasta) de las fechas presentes en los parámetros, o (None, None)"""
+        valores = params.values() if isinstance(params, dict) else (params or ())
+        fechas = [f for f in (self._a_fecha(v) for v in valores) if f is not None]
+        if not fechas:
+            return None, None
+        return min(fechas), max(fechas)
+
+    def ttl_para(self, hasta, tablas=frozenset()) -> float:
+        """
+        TTL según el período consultado
+
+        Un período cerrado (termina antes de hoy) ya no cambia y usa el TTL largo;
+        si incluye hoy o no tiene fechas (estado actual) se usa el TTL corto, salvo
+        que todas sus tablas notifiquen sus cambios (se invalida al cambiar).
+        """
+        if hasta is not None and hasta < date.today():
+            return self.ttl_cerrado
+        if tablas and tablas <= self.tablas_notificadas:
+            return self.ttl_notificado
+        return self.ttl_abierto
+
+    @staticmethod
+    def estimar_bytes(filas) -> int:
+        """Tamaño aproximado en memoria de una lista de filas (dicts) o de columnas numpy"""
+        if isinstance(filas, dict):
+            return sum(getattr(columna, 'nbytes', sys.getsizeof(columna)) for columna in filas.values())
+        total = sys.getsizeof(filas)
+        for fila in filas:
+            total += sys.getsizeof(fila)
+            valores = fila.values() if isinstance(fila, dict) else fila
+            for valor in valores:
+                total += sys.getsizeof(valor)
+        return total
+
+    # ===== OPERACIONES =====
+    def obtener(self, clave):
+        """Retorna (True, valor) si hay entrada vigente, (False, None) si no"""
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is None:
+                self._misses += 1
+                return False, None
+            if entrada.expira <= time.monotonic():
+                self._quitar(clave)
+                self._expiradas += 1
+                self._misses += 1
+                return False, None
+            self._entradas.move_to_end(clave)
+            self._hits += 1
+            return True, entrada.valor
+
+    def guardar(self, clave, valor, query: str, params=None):
+        """Guarda un resultado, desalojando las entradas menos usadas si no entra"""
+        bytes_estimados = self.estimar_bytes(valor)
+        if bytes_estimados > self.max_bytes:
+            logger.info(f"Resultado de {bytes_estimados} bytes excede la cache; no se guarda")
+            return
+
+        desde, hasta = self.rango_de(params)
+        tablas = self.tablas_de(query)
+        entrada = _Entrada(
+            valor, bytes_estimados, time.monotonic() + self.ttl_para(hasta, tablas),
+            tablas, desde, hasta
+        )
+
+        with self._lock:
+            if clave in self._entradas:
+                self._quitar(clave)
+            while self._entradas and self._bytes + bytes_estimados > self.max_bytes:
+                self._quitar(next(iter(self._entradas)))
+                self._evictions += 1
+            self._entradas[clave] = entrada
+            self._bytes += bytes_estimados
+
+    def _quitar(self, clave):
+        """Elimina una entrada (llamar con el lock tomado)"""
+        entrada = self._entradas.pop(clave)
+        self._bytes -= entrada.bytes
+
+    def invalidar(self, tablas=None, fecha_inicio=None, fecha_fin=None) -> int:
+        """
+        Elimina entradas y retorna cuántas se quitaron
+
+        Sin argumentos vacía la cache. Con `tablas` solo quita las entradas que
+        leen alguna de ellas; con fechas, solo las que se solapan con el rango
+        (las entradas sin fechas siempre se consideran solapadas).
+        """
+        tablas = {t.upper() for t in tablas} if tablas else None
+        desde = self._a_fecha(fecha_inicio) if fecha_inicio else date.min
+        hasta = self._a_fecha(fecha_fin) if fecha_fin else date.max
+
+        with self._lock:
+            claves = [
+                clave for clave, entrada in self._entradas.items()
+                if (tablas is None or tablas & entrada.tablas)
+                and (entrada.desde is None or (entrada.desde <= hasta and entrada.hasta >= desde))
+            ]
+            for clave in claves:
+                self._quitar(clave)
+            self._invalidadas += len(claves)
+
+        logger.info(f"Cache de queries: {len(claves)} entradas invalidadas")
+        return len(claves)
+
+    def estadisticas(self) -> dict:
+        """Retorna métricas actuales de la cache"""
+        with self._lock:
+            consultas = self._hits + self._misses
+            return {
+                'entradas': len(self._entradas),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_ratio': round(self._hits / consultas, 4) if consultas else 0,
+                'evictions': self._evictions,
+                'expiradas': self._expiradas,
+                'invalidadas': self._invalidadas,
+                'ttl_cerrado_s': self.ttl_cerrado,
+                'ttl_abierto_s': self.ttl_abierto,
+                'ttl_notificado_s': self.ttl_notificado,
+                'tablas_notificadas': sorted(self.tablas_notificadas)
+            }
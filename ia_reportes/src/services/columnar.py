@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+from psycopg2 import extensions
+import logging
+
+logger = logging.getLogger(__name__)
+
+# OIDs de los tipos de PostgreSQL que se decodifican a arrays tipados
+OID_BOOL = 16
+OID_ENTEROS = (20, 21, 23)
+OID_FLOTANTES = (700, 701)
+OID_NUMERIC = 1700
+OID_DATE = 1082
+OID_TIMESTAMP = 1114
+
+# numeric -> float directo (sin pasar por Decimal); fechas como texto ISO, que numpy parsea por bloque
+_NUMERIC_FLOAT = extensions.new_type(
+    (OID_NUMERIC,), 'NUMERIC_FLOAT', lambda valor, cursor: float(valor) if valor is not None else None
+)
+_FECHA_TEXTO = extensions.new_type((OID_DATE, OID_TIMESTAMP), 'FECHA_TEXTO', lambda valor, cursor: valor)
+
+def registrar_tipos(cursor):
+    """Registra en el cursor (solo en él) los decodificadores del modo columnar"""
+    extensions.register_type(_NUMERIC_FLOAT, cursor)
+    extensions.register_type(_FECHA_TEXTO, cursor)
+
+def _dtype(oid: int, valores) -> str:
+    """dtype numpy de una columna según el tipo de PostgreSQL (y si tiene NULLs)"""
+    if oid == OID_NUMERIC or oid in OID_FLOTANTES:
+        return 'float64'
+    if oid == OID_DATE:
+        return 'datetime64[D]'
+    if oid == OID_TIMESTAMP:
+        return 'datetime64[us]'
+    if oid in OID_ENTEROS:
+        # Un NULL no cabe en int64: se usa float64 con NaN
+        return 'float64' if None in valores else 'int64'
+    if oid == OID_BOOL and None not in valores:
+        return 'bool'
+    return 'object'
+
+def a_columnas(lotes, descripcion) -> dict:
+    """
+    Convierte lotes de tuplas (fetchmany) en un dict columna -> np.ndarray
+
+    Solo se mantiene en memoria un lote de tuplas a la vez; cada lote se
+    vuelca a arrays por columna y se concatenan al final.
+    """
+    nombres = [columna.name for columna in descripcion]
+    oids = [columna.type_code for columna in descripcion]
+    partes = [[] for _ in nombres]
+
+    for lote in lotes:
+        for indice, valores in enumerate(zip(*lote)):
+            partes[indice].append(np.array(valores, dtype=_dtype(oids[indice], valores)))
+
+    columnas = {}
+    for nombre, oid, arrays in zip(nombres, oids, partes):
+        if not arrays:
+            columnas[nombre] = np.array([], dtype=_dtype(oid, ()))
+        elif len(arrays) == 1:
+            columnas[nombre] = arrays[0]
+        else:
+            columnas[nombre] = np.concatenate(arrays)
+    return columnas
+
+def a_dataframe(columnas: dict) -> pd.DataFrame:
+    """DataFrame sobre los arrays de a_columnas (sin pasar por dicts por fila)"""
+    return pd.DataFrame(columnas, copy=False)
+
+def bytes_columnas(columnas: dict) -> int:
+    """Memoria de los arrays (los object cuentan solo los punteros)"""
+    return sum(array.nbytes for array in columnas.values())
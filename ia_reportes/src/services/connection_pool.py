@@ -0,0 +1,206 @@
+import psycopg2
+from psycopg2.pool import PoolError
+import threading
+import time
+import logging
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+class ConnectionPool:
+    """Pool acotado y thread-safe de conexiones PostgreSQL"""
+
+    def __init__(self, db_config: dict, minimo: int = 1, maximo: int = 10,
+                 timeout_espera: float = 30.0, verificar_al_tomar: bool = True):
+        if minimo < 0 or maximo < 1 or minimo > maximo:
+            raise ValueError(f"Tamaño de pool inválido: minimo={minimo}, maximo={maximo}")
+
+        self.db_config = db_config
+        self.minimo = minimo
+        self.maximo = maximo
+        self.timeout_espera = timeout_espera
+        self.verificar_al_tomar = verificar_al_tomar
+
+        self._libres = []
+        self._en_uso = set()
+        self._condicion = threading.Condition()
+        self._cerrado = False
+
+        # Estadísticas
+        self._esperando = 0
+        self._total_tomas = 0
+        self._total_esperas = 0
+        self._tiempo_espera_total = 0.0
+        self._tiempo_espera_max = 0.0
+        self._conexiones_creadas = 0
+        self._conexiones_descartadas = 0
+
+        # Callback opcional para reportar tiempo de espera (segundos)
+        self.on_espera = None
+
+    def _crear_conexion(self):
+        """Abre una conexión nueva con la BD"""
+        conexion = psycopg2.connect(**self.db_config)
+        with self._condicion:
+            self._conexiones_creadas += 1
+        return conexion
+
+    def _descartar(self, conexion):
+        """Cierra una conexión sin devolverla al pool"""
+        with self._condicion:
+            self._conexiones_descartadas += 1
+        try:
+            conexion.close()
+        except Exception:
+            pass
+
+    def _es_saludable(self, conexion) -> bool:
+        """Verifica que la conexión siga viva antes de entregarla"""
+        if conexion.closed:
+            return False
+        if not self.verificar_al_tomar:
+            return True
+        try:
+            with conexion.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conexion.rollback()
+            return True
+        except Exception as e:
+            logger.warning(f"Conexión del pool descartada por health check: {str(e)}")
+            return False
+
+    def calentar(self):
+        """Abre por adelantado las conexiones mínimas del pool"""
+        with self._condicion:
+            faltantes = self.minimo - (len(self._libres) + len(self._en_uso))
+        nuevas = [self._crear_conexion() for _ in range(max(faltantes, 0))]
+        with self._condicion:
+            self._libres.extend(nuevas)
+            self._condicion.notify_all()
+        logger.info(f"Pool de conexiones listo ({len(self._libres)} conexiones abiertas)")
+
+    def tomar(self, timeout: float = None):
+        """Toma una conexión del pool, esperando si está agotado"""
+        timeout = self.timeout_espera if timeout is None else timeout
+        inicio = time.monotonic()
+        espero = False
+
+        with self._condicion:
+            while True:
+                if self._cerrado:
+                    raise PoolError("El pool de conexiones está cerrado")
+
+                if self._libres:
+                    conexion = self._libres.pop()
+                    break
+
+                if len(self._en_uso) < self.maximo:
+                    conexion = None
+                    break
+
+                restante = timeout - (time.monotonic() - inicio)
+                if restante <= 0:
+                    raise PoolError(
+                        f"Tiempo de espera agotado ({timeout}s) para obtener conexión del pool"
+                    )
+
+                espero = True
+                self._esperando += 1
+                try:
+                    self._condicion.wait(restante)
+                finally:
+                    self._esperando -= 1
+
+            # Reservar el cupo antes de salir del lock para respetar el máximo
+            marcador = object()
+            self._en_uso.add(marcador)
+
+        try:
+            if conexion is not None and not self._es_saludable(conexion):
+                self._descartar(conexion)
+                conexion = None
+            if conexion is None:
+                conexion = self._crear_conexion()
+        except Exception:
+            with self._condicion:
+                self._en_uso.discard(marcador)
+                self._condicion.notify()
+            raise
+
+        espera = time.monotonic() - inicio
+        with self._condicion:
+            self._en_uso.discard(marcador)
+            self._en_uso.add(conexion)
+            self._total_tomas += 1
+            if espero:
+                self._total_esperas += 1
+            self._tiempo_espera_total += espera
+            self._tiempo_espera_max = max(self._tiempo_espera_max, espera)
+
+        if self.on_espera:
+            self.on_espera(espera)
+
+        return conexion
+
+    def devolver(self, conexion, descartar: bool = False):
+        """Devuelve una conexión al pool"""
+        if not descartar and not conexion.closed:
+            try:
+                # Dejar la conexión sin transacción abierta
+                conexion.rollback()
+            except Exception as e:
+                logger.warning(f"No se pudo reciclar conexión: {str(e)}")
+                descartar = True
+
+        with self._condicion:
+            self._en_uso.discard(conexion)
+            reciclar = not descartar and not conexion.closed and not self._cerrado
+            if reciclar:
+                self._libres.append(conexion)
+            self._condicion.notify()
+
+        if not reciclar:
+            self._descartar(conexion)
+
+    @contextmanager
+    def conexion(self, timeout: float = None):
+        """Context manager que toma y devuelve una conexión"""
+        conexion = self.tomar(timeout)
+        descartar = False
+        try:
+            yield conexion
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            descartar = True
+            raise
+        finally:
+            # finally también cubre GeneratorExit de generadores abandonados
+            self.devolver(conexion, descartar=descartar)
+
+    def cerrar(self):
+        """Cierra todas las conexiones libres y rechaza nuevas tomas"""
+        with self._condicion:
+            self._cerrado = True
+            libres, self._libres = self._libres, []
+            self._condicion.notify_all()
+        for conexion in libres:
+            self._descartar(conexion)
+        logger.info("Pool de conexiones cerrado")
+
+    def estadisticas(self) -> dict:
+        """Retorna métricas actuales del pool"""
+        with self._condicion:
+            return {
+                'minimo': self.minimo,
+                'maximo': self.maximo,
+                'en_uso': len(self._en_uso),
+                'libres': len(self._libres),
+                'esperando': self._esperando,
+                'total_tomas': self._total_tomas,
+                'total_esperas': self._total_esperas,
+                'tiempo_espera_total_s': round(self._tiempo_espera_total, 6),
+                'tiempo_espera_promedio_s': round(self._tiempo_espera_total / self._total_tomas, 6) if self._total_tomas else 0,
+                'tiempo_espera_max_s': round(self._tiempo_espera_max, 6),
+                'conexiones_creadas': self._conexiones_creadas,
+                'conexiones_descartadas': self._conexiones_descartadas,
+                'cerrado': self._cerrado
+            }
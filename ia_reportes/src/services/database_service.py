@@ -1,74 +1,912 @@
 import psycopg2
 from psycopg2.extras import RealDictCursor
-from src.config.settings import DB_CONFIG
+from psycopg2.errors import UndefinedTable
+from psycopg2.pool import PoolError
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from src.config.settings import (
+    DB_CONFIG, DB_POOL_MIN, DB_POOL_MAX, DB_POOL_TIMEOUT, DB_POOL_HEALTH_CHECK,
+    REPORTES_CONSULTAS_PARALELAS, DB_FANOUT_WORKERS, DB_STREAM_ITERSIZE, REPORTES_USAR_ROLLUP,
+    QUERY_CACHE_HABILITADA, QUERY_CACHE_MAX_BYTES, QUERY_CACHE_TTL_CERRADO, QUERY_CACHE_TTL_ABIERTO,
+    QUERY_CACHE_TTL_NOTIFICADO, REPORTES_USAR_DIMENSIONES, DIMENSIONES_REFRESCO_SEGUNDOS,
+    DB_PREPARED_STATEMENTS, EXPORT_CHUNK_BYTES
+)
+from src.services.connection_pool import ConnectionPool
+from src.services.cache_service import QueryCache
+from src.services.query_registry import QueryRegistry
+from src.services.metrics_service import MetricsService, estimar_bytes
+from src.services.dimension_cache import DimensionCache
+from src.services.columnar import registrar_tipos, a_columnas, a_dataframe, bytes_columnas
+from src.utils.helpers import calcular_variacion_porcentual
+from datetime import date, datetime, timedelta
+from collections import deque
+import threading
+import queue
+import zlib
+import sys
+import time
+import itertools
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Contador para nombres únicos de cursores del lado del servidor
+_cursor_ids = itertools.count(1)
+
+# Una fila por pedido con sus productos (compartida por la versión completa y la de streaming)
+QUERY_VENTAS_DATA = """
+SELECT 
+    p.id,
+    p.fecha_pedido,
+    p.total,
+    c.nombre as cliente,
+    COUNT(pp.id_producto) as cantidad_items,
+    STRING_AGG(pr.nombre, ', ') as productos
+FROM PEDIDO p
+LEFT JOIN CLIENTE c ON p.ci_cliente = c.ci
+LEFT JOIN PEDIDO_PRODUCTO pp ON p.id = pp.id_pedido
+LEFT JOIN PRODUCTO pr ON pp.id_producto = pr.id
+WHERE p.fecha_pedido BETWEEN %s AND %s
+GROUP BY p.id, c.nombre
+ORDER BY p.fecha_pedido DESC
+"""
+
+# Una fila por línea de pedido (exportación contable)
+QUERY_VENTAS_LINEAS = """
+SELECT 
+    p.id as id_pedido,
+    p.fecha_pedido,
+    p.ci_cliente,
+    c.nombre as cliente,
+    pr.nombre as producto,
+    cat.nombre as categoria,
+    pp.cantidad,
+    pp.precio,
+    pp.total
+FROM PEDIDO p
+JOIN PEDIDO_PRODUCTO pp ON p.id = pp.id_pedido
+JOIN PRODUCTO pr ON pp.id_producto = pr.id
+LEFT JOIN CATEGORIA cat ON pr.id_categoria = cat.id
+LEFT JOIN CLIENTE c ON p.ci_cliente = c.ci
+WHERE p.fecha_pedido BETWEEN %s AND %s
+ORDER BY p.fecha_pedido, p.id
+"""
+
+QUERY_PRODUCCION_DATOS = """
+SELECT 
+    prod.id,
+    prod.fecha,
+    prod.descripcion,
+    prod.terminado,
+    r.id as id_receta,
+    pr.nombre as producto
+FROM PRODUCCION prod
+JOIN RECETA r ON prod.id_receta = r.id
+JOIN PRODUCTO pr ON r.id_producto = pr.id
+WHERE prod.fecha BETWEEN %s AND %s
+ORDER BY prod.fecha DESC
+"""
+
+QUERY_COMPRAS_DATOS = """
+SELECT 
+    nc.id,
+    nc.fecha_pedido,
+    nc.fecha_entrega,
+    pr.nombre as proveedor,
+    SUM(ci.cantidad) as cantidad_items,
+    SUM(ci.total) as total_compra
+FROM NOTA_COMPRA nc
+JOIN PROVEEDOR pr ON nc.codigo_proveedor = pr.codigo
+LEFT JOIN COMPRA_INSUMO ci ON nc.id = ci.id_nota_compra
+WHERE nc.fecha_pedido BETWEEN %s AND %s
+GROUP BY nc.id, pr.nombre, nc.fecha_pedido, nc.fecha_entrega
+ORDER BY nc.fecha_pedido DESC
+"""
+
+QUERY_COMPRAS_DATOS_IDS = """
+SELECT 
+    nc.id,
+    nc.fecha_pedido,
+    nc.fecha_entrega,
+    nc.codigo_proveedor,
+    SUM(ci.cantidad) as cantidad_items,
+    SUM(ci.total) as total_compra
+FROM NOTA_COMPRA nc
+LEFT JOIN COMPRA_INSUMO ci ON nc.id = ci.id_nota_compra
+WHERE nc.fecha_pedido BETWEEN %s AND %s
+GROUP BY nc.id
+ORDER BY nc.fecha_pedido DESC
+"""
+
+# Clientes distintos (por nombre) de un conjunto de pedidos con columna `cliente`. Como en
+# resumir_ventas, los pedidos sin cliente cuentan como un cliente más
+SQL_CLIENTES_UNICOS = "COUNT(DISTINCT cliente) + COALESCE(MAX(CASE WHEN cliente IS NULL THEN 1 ELSE 0 END), 0)"
+
+# Resúmenes de PRODUCCION y COMPRAS sobre las mismas filas que QUERY_PRODUCCION_DATOS y
+# QUERY_COMPRAS_DATOS (también los usa SnapshotService para los días sin snapshot)
+QUERY_RESUMEN_PRODUCCION = """
+SELECT 
+    COUNT(*) as total_produccion,
+    COUNT(*) FILTER (WHERE prod.terminado) as produccion_exitosa
+FROM PRODUCCION prod
+JOIN RECETA r ON prod.id_receta = r.id
+JOIN PRODUCTO pr ON r.id_producto = pr.id
+WHERE prod.fecha BETWEEN %s AND %s
+"""
+
+QUERY_RESUMEN_COMPRAS = """
+SELECT 
+    COUNT(DISTINCT nc.id) as cantidad_compras,
+    SUM(ci.total) as total_compras
+FROM NOTA_COMPRA nc
+JOIN PROVEEDOR pr ON nc.codigo_proveedor = pr.codigo
+LEFT JOIN COMPRA_INSUMO ci ON nc.id = ci.id_nota_compra
+WHERE nc.fecha_pedido BETWEEN %s AND %s
+"""
+
+# Páginas de la vista previa: keyset sobre (fecha, id) descendentes. {cursor} queda vacío
+# en la primera página y en las siguientes filtra las filas posteriores a la última enviada
+QUERY_VENTAS_PAGINA = """
+SELECT 
+    p.id,
+    p.fecha_pedido,
+    p.total,
+    c.nombre as cliente,
+    COUNT(pp.id_producto) as cantidad_items,
+    STRING_AGG(pr.nombre, ', ') as productos
+FROM PEDIDO p
+LEFT JOIN CLIENTE c ON p.ci_cliente = c.ci
+LEFT JOIN PEDIDO_PRODUCTO pp ON p.id = pp.id_pedido
+LEFT JOIN PRODUCTO pr ON pp.id_producto = pr.id
+WHERE p.fecha_pedido BETWEEN %s AND %s{cursor}
+GROUP BY p.id, c.nombre
+ORDER BY p.fecha_pedido DESC, p.id DESC
+LIMIT %s
+"""
+
+QUERY_PRODUCCION_PAGINA = """
+SELECT 
+    prod.id,
+    prod.fecha,
+    prod.descripcion,
+    prod.terminado,
+    r.id as id_receta,
+    pr.nombre as producto
+FROM PRODUCCION prod
+JOIN RECETA r ON prod.id_receta = r.id
+JOIN PRODUCTO pr ON r.id_producto = pr.id
+WHERE prod.fecha BETWEEN %s AND %s{cursor}
+ORDER BY prod.fecha DESC, prod.id DESC
+LIMIT %s
+"""
+
+QUERY_COMPRAS_PAGINA = """
+SELECT 
+    nc.id,
+    nc.fecha_pedido,
+    nc.fecha_entrega,
+    pr.nombre as proveedor,
+    SUM(ci.cantidad) as cantidad_items,
+    SUM(ci.total) as total_compra
+FROM NOTA_COMPRA nc
+JOIN PROVEEDOR pr ON nc.codigo_proveedor = pr.codigo
+LEFT JOIN COMPRA_INSUMO ci ON nc.id = ci.id_nota_compra
+WHERE nc.fecha_pedido BETWEEN %s AND %s{cursor}
+GROUP BY nc.id, pr.nombre, nc.fecha_pedido, nc.fecha_entrega
+ORDER BY nc.fecha_pedido DESC, nc.id DESC
+LIMIT %s
+"""
+
+# sección -> (query, columna fecha, columna id, campo fecha en la fila)
+PAGINAS = {
+    'ventas': (QUERY_VENTAS_PAGINA, 'p.fecha_pedido', 'p.id', 'fecha_pedido'),
+    'produccion': (QUERY_PRODUCCION_PAGINA, 'prod.fecha', 'prod.id', 'fecha'),
+    'compras': (QUERY_COMPRAS_PAGINA, 'nc.fecha_pedido', 'nc.id', 'fecha_pedido')
+}
+
+# Series temporales: fuente (fecha, valor) de cada tipo, agregada por bucket de date_trunc
+SERIES = {
+    'VENTAS': "SELECT p.fecha_pedido as fecha, p.total as valor FROM PEDIDO p WHERE p.fecha_pedido BETWEEN %s AND %s",
+    'PRODUCCION': "SELECT prod.fecha as fecha, 1 as valor FROM PRODUCCION prod WHERE prod.fecha BETWEEN %s AND %s",
+    'COMPRAS': """SELECT nc.fecha_pedido as fecha, ci.total as valor
+        FROM NOTA_COMPRA nc
+        JOIN COMPRA_INSUMO ci ON nc.id = ci.id_nota_compra
+        WHERE nc.fecha_pedido BETWEEN %s AND %s"""
+}
+
+# Granularidad (también en español) -> unidad de date_trunc. Las columnas de SERIES son
+# DATE (sin hora), así que la mínima es el día
+GRANULARIDADES = {
+    'day': 'day', 'dia': 'day',
+    'week': 'week', 'semana': 'week',
+    'month': 'month', 'mes': 'month'
+}
+
+# Datasets exportables con COPY (todas reciben fecha_inicio, fecha_fin)
+EXPORTACIONES = {
+    'VENTAS': QUERY_VENTAS_LINEAS,
+    'PEDIDOS': QUERY_VENTAS_DATA,
+    'PRODUCCION': QUERY_PRODUCCION_DATOS,
+    'COMPRAS': QUERY_COMPRAS_DATOS
+}
+
+# Separadores admitidos en COPY ... CSV (literal SQL de cada uno)
+SEPARADORES_COPY = {',': "','", ';': "';'", '\t': "E'\\t'"}
+
+# Marca de fin del stream de COPY
+_FIN_COPY = object()
+
+class _CancelacionCopy(Exception):
+    """El consumidor del stream de COPY dejó de leer"""
+
+class _EscritorCopy:
+    """Destino de copy_expert: agrupa las filas en bloques (opcionalmente gzip) y los encola"""
+    
+    def __init__(self, cola: queue.Queue, cancelado: threading.Event, tam_bloque: int, comprimir: bool):
+        self.cola = cola
+        self.cancelado = cancelado
+        self.tam_bloque = tam_bloque
+        # wbits=31: formato gzip (cabecera + CRC), no deflate crudo
+        self.compresor = zlib.compressobj(6, zlib.DEFLATED, 31) if comprimir else None
+        self.buffer = bytearray()
+        self.bytes_leidos = 0
+        # psycopg2 entrega una fila por llamada a write (la primera es el encabezado)
+        self.escrituras = 0
+    
+    def encolar(self, item):
+        """Encola respetando backpressure; aborta si el consumidor se fue"""
+        while True:
+            if self.cancelado.is_set():
+                raise _CancelacionCopy()
+            try:
+                self.cola.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+    
+    def write(self, datos):
+        self.escrituras += 1
+        self.bytes_leidos += len(datos)
+        self.buffer += self.compresor.compress(datos) if self.compresor else datos
+        if len(self.buffer) >= self.tam_bloque:
+            self.encolar(bytes(self.buffer))
+            self.buffer.clear()
+    
+    def cerrar(self):
+        """Vacía el último bloque (y el final del stream gzip)"""
+        if self.compresor:
+            self.buffer += self.compresor.flush()
+        if self.buffer:
+            self.encolar(bytes(self.buffer))
+            self.buffer.clear()
+
 class DatabaseService:
     """Servicio de conexión a base de datos"""
     
-    def __init__(self):
-        self.connection = None
+    def __init__(self, pool: ConnectionPool = None, consultas_paralelas: bool = REPORTES_CONSULTAS_PARALELAS,
+                 workers_paralelos: int = DB_FANOUT_WORKERS, usar_rollup: bool = REPORTES_USAR_ROLLUP,
+                 cache: QueryCache = None, registry: QueryRegistry = None, metricas: MetricsService = None,
+                 usar_dimensiones: bool = REPORTES_USAR_DIMENSIONES):
+        self.pool = pool
+        self._pool_lock = threading.Lock()
+        # Conexión reservada por cada hilo (un request de Flask = un hilo)
+        self._local = threading.local()
+        self.consultas_paralelas = consultas_paralelas
+        self.workers_paralelos = workers_paralelos
+        self._executor = None
+        self.usar_rollup = usar_rollup
+        if cache is None and QUERY_CACHE_HABILITADA:
+            cache = QueryCache(
+                max_bytes=QUERY_CACHE_MAX_BYTES,
+                ttl_cerrado=QUERY_CACHE_TTL_CERRADO,
+                ttl_abierto=QUERY_CACHE_TTL_ABIERTO,
+                ttl_notificado=QUERY_CACHE_TTL_NOTIFICADO
+            )
+        self.cache = cache
+        self.registry = registry or QueryRegistry(habilitado=DB_PREPARED_STATEMENTS)
+        self.metricas = metricas or MetricsService()
+        # Catálogos en memoria: las queries de hechos traen ids y los nombres se unen aquí
+        self.dimensiones = DimensionCache(self, DIMENSIONES_REFRESCO_SEGUNDOS) if usar_dimensiones else None
+        if self.pool is not None and self.pool.on_espera is None:
+            self.pool.on_espera = self.metricas.registrar_espera_pool
+    
+    @property
+    def connection(self):
+        """Conexión reservada por el hilo actual, si existe"""
+        return getattr(self._local, 'connection', None)
+    
+    def _obtener_pool(self) -> ConnectionPool:
+        """Crea el pool de forma perezosa la primera vez que se necesita"""
+        if self.pool is None:
+            with self._pool_lock:
+                if self.pool is None:
+                    self.pool = ConnectionPool(
+                        DB_CONFIG,
+                        minimo=DB_POOL_MIN,
+                        maximo=DB_POOL_MAX,
+                        timeout_espera=DB_POOL_TIMEOUT,
+                        verificar_al_tomar=DB_POOL_HEALTH_CHECK
+                    )
+                    self.pool.on_espera = self.metricas.registrar_espera_pool
+        return self.pool
+    
+    def iniciar_pool(self):
+        """Abre las conexiones mínimas del pool (warm-up al arrancar)"""
+        try:
+            self._obtener_pool().calentar()
+        except Exception as e:
+            logger.error(f"Error calentando pool de conexiones: {str(e)}")
+            raise
+    
+    def cerrar_pool(self):
+        """Cierra el pool y todas sus conexiones libres"""
+        if self._executor:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        if self.pool:
+            self.pool.cerrar()
+    
+    def estadisticas_pool(self) -> dict:
+        """Retorna métricas del pool (en uso, esperando, tiempos de espera)"""
+        if self.pool is None:
+            return {'inicializado': False}
+        return {'inicializado': True, **self.pool.estadisticas()}
     
     def connect(self):
-        """Establece conexión con BD"""
+        """Reserva una conexión del pool para el hilo actual"""
+        if self.connection is not None:
+            return
         try:
-            self.connection = psycopg2.connect(**DB_CONFIG)
-            logger.info("Conexión a BD establecida")
+            self._local.connection = self._obtener_pool().tomar()
+            logger.info("Conexión a BD tomada del pool")
         except Exception as e:
             logger.error(f"Error conectando a BD: {str(e)}")
             raise
     
     def disconnect(self):
-        """Cierra conexión con BD"""
-        if self.connection:
-            self.connection.close()
-            logger.info("Conexión a BD cerrada")
+        """Devuelve la conexión del hilo actual al pool"""
+        conexion = self.connection
+        if conexion is not None:
+            self._local.connection = None
+            self._obtener_pool().devolver(conexion)
+            logger.info("Conexión a BD devuelta al pool")
     
-    def execute_query(self, query: str, params=None):
-        """Ejecuta query y retorna resultados"""
+    @contextmanager
+    def sesion(self):
+        """Reserva una conexión del pool mientras dura el bloque (un request)"""
+        propia = self.connection is None
+        if propia:
+            self.connect()
         try:
-            with self.connection.cursor(cursor_factory=RealDictCursor) as cursor:
-                cursor.execute(query, params)
-                return cursor.fetchall()
+            yield self.connection
+        finally:
+            if propia:
+                self.disconnect()
+    
+    @contextmanager
+    def _cursor(self, cursor_factory=RealDictCursor, nombre: str = None):
+        """Cursor sobre la conexión del hilo o, si no hay, sobre una tomada solo para esta query"""
+        conexion = self.connection
+        if conexion is not None:
+            try:
+                with conexion.cursor(name=nombre, cursor_factory=cursor_factory) as cursor:
+                    yield cursor
+            except Exception:
+                # Evita que la transacción abortada contamine las siguientes queries del request
+                if not conexion.closed:
+                    conexion.rollback()
+                raise
+        else:
+            with self._obtener_pool().conexion() as conexion:
+                with conexion.cursor(name=nombre, cursor_factory=cursor_factory) as cursor:
+                    yield cursor
+    
+    def _workers_fanout(self) -> int:
+        """Workers del fan-out: a lo sumo el máximo del pool menos uno (la conexión del llamador)"""
+        return max(min(self.workers_paralelos, self._obtener_pool().maximo - 1), 0)
+    
+    def _obtener_executor(self) -> ThreadPoolExecutor:
+        """Thread pool compartido para ejecutar queries en paralelo"""
+        if self._executor is None:
+            workers = self._workers_fanout()
+            with self._pool_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=workers,
+                        thread_name_prefix='db-fanout'
+                    )
+        return self._executor
+    
+    def ejecutar_consultas(self, tareas: dict, paralelo: bool = None) -> dict:
+        """
+        Ejecuta varias queries independientes y retorna sus resultados por clave
+        
+        Args:
+            tareas: {clave: (metodo, *args)}
+            paralelo: None usa la configuración del servicio
+        
+        En modo paralelo el hilo que llama va tomando tareas con su conexión (la de
+        su sesión, si la tiene) y los workers del executor toman las demás solo si
+        consiguen una conexión libre sin esperar. Así un request que retiene su
+        conexión nunca queda esperando workers que esperan al pool: con el pool
+        agotado las tareas corren en serie en el llamador. El dict resultante
+        conserva el orden de las claves.
+        """
+        paralelo = self.consultas_paralelas if paralelo is None else paralelo
+        
+        if not paralelo or len(tareas) < 2 or self._workers_fanout() < 1:
+            return {clave: metodo(*args) for clave, (metodo, *args) in tareas.items()}
+        
+        pendientes = deque(tareas.items())
+        resultados = {}
+        lock = threading.Lock()
+        
+        def _siguiente():
+            with lock:
+                return pendientes.popleft() if pendientes else None
+        
+        def _ejecutar_pendientes():
+            while True:
+                tarea = _siguiente()
+                if tarea is None:
+                    return
+                clave, (metodo, *args) = tarea
+                try:
+                    resultados[clave] = (True, metodo(*args))
+                except Exception as e:
+                    resultados[clave] = (False, e)
+        
+        executor = self._obtener_executor()
+        llamador = self._llamador()
+        futuros = [
+            executor.submit(self._trabajar_fanout, llamador, _ejecutar_pendientes, lambda: bool(pendientes))
+            for _ in range(min(len(tareas) - 1, self._workers_fanout()))
+        ]
+        with self.sesion():
+            _ejecutar_pendientes()
+        # Los workers que no llegaron a empezar ya no tienen tareas; solo se espera a los que corren
+        for futuro in futuros:
+            if not futuro.cancel():
+                futuro.result()
+        
+        salida = {}
+        for clave in tareas:
+            correcto, valor = resultados[clave]
+            if not correcto:
+                raise valor
+            salida[clave] = valor
+        return salida
+    
+    def _trabajar_fanout(self, llamador: str, ejecutar, hay_pendientes):
+        """Worker del fan-out: ejecuta tareas pendientes si hay una conexión libre en el pool, sin esperarla"""
+        if not hay_pendientes():
+            return
+        try:
+            conexion = self._obtener_pool().tomar(timeout=0)
+        except PoolError:
+            return
         except Exception as e:
+            # Sin conexión propia las tareas las termina el llamador
+            logger.warning(f"Worker de fan-out sin conexión: {str(e)}")
+            return
+        self._local.connection = conexion
+        self._local.llamador = llamador
+        try:
+            ejecutar()
+        finally:
+            self._local.connection = None
+            self._local.llamador = None
+            self._obtener_pool().devolver(conexion)
+    
+    def _llamador(self) -> str:
+        """Primera función fuera de este módulo en la pila (etiqueta 'caller' de las métricas)"""
+        llamador = getattr(self._local, 'llamador', None)
+        if llamador:
+            return llamador
+        frame = sys._getframe(1)
+        while frame is not None:
+            modulo = frame.f_globals.get('__name__', '')
+            if modulo != __name__ and not modulo.startswith(('concurrent.', 'threading', 'contextlib')):
+                return frame.f_code.co_name
+            frame = frame.f_back
+        return 'desconocido'
+    
+    def _consulta_actual(self, nombre: str) -> str:
+        """Nombre de la query para métricas: el registrado o el método get_* que la ejecuta"""
+        if nombre:
+            return nombre
+        frame = sys._getframe(2)
+        while frame is not None and frame.f_globals.get('__name__') == __name__:
+            if frame.f_code.co_name.startswith(('get_', 'iterar_')):
+                return frame.f_code.co_name
+            frame = frame.f_back
+        return 'sin_nombre'
+    
+    def _ejecutar(self, cursor, query: str, params=None, nombre: str = None):
+        """Ejecuta en el cursor, como prepared statement si la query tiene nombre"""
+        if nombre:
+            self.registry.ejecutar(cursor, nombre, query, params)
+        else:
+            cursor.execute(query, params)
+    
+    def execute_query(self, query: str, params=None, usar_cache: bool = True, nombre: str = None):
+        """Ejecuta query y retorna resultados (desde la cache si hay una entrada vigente)"""
+        if self.cache is not None and usar_cache:
+            clave = QueryCache.clave(query, params)
+            encontrado, filas = self.cache.obtener(clave)
+            if encontrado:
+                # Copia de la lista para que el llamador no altere la entrada cacheada
+                return list(filas)
+        consulta = self._consulta_actual(nombre)
+        inicio = time.perf_counter()
+        try:
+            with self._cursor() as cursor:
+                self._ejecutar(cursor, query, params, nombre)
+                filas = cursor.fetchall()
+        except Exception as e:
+            self.metricas.registrar_query(consulta, self._llamador(), time.perf_counter() - inicio, error=True)
             logger.error(f"Error ejecutando query: {str(e)}")
             raise
+        self.metricas.registrar_query(consulta, self._llamador(), time.perf_counter() - inicio,
+                                      len(filas), estimar_bytes(filas))
+        if self.cache is not None and usar_cache:
+            self.cache.guardar(clave, filas, query, params)
+            return list(filas)
+        return filas
+    
+    def estadisticas_consultas(self) -> dict:
+        """Retorna tiempos de preparación/ejecución por sentencia con nombre"""
+        return {
+            'prepared_statements': self.registry.habilitado,
+            'sentencias': self.registry.estadisticas()
+        }
+    
+    def estadisticas_cache(self) -> dict:
+        """Retorna métricas de la cache de queries"""
+        if self.cache is None:
+            return {'habilitada': False}
+        return {'habilitada': True, **self.cache.estadisticas()}
+    
+    def invalidar_cache(self, tablas=None, fecha_inicio=None, fecha_fin=None) -> int:
+        """Invalida entradas de la cache de queries (todas si no se indica filtro) y las dimensiones afectadas"""
+        if self.dimensiones is not None:
+            self.dimensiones.invalidar(tablas)
+        if self.cache is None:
+            return 0
+        return self.cache.invalidar(tablas, fecha_inicio, fecha_fin)
     
-    def execute_single(self, query: str, params=None):
+    def execute_single(self, query: str, params=None, nombre: str = None):
         """Ejecuta query y retorna un solo resultado"""
+        consulta = self._consulta_actual(nombre)
+        inicio = time.perf_counter()
         try:
-            with self.connection.cursor(cursor_factory=RealDictCursor) as cursor:
-                cursor.execute(query, params)
-                return cursor.fetchone()
+            with self._cursor() as cursor:
+                self._ejecutar(cursor, query, params, nombre)
+                fila = cursor.fetchone()
         except Exception as e:
+            self.metricas.registrar_query(consulta, self._llamador(), time.perf_counter() - inicio, error=True)
             logger.error(f"Error ejecutando query: {str(e)}")
             raise
+        self.metricas.registrar_query(consulta, self._llamador(), time.perf_counter() - inicio,
+                                      1 if fila else 0, estimar_bytes([fila]) if fila else 0)
+        return fila
+    
+    def execute_columnar(self, query: str, params=None, nombre: str = None, itersize: int = None,
+                         usar_cache: bool = False) -> dict:
+        """
+        Ejecuta query y retorna un dict columna -> np.ndarray tipado
+        
+        numeric/float -> float64, enteros -> int64 (float64 si hay NULLs), date ->
+        datetime64[D], timestamp -> datetime64[us], texto -> object. No crea un dict
+        por fila ni objetos Decimal/date. Con usar_cache=True pasa por la caché de
+        resultados (en entradas propias, separadas de las de execute_query).
+        """
+        if self.cache is not None and usar_cache:
+            clave = ('columnar',) + QueryCache.clave(query, params)
+            encontrado, columnas = self.cache.obtener(clave)
+            if encontrado:
+                # Dict nuevo para que el llamador no altere la entrada cacheada
+                return dict(columnas)
+        itersize = itersize or DB_STREAM_ITERSIZE
+        consulta = self._consulta_actual(nombre)
+        inicio = time.perf_counter()
+        try:
+            with self._cursor(cursor_factory=None) as cursor:
+                registrar_tipos(cursor)
+                self._ejecutar(cursor, query, params, nombre)
+                columnas = a_columnas(iter(lambda: cursor.fetchmany(itersize), []), cursor.description)
+        except Exception as e:
+            self.metricas.registrar_query(consulta, self._llamador(), time.perf_counter() - inicio, error=True)
+            logger.error(f"Error ejecutando query columnar: {str(e)}")
+            raise
+        filas = len(next(iter(columnas.values()), ()))
+        self.metricas.registrar_query(consulta, self._llamador(), time.perf_counter() - inicio,
+                                      filas, bytes_columnas(columnas))
+        if self.cache is not None and usar_cache:
+            self.cache.guardar(clave, columnas, query, params)
+            return dict(columnas)
+        return columnas
+    
+    def execute_dataframe(self, query: str, params=None, nombre: str = None, usar_cache: bool = False):
+        """Igual que execute_columnar pero como pandas.DataFrame"""
+        return a_dataframe(self.execute_columnar(query, params, nombre, usar_cache=usar_cache))
+    
+    def iterar_query(self, query: str, params=None, itersize: int = None, nombre: str = 'stream'):
+        """
+        Ejecuta query con un cursor del lado del servidor y retorna las filas por lotes
+        
+        Cada lote es una lista de hasta `itersize` dicts; la memoria usada no depende
+        del total de filas. La conexión queda reservada hasta agotar o cerrar el generador.
+        """
+        itersize = itersize or DB_STREAM_ITERSIZE
+        llamador = self._llamador()
+        inicio = time.perf_counter()
+        filas = 0
+        bytes_leidos = 0
+        error = False
+        try:
+            with self._cursor(nombre=f"stream_{next(_cursor_ids)}") as cursor:
+                cursor.itersize = itersize
+                cursor.execute(query, params)
+                while True:
+                    lote = cursor.fetchmany(itersize)
+                    if not lote:
+                        break
+                    filas += len(lote)
+                    bytes_leidos += estimar_bytes(lote)
+                    yield lote
+        except Exception as e:
+            error = True
+            logger.error(f"Error ejecutando query en streaming: {str(e)}")
+            raise
+        finally:
+            # Incluye el tiempo que el consumidor tardó entre lotes
+            self.metricas.registrar_query(nombre, llamador, time.perf_counter() - inicio,
+                                          filas, bytes_leidos, error=error)
+    
+    @staticmethod
+    def iterar_filas(lotes):
+        """Aplana un iterador de lotes en un iterador de filas"""
+        return itertools.chain.from_iterable(lotes)
+    
+    # ===== EXPORTACIÓN (COPY) =====
+    def exportar_copy(self, query: str, params=None, separador: str = ',', comprimir: bool = False,
+                      tam_bloque: int = None, nombre: str = 'copy'):
+        """
+        Ejecuta COPY (query) TO STDOUT en CSV y retorna un generador de bloques de bytes
+        
+        Postgres arma el CSV; los bytes pasan a la respuesta sin crear filas en Python.
+        El COPY corre en un hilo con su propia conexión del pool y una cola acotada
+        frena a la BD si el cliente lee más lento. Cerrar el generador cancela el COPY.
+        """
+        if separador not in SEPARADORES_COPY:
+            raise ValueError(f"Separador no soportado: {separador!r}")
+        opciones = f"FORMAT csv, HEADER true, DELIMITER {SEPARADORES_COPY[separador]}"
+        tam_bloque = tam_bloque or EXPORT_CHUNK_BYTES
+        cola = queue.Queue(maxsize=8)
+        cancelado = threading.Event()
+        escritor = _EscritorCopy(cola, cancelado, tam_bloque, comprimir)
+        pool = self._obtener_pool()
+        llamador = self._llamador()
+        
+        def _copiar():
+            inicio = time.perf_counter()
+            descartar = False
+            try:
+                conexion = pool.tomar()
+            except Exception as e:
+                cola.put(e)
+                return
+            try:
+                with conexion.cursor() as cursor:
+                    codificacion = psycopg2.extensions.encodings[conexion.encoding]
+                    select = cursor.mogrify(query, params).decode(codificacion)
+                    cursor.copy_expert(f"COPY ({select}) TO STDOUT WITH ({opciones})", escritor)
+                escritor.cerrar()
+                escritor.encolar(_FIN_COPY)
+                duracion = time.perf_counter() - inicio
+                self.metricas.registrar_query(nombre, llamador, duracion, max(escritor.escrituras - 1, 0),
+                                              escritor.bytes_leidos)
+                logger.info(f"COPY exportado: {escritor.bytes_leidos} bytes en {duracion:.2f}s")
+            except _CancelacionCopy:
+                # La conexión quedó a mitad de un COPY: no se recicla
+                descartar = True
+                conexion.cancel()
+                logger.warning("Exportación COPY cancelada por el cliente")
+            except Exception as e:
+                descartar = True
+                self.metricas.registrar_query(nombre, llamador, time.perf_counter() - inicio, error=True)
+                logger.error(f"Error exportando con COPY: {str(e)}")
+                try:
+                    escritor.encolar(e)
+                except _CancelacionCopy:
+                    pass
+            finally:
+                pool.devolver(conexion, descartar=descartar)
+        
+        hilo = threading.Thread(target=_copiar, name='copy-export', daemon=True)
+        hilo.start()
+        
+        def _bloques():
+            try:
+                while True:
+                    item = cola.get()
+                    if item is _FIN_COPY:
+                        return
+                    if isinstance(item, Exception):
+                        raise item
+                    yield item
+            finally:
+                cancelado.set()
+        
+        return _bloques()
+    
+    def exportar(self, tipo: str, fecha_inicio, fecha_fin, separador: str = ',', comprimir: bool = False):
+        """Exporta con COPY uno de los datasets de EXPORTACIONES"""
+        query = EXPORTACIONES.get(tipo)
+        if query is None:
+            raise ValueError(f"Tipo de exportación no soportado: {tipo}")
+        return self.exportar_copy(query, (fecha_inicio, fecha_fin), separador, comprimir,
+                                  nombre=f"exportar_{tipo.lower()}")
+    
+    # ===== ROLLUP DIARIO =====
+    @staticmethod
+    def _es_rango_de_dias(fecha_inicio, fecha_fin) -> bool:
+        """True si ambos extremos son días completos (el rollup no tiene granularidad horaria)"""
+        for valor in (fecha_inicio, fecha_fin):
+            if isinstance(valor, datetime):
+                if valor.time() != datetime.min.time():
+                    return False
+            elif isinstance(valor, date):
+                continue
+            elif isinstance(valor, str):
+                try:
+                    date.fromisoformat(valor)
+                except ValueError:
+                    return False
+            else:
+                return False
+        return True
+    
+    def _usar_rollup(self, fecha_inicio, fecha_fin) -> bool:
+        """
+        Decide si un agregado por rango de fechas puede leerse del rollup diario
+        
+        Requiere rango de días completos, rollup cargado y ningún día del rango
+        pendiente de refresco; en cualquier otro caso se usan las tablas originales.
+        """
+        if not self.usar_rollup or not self._es_rango_de_dias(fecha_inicio, fecha_fin):
+            return False
+        try:
+            estado = self.execute_single(
+                """
+                SELECT 
+                    EXISTS(SELECT 1 FROM ROLLUP_ESTADO WHERE NOMBRE = 'VENTA_DIARIA') as cargado,
+                    EXISTS(SELECT 1 FROM VENTA_DIARIA_CAMBIO WHERE FECHA BETWEEN %s AND %s) as pendiente
+                """,
+                (fecha_inicio, fecha_fin),
+                nombre='rollup_estado'
+            )
+        except UndefinedTable:
+            logger.warning("Rollup de ventas no instalado (MIGRACION_ROLLUP_VENTAS.sql); se desactiva")
+            self.usar_rollup = False
+            return False
+        return estado['cargado'] and not estado['pendiente']
+    
+    # ===== PAGINACIÓN =====
+    def get_pagina(self, seccion: str, fecha_inicio, fecha_fin, limite: int, despues: tuple = None) -> tuple:
+        """Una página de filas de la sección; retorna (filas, (fecha, id) de la última fila o None si no hay más)"""
+        query, columna_fecha, columna_id, campo_fecha = PAGINAS[seccion]
+        params = [fecha_inicio, fecha_fin]
+        if despues is None:
+            query = query.format(cursor='')
+            nombre = f'{seccion}_pagina'
+        else:
+            query = query.format(cursor=f"\n    AND ({columna_fecha}, {columna_id}) < (%s, %s)")
+            nombre = f'{seccion}_pagina_siguiente'
+            params += list(despues)
+        
+        # Una fila de más para saber si existe una página siguiente
+        filas = self.execute_query(query, tuple(params + [limite + 1]), nombre=nombre)
+        if len(filas) <= limite:
+            return filas, None
+        filas = filas[:limite]
+        return filas, (filas[-1][campo_fecha], filas[-1]['id'])
+    
+    # ===== DIMENSIONES (nombres unidos en memoria) =====
+    # Mismas claves, orden y valores que las versiones con JOIN a los catálogos
+    def _con_nombre(self, filas, columna_id: str, tabla: str, columna_nombre: str, posicion: int = 0) -> list:
+        """
+        Reemplaza `columna_id` por el nombre del catálogo en `columna_nombre` (en `posicion`)
+        
+        Las filas cuyo id no está en el catálogo se descartan, como haría el JOIN.
+        """
+        catalogo = self.dimensiones.filas(tabla, {fila[columna_id] for fila in filas})
+        resultado = []
+        for fila in filas:
+            dimension = catalogo.get(fila[columna_id])
+            if dimension is None:
+                continue
+            valores = [(clave, valor) for clave, valor in fila.items() if clave != columna_id]
+            valores.insert(posicion, (columna_nombre, dimension['nombre']))
+            resultado.append(dict(valores))
+        return resultado
+    
+    def _unir_clientes(self, filas) -> list:
+        """Todos los clientes del catálogo con sus agregados del período (LEFT JOIN), mayor gasto primero"""
+        por_ci = {fila['ci_cliente']: fila for fila in filas}
+        clientes = self.dimensiones.filas('CLIENTE', por_ci.keys())
+        resultado = []
+        for ci, cliente in clientes.items():
+            fila = por_ci.get(ci)
+            resultado.append({
+                'ci': ci,
+                'nombre': cliente['nombre'],
+                'total_pedidos': fila['total_pedidos'] if fila else 0,
+                'total_gastado': fila['total_gastado'] if fila else None,
+                'ticket_promedio': fila['ticket_promedio'] if fila else None,
+                'ultima_compra': fila['ultima_compra'] if fila else None
+            })
+        # ORDER BY total_gastado DESC NULLS LAST
+        resultado.sort(key=lambda fila: (fila['total_gastado'] is None, -(fila['total_gastado'] or 0)))
+        return resultado
     
     # ===== QUERIES VENTAS =====
     def get_ventas_data(self, fecha_inicio, fecha_fin):
         """Obtiene datos de ventas en período"""
-        query = """
-        SELECT 
-            p.id,
-            p.fecha_pedido,
-            p.total,
-            c.nombre as cliente,
-            COUNT(pp.id_producto) as cantidad_items,
-            STRING_AGG(pr.nombre, ', ') as productos
-        FROM PEDIDO p
-        LEFT JOIN CLIENTE c ON p.ci_cliente = c.ci
-        LEFT JOIN PEDIDO_PRODUCTO pp ON p.id = pp.id_pedido
-        LEFT JOIN PRODUCTO pr ON pp.id_producto = pr.id
-        WHERE p.fecha_pedido BETWEEN %s AND %s
-        GROUP BY p.id, c.nombre
-        ORDER BY p.fecha_pedido DESC
-        """
-        return self.execute_query(query, (fecha_inicio, fecha_fin))
+        return self.execute_query(QUERY_VENTAS_DATA, (fecha_inicio, fecha_fin), nombre='ventas_data')
+    
+    def get_ventas_columnas(self, fecha_inicio, fecha_fin) -> dict:
+        """Igual que get_ventas_data pero en columnas numpy (ver execute_columnar)"""
+        return self.execute_columnar(QUERY_VENTAS_DATA, (fecha_inicio, fecha_fin), nombre='ventas_data')
+    
+    def iterar_ventas_data(self, fecha_inicio, fecha_fin, itersize: int = None):
+        """Igual que get_ventas_data pero por lotes desde un cursor del lado del servidor"""
+        return self.iterar_query(QUERY_VENTAS_DATA, (fecha_inicio, fecha_fin), itersize, nombre='ventas_data_stream')
     
     def get_ventas_por_categoria(self, fecha_inicio, fecha_fin):
         """Obtiene ventas agregadas por categoría"""
+        if self._usar_rollup(fecha_inicio, fecha_fin):
+            query = """
+            SELECT 
+                cat.nombre as categoria,
+                v.cantidad_vendida,
+                v.total_vendido,
+                COALESCE(vc.pedidos, 0) as pedidos
+            FROM (
+                SELECT id_categoria, SUM(cantidad) as cantidad_vendida, SUM(total) as total_vendido
+                FROM VENTA_DIARIA
+                WHERE fecha BETWEEN %s AND %s
+                GROUP BY id_categoria
+            ) v
+            JOIN CATEGORIA cat ON v.id_categoria = cat.id
+            LEFT JOIN (
+                SELECT id_categoria, SUM(pedidos) as pedidos
+                FROM VENTA_DIARIA_CATEGORIA
+                WHERE fecha BETWEEN %s AND %s
+                GROUP BY id_categoria
+            ) vc ON v.id_categoria = vc.id_categoria
+            ORDER BY total_vendido DESC
+            """
+            return self.execute_query(query, (fecha_inicio, fecha_fin, fecha_inicio, fecha_fin), nombre='ventas_por_categoria_rollup')
+        
+        if self.dimensiones is not None:
+            query = """
+            SELECT 
+                pr.id_categoria,
+                SUM(pp.cantidad) as cantidad_vendida,
+                SUM(pp.total) as total_vendido,
+                COUNT(DISTINCT p.id) as pedidos
+            FROM PEDIDO p
+            JOIN PEDIDO_PRODUCTO pp ON p.id = pp.id_pedido
+            JOIN PRODUCTO pr ON pp.id_producto = pr.id
+            WHERE p.fecha_pedido BETWEEN %s AND %s
+            GROUP BY pr.id_categoria
+            ORDER BY total_vendido DESC
+            """
+            filas = self.execute_query(query, (fecha_inicio, fecha_fin), nombre='ventas_por_categoria_ids')
+            return self._con_nombre(filas, 'id_categoria', 'CATEGORIA', 'categoria')
+        
         query = """
         SELECT 
             cat.nombre as categoria,
@@ -83,10 +921,44 @@ class DatabaseService:
         GROUP BY cat.nombre
         ORDER BY total_vendido DESC
         """
-        return self.execute_query(query, (fecha_inicio, fecha_fin))
+        return self.execute_query(query, (fecha_inicio, fecha_fin), nombre='ventas_por_categoria')
     
     def get_productos_mas_vendidos(self, fecha_inicio, fecha_fin, limite=10):
         """Obtiene productos más vendidos"""
+        if self._usar_rollup(fecha_inicio, fecha_fin):
+            query = """
+            SELECT 
+                pr.nombre as producto,
+                SUM(v.cantidad) as cantidad,
+                SUM(v.total) as total_vendido,
+                SUM(v.suma_precio) / SUM(v.lineas) as precio_promedio
+            FROM VENTA_DIARIA v
+            JOIN PRODUCTO pr ON v.id_producto = pr.id
+            WHERE v.fecha BETWEEN %s AND %s
+            GROUP BY pr.nombre
+            ORDER BY cantidad DESC
+            LIMIT %s
+            """
+            return self.execute_query(query, (fecha_inicio, fecha_fin, limite), nombre='productos_mas_vendidos_rollup')
+        
+        if self.dimensiones is not None:
+            # Los nombres de producto son únicos: agrupar por id equivale a agrupar por nombre
+            query = """
+            SELECT 
+                pp.id_producto,
+                SUM(pp.cantidad) as cantidad,
+                SUM(pp.total) as total_vendido,
+                AVG(pp.precio) as precio_promedio
+            FROM PEDIDO_PRODUCTO pp
+            JOIN PEDIDO p ON pp.id_pedido = p.id
+            WHERE p.fecha_pedido BETWEEN %s AND %s
+            GROUP BY pp.id_producto
+            ORDER BY cantidad DESC
+            LIMIT %s
+            """
+            filas = self.execute_query(query, (fecha_inicio, fecha_fin, limite), nombre='productos_mas_vendidos_ids')
+            return self._con_nombre(filas, 'id_producto', 'PRODUCTO', 'producto')
+        
         query = """
         SELECT 
             pr.nombre as producto,
@@ -101,10 +973,266 @@ class DatabaseService:
         ORDER BY cantidad DESC
         LIMIT %s
         """
-        return self.execute_query(query, (fecha_inicio, fecha_fin, limite))
+        return self.execute_query(query, (fecha_inicio, fecha_fin, limite), nombre='productos_mas_vendidos')
+    
+    def get_ventas_agregado(self, fecha_inicio, fecha_fin, limite=10):
+        """
+        Ventas por categoría, top productos y totales del período en una sola query
+        
+        Equivale a get_ventas_por_categoria + get_productos_mas_vendidos + las métricas
+        de resumen calculadas sobre get_ventas_data, pero con un único recorrido del
+        join PEDIDO ⋈ PEDIDO_PRODUCTO ⋈ PRODUCTO ⋈ CATEGORIA (GROUPING SETS).
+        """
+        query = f"""
+        WITH pedidos AS (
+            SELECT 
+                p.id,
+                p.total,
+                c.nombre as cliente
+            FROM PEDIDO p
+            LEFT JOIN CLIENTE c ON p.ci_cliente = c.ci
+            WHERE p.fecha_pedido BETWEEN %s AND %s
+        ),
+        agregados AS (
+            SELECT 
+                CASE
+                    WHEN GROUPING(cat.nombre) = 0 THEN 'categoria'
+                    WHEN GROUPING(pr.nombre) = 0 THEN 'producto'
+                    ELSE 'lineas'
+                END as seccion,
+                cat.nombre as categoria,
+                pr.nombre as producto,
+                SUM(pp.cantidad) as cantidad,
+                SUM(pp.total) as total_vendido,
+                AVG(pp.precio) as precio_promedio,
+                COUNT(DISTINCT p.id) as pedidos,
+                COUNT(*) as lineas
+            FROM pedidos p
+            JOIN PEDIDO_PRODUCTO pp ON p.id = pp.id_pedido
+            JOIN PRODUCTO pr ON pp.id_producto = pr.id
+            JOIN CATEGORIA cat ON pr.id_categoria = cat.id
+            GROUP BY GROUPING SETS ((cat.nombre), (pr.nombre), ())
+        ),
+        ranking AS (
+            SELECT 
+                a.*,
+                ROW_NUMBER() OVER (
+                    PARTITION BY seccion
+                    ORDER BY CASE WHEN seccion = 'producto' THEN cantidad ELSE total_vendido END DESC
+                ) as posicion
+            FROM agregados a
+        )
+        SELECT 
+            seccion, categoria, producto, cantidad, total_vendido, precio_promedio, pedidos, lineas,
+            NULL::numeric as total_pedidos,
+            NULL::bigint as cantidad_ordenes,
+            NULL::bigint as clientes_unicos,
+            posicion
+        FROM ranking
+        WHERE seccion <> 'producto' OR posicion <= %s
+        UNION ALL
+        SELECT 
+            'periodo', NULL, NULL, NULL, NULL, NULL, NULL, NULL,
+            SUM(total),
+            COUNT(*),
+            {SQL_CLIENTES_UNICOS},
+            NULL
+        FROM pedidos
+        ORDER BY seccion, posicion
+        """
+        filas = self.execute_query(query, (fecha_inicio, fecha_fin, limite), nombre='ventas_agregado')
+        
+        resultado = {'por_categoria': [], 'top_productos': [], 'resumen': {}}
+        lineas = 0
+        periodo = None
+        for fila in filas:
+            if fila['seccion'] == 'categoria':
+                resultado['por_categoria'].append({
+                    'categoria': fila['categoria'],
+                    'cantidad_vendida': fila['cantidad'],
+                    'total_vendido': fila['total_vendido'],
+                    'pedidos': fila['pedidos']
+                })
+            elif fila['seccion'] == 'producto':
+                resultado['top_productos'].append({
+                    'producto': fila['producto'],
+                    'cantidad': fila['cantidad'],
+                    'total_vendido': fila['total_vendido'],
+                    'precio_promedio': fila['precio_promedio']
+                })
+            elif fila['seccion'] == 'lineas':
+                lineas = fila['lineas']
+            elif fila['seccion'] == 'periodo':
+                periodo = fila
+        
+        # Mismas claves y tipos que el cálculo en Python sobre get_ventas_data
+        if periodo and periodo['cantidad_ordenes']:
+            total_ventas = float(periodo['total_pedidos'])
+            resultado['resumen'] = {
+                'total_ventas': total_ventas,
+                'cantidad_ordenes': periodo['cantidad_ordenes'],
+                'ticket_promedio': total_ventas / periodo['cantidad_ordenes'],
+                'productos_vendidos': lineas,
+                'clientes_unicos': periodo['clientes_unicos']
+            }
+        else:
+            resultado['resumen'] = {
+                'total_ventas': 0,
+                'cantidad_ordenes': 0,
+                'ticket_promedio': 0,
+                'productos_vendidos': 0,
+                'clientes_unicos': 0
+            }
+        return resultado
+    
+    def get_comparacion_ventas(self, fecha_inicio, fecha_fin, periodos: int = 1) -> dict:
+        """
+        Ventas del período y de los `periodos` anteriores de igual duración, en una sola query
+        
+        Un único recorrido de PEDIDO entre el inicio del período más antiguo y fecha_fin:
+        cada pedido se asigna a su período por división entera de días, se agrega por
+        categoría, producto y cliente (GROUPING SETS), se completan con ceros los períodos
+        sin ventas (generate_series) y LEAD trae el total del período anterior.
+        El período 0 es el actual; las listas de cada clave van del actual al más antiguo.
+        """
+        inicio = date.fromisoformat(str(fecha_inicio)[:10])
+        fin = date.fromisoformat(str(fecha_fin)[:10])
+        dias = (fin - inicio).days + 1
+        desde = inicio - timedelta(days=dias * periodos)
+        
+        query = """
+        WITH pedidos AS (
+            SELECT 
+                p.id,
+                p.total,
+                p.ci_cliente,
+                (%s::date - p.fecha_pedido) / %s as periodo
+            FROM PEDIDO p
+            WHERE p.fecha_pedido BETWEEN %s AND %s
+        ),
+        agregados AS (
+            SELECT 
+                CASE WHEN GROUPING(cat.nombre) = 0 THEN 'categoria' ELSE 'producto' END as seccion,
+                COALESCE(cat.nombre, pr.nombre) as clave,
+                COALESCE(cat.nombre, pr.nombre) as nombre,
+                p.periodo,
+                SUM(pp.total) as total,
+                SUM(pp.cantidad) as cantidad
+            FROM pedidos p
+            JOIN PEDIDO_PRODUCTO pp ON p.id = pp.id_pedido
+            JOIN PRODUCTO pr ON pp.id_producto = pr.id
+            JOIN CATEGORIA cat ON pr.id_categoria = cat.id
+            GROUP BY GROUPING SETS ((cat.nombre, p.periodo), (pr.nombre, p.periodo))
+            UNION ALL
+            SELECT 
+                CASE WHEN GROUPING(p.ci_cliente) = 0 THEN 'cliente' ELSE 'periodo' END,
+                COALESCE(p.ci_cliente::text, ''),
+                CASE WHEN GROUPING(p.ci_cliente) = 0 THEN MAX(c.nombre) END,
+                p.periodo,
+                SUM(p.total),
+                COUNT(*)
+            FROM pedidos p
+            LEFT JOIN CLIENTE c ON p.ci_cliente = c.ci
+            GROUP BY GROUPING SETS ((p.ci_cliente, p.periodo), (p.periodo))
+        ),
+        claves AS (
+            SELECT seccion, clave, MAX(nombre) as nombre
+            FROM agregados
+            GROUP BY seccion, clave
+            UNION
+            SELECT 'periodo', '', NULL
+        ),
+        rejilla AS (
+            SELECT k.seccion, k.clave, k.nombre, n.periodo
+            FROM claves k
+            CROSS JOIN generate_series(0, %s) AS n(periodo)
+        )
+        SELECT 
+            r.seccion,
+            r.clave,
+            r.nombre,
+            r.periodo,
+            COALESCE(a.total, 0) as total,
+            COALESCE(a.cantidad, 0) as cantidad,
+            LEAD(COALESCE(a.total, 0)) OVER (PARTITION BY r.seccion, r.clave ORDER BY r.periodo) as total_anterior
+        FROM rejilla r
+        LEFT JOIN agregados a ON a.seccion = r.seccion AND a.clave = r.clave AND a.periodo = r.periodo
+        ORDER BY r.seccion, r.clave, r.periodo
+        """
+        filas = self.execute_query(query, (fin, dias, desde, fin, periodos), nombre='comparacion_ventas')
+        
+        resultado = {'periodos': [], 'por_categoria': [], 'por_producto': [], 'por_cliente': []}
+        secciones = {'categoria': 'por_categoria', 'producto': 'por_producto', 'cliente': 'por_cliente'}
+        actual = None
+        for fila in filas:
+            total = float(fila['total'])
+            variacion = None
+            if fila['total_anterior'] is not None:
+                variacion = calcular_variacion_porcentual(total, float(fila['total_anterior']))
+            
+            if fila['seccion'] == 'periodo':
+                n = fila['periodo']
+                resultado['periodos'].append({
+                    'periodo': n,
+                    'fecha_inicio': (inicio - timedelta(days=dias * n)).isoformat(),
+                    'fecha_fin': (fin - timedelta(days=dias * n)).isoformat(),
+                    'total_ventas': total,
+                    'cantidad_ordenes': fila['cantidad'],
+                    'variacion': variacion
+                })
+                continue
+            
+            if fila['periodo'] == 0:
+                actual = {'totales': [], 'cantidades': [], 'variaciones': []}
+                if fila['seccion'] == 'cliente':
+                    actual.update({'ci': fila['clave'], 'nombre': fila['nombre']})
+                else:
+                    actual[fila['seccion']] = fila['nombre']
+                resultado[secciones[fila['seccion']]].append(actual)
+            actual['totales'].append(total)
+            actual['cantidades'].append(fila['cantidad'])
+            if variacion is not None:
+                actual['variaciones'].append(variacion)
+        
+        # Mayor total del período actual primero
+        for seccion in secciones.values():
+            resultado[seccion].sort(key=lambda item: item['totales'][0], reverse=True)
+        return resultado
     
     def get_clientes_datos(self, fecha_inicio, fecha_fin):
         """Obtiene datos agregados de clientes"""
+        if self._usar_rollup(fecha_inicio, fecha_fin):
+            query = """
+            SELECT 
+                c.ci,
+                c.nombre,
+                COALESCE(SUM(pd.pedidos), 0) as total_pedidos,
+                SUM(pd.total) as total_gastado,
+                SUM(pd.total) / NULLIF(SUM(pd.pedidos), 0) as ticket_promedio,
+                MAX(pd.fecha) as ultima_compra
+            FROM CLIENTE c
+            LEFT JOIN PEDIDO_DIARIO pd ON c.ci = pd.ci_cliente
+                AND pd.fecha BETWEEN %s AND %s
+            GROUP BY c.ci, c.nombre
+            ORDER BY total_gastado DESC NULLS LAST
+            """
+            return self.execute_query(query, (fecha_inicio, fecha_fin), nombre='clientes_datos_rollup')
+        
+        if self.dimensiones is not None:
+            query = """
+            SELECT 
+                p.ci_cliente,
+                COUNT(p.id) as total_pedidos,
+                SUM(p.total) as total_gastado,
+                AVG(p.total) as ticket_promedio,
+                MAX(p.fecha_pedido) as ultima_compra
+            FROM PEDIDO p
+            WHERE p.fecha_pedido BETWEEN %s AND %s
+            GROUP BY p.ci_cliente
+            """
+            filas = self.execute_query(query, (fecha_inicio, fecha_fin), nombre='clientes_datos_ids')
+            return self._unir_clientes(filas)
+        
         query = """
         SELECT 
             c.ci,
@@ -119,7 +1247,60 @@ class DatabaseService:
         GROUP BY c.ci, c.nombre
         ORDER BY total_gastado DESC NULLS LAST
         """
-        return self.execute_query(query, (fecha_inicio, fecha_fin))
+        return self.execute_query(query, (fecha_inicio, fecha_fin), nombre='clientes_datos')
+    
+    # ===== SERIES TEMPORALES =====
+    def get_serie_temporal(self, tipo: str, fecha_inicio, fecha_fin, granularidad: str = 'day') -> dict:
+        """
+        Serie (bucket, total, cantidad) con buckets de date_trunc; los vacíos vienen en 0
+        
+        Retorna columnas compactas {'fecha': [...], 'total': [...], 'cantidad': [...]},
+        una posición por bucket desde fecha_inicio hasta fecha_fin.
+        """
+        if tipo not in SERIES:
+            raise ValueError(f"Tipo sin serie temporal. Opciones: {', '.join(SERIES)}")
+        unidad = GRANULARIDADES.get(str(granularidad).lower())
+        if str(granularidad).lower() in ('hour', 'hora'):
+            raise ValueError(f"Las fechas de {tipo} no tienen hora: la granularidad mínima es day")
+        if unidad is None:
+            raise ValueError(f"Granularidad inválida. Opciones: {', '.join(GRANULARIDADES)}")
+        
+        query = f"""
+        WITH datos AS (
+            {SERIES[tipo]}
+        ),
+        agregado AS (
+            SELECT 
+                date_trunc(%s, fecha::timestamp) as bucket,
+                SUM(valor) as total,
+                COUNT(*) as cantidad
+            FROM datos
+            GROUP BY 1
+        ),
+        buckets AS (
+            SELECT generate_series(
+                date_trunc(%s, %s::timestamp),
+                date_trunc(%s, %s::timestamp + interval '1 day' - interval '1 microsecond'),
+                ('1 ' || %s)::interval
+            ) as bucket
+        )
+        SELECT 
+            b.bucket,
+            COALESCE(a.total, 0) as total,
+            COALESCE(a.cantidad, 0) as cantidad
+        FROM buckets b
+        LEFT JOIN agregado a ON a.bucket = b.bucket
+        ORDER BY b.bucket
+        """
+        params = (fecha_inicio, fecha_fin, unidad, unidad, fecha_inicio, unidad, fecha_fin, unidad)
+        # Columnas tipadas (timestamp -> datetime64, numeric -> float64) sin un dict por bucket
+        serie = self.execute_dataframe(query, params, nombre=f'serie_{tipo.lower()}', usar_cache=True)
+        
+        return {
+            'fecha': serie['bucket'].dt.strftime('%Y-%m-%d').tolist(),
+            'total': serie['total'].astype('float64').tolist(),
+            'cantidad': serie['cantidad'].tolist()
+        }
     
     # ===== QUERIES INVENTARIO =====
     def get_inventario_datos(self):
@@ -139,7 +1320,7 @@ class DatabaseService:
         FROM INSUMO i
         ORDER BY i.stock ASC
         """
-        return self.execute_query(query)
+        return self.execute_query(query, nombre='inventario_datos')
     
     def get_productos_stock(self):
         """Obtiene estado de productos terminados"""
@@ -156,43 +1337,109 @@ class DatabaseService:
         JOIN CATEGORIA cat ON pr.id_categoria = cat.id
         ORDER BY pr.stock ASC
         """
-        return self.execute_query(query)
+        return self.execute_query(query, nombre='productos_stock')
     
     # ===== QUERIES PRODUCCIÓN =====
     def get_produccion_datos(self, fecha_inicio, fecha_fin):
         """Obtiene datos de producción"""
-        query = """
-        SELECT 
-            prod.id,
-            prod.fecha,
-            prod.descripcion,
-            prod.terminado,
-            r.id as id_receta,
-            pr.nombre as producto
-        FROM PRODUCCION prod
-        JOIN RECETA r ON prod.id_receta = r.id
-        JOIN PRODUCTO pr ON r.id_producto = pr.id
-        WHERE prod.fecha BETWEEN %s AND %s
-        ORDER BY prod.fecha DESC
-        """
-        return self.execute_query(query, (fecha_inicio, fecha_fin))
+        return self.execute_query(QUERY_PRODUCCION_DATOS, (fecha_inicio, fecha_fin), nombre='produccion_datos')
     
     # ===== QUERIES COMPRAS =====
     def get_compras_datos(self, fecha_inicio, fecha_fin):
         """Obtiene datos de compras a proveedores"""
+        if self.dimensiones is not None:
+            filas = self.execute_query(QUERY_COMPRAS_DATOS_IDS, (fecha_inicio, fecha_fin), nombre='compras_datos_ids')
+            return self._con_nombre(filas, 'codigo_proveedor', 'PROVEEDOR', 'proveedor', posicion=3)
+        return self.execute_query(QUERY_COMPRAS_DATOS, (fecha_inicio, fecha_fin), nombre='compras_datos')
+    
+    # ===== RESÚMENES (sin traer filas) =====
+    # Mismas claves, valores y tipos que las métricas calculadas en Python sobre las filas
+    def get_resumen_ventas(self, fecha_inicio, fecha_fin):
+        """Métricas de resumen de VENTAS (equivale a resumir_ventas sobre get_ventas_data)"""
+        query = f"""
+        WITH pedidos AS (
+            SELECT 
+                p.id,
+                p.total,
+                c.nombre as cliente
+            FROM PEDIDO p
+            LEFT JOIN CLIENTE c ON p.ci_cliente = c.ci
+            WHERE p.fecha_pedido BETWEEN %s AND %s
+        )
+        SELECT 
+            COUNT(*) as cantidad_ordenes,
+            SUM(total) as total_ventas,
+            {SQL_CLIENTES_UNICOS} as clientes_unicos,
+            (SELECT COUNT(*) FROM pedidos p JOIN PEDIDO_PRODUCTO pp ON p.id = pp.id_pedido) as productos_vendidos
+        FROM pedidos
+        """
+        fila = self.execute_query(query, (fecha_inicio, fecha_fin), nombre='resumen_ventas')[0]
+        
+        if not fila['cantidad_ordenes']:
+            return {
+                'total_ventas': 0,
+                'cantidad_ordenes': 0,
+                'ticket_promedio': 0,
+                'productos_vendidos': 0,
+                'clientes_unicos': 0
+            }
+        
+        total_ventas = float(fila['total_ventas'])
+        return {
+            'total_ventas': total_ventas,
+            'cantidad_ordenes': fila['cantidad_ordenes'],
+            'ticket_promedio': total_ventas / fila['cantidad_ordenes'],
+            'productos_vendidos': fila['productos_vendidos'],
+            'clientes_unicos': fila['clientes_unicos']
+        }
+    
+    def get_resumen_inventario(self):
+        """Métricas de resumen de INVENTARIO sobre los productos de get_productos_stock"""
         query = """
         SELECT 
-            nc.id,
-            nc.fecha_pedido,
-            nc.fecha_entrega,
-            pr.nombre as proveedor,
-            SUM(ci.cantidad) as cantidad_items,
-            SUM(ci.total) as total_compra
-        FROM NOTA_COMPRA nc
-        JOIN PROVEEDOR pr ON nc.codigo_proveedor = pr.codigo
-        LEFT JOIN COMPRA_INSUMO ci ON nc.id = ci.id_nota_compra
-        WHERE nc.fecha_pedido BETWEEN %s AND %s
-        GROUP BY nc.id, pr.nombre, nc.fecha_pedido, nc.fecha_entrega
-        ORDER BY nc.fecha_pedido DESC
+            COUNT(*) as cantidad_items,
+            SUM(pr.stock) FILTER (WHERE pr.stock <> 0) as stock_total,
+            COUNT(*) FILTER (WHERE pr.stock < pr.stock_minimo) as items_bajo_stock
+        FROM PRODUCTO pr
+        JOIN CATEGORIA cat ON pr.id_categoria = cat.id
         """
-        return self.execute_query(query, (fecha_inicio, fecha_fin))
+        fila = self.execute_query(query, nombre='resumen_inventario')[0]
+        
+        if not fila['cantidad_items']:
+            return {
+                'stock_total': 0,
+                'cantidad_items': 0,
+                'items_bajo_stock': 0,
+                'rotacion_promedio': 0
+            }
+        
+        return {
+            # Solo suman los productos con stock distinto de cero (0 entero si no hay ninguno)
+            'stock_total': float(fila['stock_total']) if fila['stock_total'] is not None else 0,
+            'cantidad_items': fila['cantidad_items'],
+            'items_bajo_stock': fila['items_bajo_stock'],
+            # Los productos no tienen rotación calculada
+            'rotacion_promedio': 0.0
+        }
+    
+    def get_resumen_produccion(self, fecha_inicio, fecha_fin):
+        """Métricas de resumen de PRODUCCION sobre las filas de get_produccion_datos"""
+        fila = self.execute_query(QUERY_RESUMEN_PRODUCCION, (fecha_inicio, fecha_fin), nombre='resumen_produccion')[0]
+        return {
+            'total_produccion': fila['total_produccion'],
+            'produccion_exitosa': fila['produccion_exitosa']
+        }
+    
+    def get_resumen_compras(self, fecha_inicio, fecha_fin):
+        """Métricas de resumen de COMPRAS sobre las filas de get_compras_datos"""
+        fila = self.execute_query(QUERY_RESUMEN_COMPRAS, (fecha_inicio, fecha_fin), nombre='resumen_compras')[0]
+        return {
+            # Suma exacta en numeric, como la suma de los Decimal de las filas
+            'total_compras': float(fila['total_compras'] or 0) if fila['cantidad_compras'] else 0,
+            'cantidad_compras': fila['cantidad_compras']
+        }
+    
+    def get_resumen_clientes(self):
+        """Métricas de resumen de CLIENTES (get_clientes_datos trae todos los clientes)"""
+        fila = self.execute_query("SELECT COUNT(*) as cantidad_clientes FROM CLIENTE", nombre='resumen_clientes')[0]
+        return {'cantidad_clientes': fila['cantidad_clientes']}
@@ -0,0 +1,120 @@
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# tabla -> (query, clave). Solo atributos que cambian poco (el stock queda en la BD)
+DIMENSIONES = {
+    'CATEGORIA': ("SELECT id, nombre, descripcion FROM CATEGORIA", 'id'),
+    'PRODUCTO': ("SELECT id, nombre, precio, stock_minimo, id_categoria FROM PRODUCTO", 'id'),
+    'CLIENTE': ("SELECT ci, nombre, sexo, telefono FROM CLIENTE", 'ci'),
+    'PROVEEDOR': ("SELECT codigo, nombre, empresa, estado FROM PROVEEDOR", 'codigo'),
+    'INSUMO': ("SELECT id, nombre, medida, stock_minimo FROM INSUMO", 'id')
+}
+
+# Segundos mínimos entre recargas provocadas por claves desconocidas
+ESPERA_RECARGA_FALTANTES = 5.0
+
+class _Version:
+    """Catálogos cargados en un momento dado; se reemplaza entera en cada recarga"""
+
+    def __init__(self, numero: int, filas: dict):
+        self.numero = numero
+        self.filas = filas
+        self.cargada = time.monotonic()
+
+class DimensionCache:
+    """
+    Catálogos chicos (categorías, productos, clientes, proveedores, insumos) en memoria
+
+    Las queries de hechos traen solo ids y los nombres se resuelven con `filas()`.
+    Cada recarga crea una versión nueva; se recarga al vencer `max_edad`, al
+    invalidarse alguna de sus tablas (p. ej. por LISTEN/NOTIFY) o cuando una
+    query trae una clave que el catálogo todavía no tiene (un cliente nuevo).
+    """
+
+    def __init__(self, db_service, max_edad: float = 300):
+        self.db = db_service
+        self.max_edad = max_edad
+        self._lock = threading.Lock()
+        self._version = None
+        self._vencida = False
+
+        # Estadísticas
+        self.recargas = 0
+        self.recargas_por_faltantes = 0
+
+    def refrescar(self) -> dict:
+        """Recarga todos los catálogos en una sesión y publica la versión nueva"""
+        with self._lock:
+            return self._recargar()
+
+    def _recargar(self) -> dict:
+        """Recarga (llamar con el lock tomado)"""
+        inicio = time.monotonic()
+        # Antes de leer: una invalidación que llegue durante la carga fuerza otra recarga
+        self._vencida = False
+        try:
+            with self.db.sesion():
+                filas = {}
+                for tabla, (query, clave) in DIMENSIONES.items():
+                    resultado = self.db.execute_query(query, usar_cache=False, nombre=f'dimension_{tabla.lower()}')
+                    filas[tabla] = {fila[clave]: fila for fila in resultado}
+        except Exception as e:
+            self._vencida = True
+            logger.error(f"Error cargando dimensiones: {str(e)}")
+            raise
+
+        self._version = _Version((self._version.numero + 1) if self._version else 1, filas)
+        self.recargas += 1
+        resultado = {
+            'version': self._version.numero,
+            **{tabla.lower(): len(valores) for tabla, valores in filas.items()},
+            'duracion_ms': round((time.monotonic() - inicio) * 1000, 1)
+        }
+        logger.info(f"Dimensiones cargadas: {resultado}")
+        return resultado
+
+    def invalidar(self, tablas=None):
+        """Marca la versión como vencida si cambió alguno de sus catálogos (todos si tablas es None)"""
+        if tablas is None or {t.upper() for t in tablas} & DIMENSIONES.keys():
+            self._vencida = True
+
+    def _actual(self) -> _Version:
+        version = self._version
+        if version is None or self._vencida or time.monotonic() - version.cargada > self.max_edad:
+            with self._lock:
+                # Otro hilo pudo haber recargado mientras se esperaba el lock
+                if self._version is version:
+                    self._recargar()
+            version = self._version
+        return version
+
+    def filas(self, tabla: str, claves=()) -> dict:
+        """
+        Catálogo {clave: fila} de `tabla`
+
+        Si alguna de `claves` no está (alta posterior a la carga) se recarga una vez,
+        como máximo cada ESPERA_RECARGA_FALTANTES segundos.
+        """
+        version = self._actual()
+        catalogo = version.filas[tabla]
+        if any(clave not in catalogo for clave in claves) and time.monotonic() - version.cargada > ESPERA_RECARGA_FALTANTES:
+            with self._lock:
+                if self._version is version:
+                    self.recargas_por_faltantes += 1
+                    self._recargar()
+            catalogo = self._version.filas[tabla]
+        return catalogo
+
+    def estadisticas(self) -> dict:
+        version = self._version
+        return {
+            'version': version.numero if version else 0,
+            'edad_s': round(time.monotonic() - version.cargada, 1) if version else None,
+            'vencida': self._vencida,
+            'recargas': self.recargas,
+            'recargas_por_faltantes': self.recargas_por_faltantes,
+            'filas': {tabla.lower(): len(valores) for tabla, valores in version.filas.items()} if version else {}
+        }
@@ -1,16 +1,33 @@
 import requests
+from requests.adapters import HTTPAdapter
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
 import logging
+import random
+import threading
+import time
+import gzip
 import json
 from typing import Optional
+from src.services.llm_cache import LLMCache
 
 logger = logging.getLogger(__name__)
 
+# Respuestas transitorias de la API que vale la pena reintentar
+ESTADOS_REINTENTABLES = frozenset({429, 500, 502, 503, 504})
+
 class IAService:
     """Servicio de integración con Google Gemini API REST"""
     
-    def __init__(self):
+    def __init__(self, cache: LLMCache = None):
         # Importar configuración
-        from src.config.settings import GEMINI_API_KEY, GEMINI_MODEL, GEMINI_BASE_URL, TEMPERATURE, MAX_TOKENS
+        from src.config.settings import (
+            GEMINI_API_KEY, GEMINI_MODEL, GEMINI_BASE_URL, TEMPERATURE, MAX_TOKENS,
+            LLM_CACHE_HABILITADA, LLM_CACHE_DIR, LLM_CACHE_MAX_ENTRADAS_MEMORIA, LLM_CACHE_MAX_BYTES_DISCO,
+            LLM_CACHE_TTL_SEGUNDOS, GEMINI_TIMEOUT_CONEXION, GEMINI_TIMEOUT_LECTURA, GEMINI_REINTENTOS,
+            GEMINI_BACKOFF_BASE, GEMINI_BACKOFF_MAX, GEMINI_POOL_CONEXIONES, GEMINI_COMPRIMIR_REQUEST,
+            GEMINI_COMPRIMIR_MIN_BYTES
+        )
         
         self.api_key = GEMINI_API_KEY
         self.model = GEMINI_MODEL
@@ -18,15 +35,48 @@ class IAService:
         self.temperature = TEMPERATURE
         self.max_tokens = MAX_TOKENS
         
+        # (conexión, lectura): un host caído falla rápido sin acortar la generación
+        self.timeout = (GEMINI_TIMEOUT_CONEXION, GEMINI_TIMEOUT_LECTURA)
+        self.reintentos = GEMINI_REINTENTOS
+        self.backoff_base = GEMINI_BACKOFF_BASE
+        self.backoff_max = GEMINI_BACKOFF_MAX
+        self.comprimir = GEMINI_COMPRIMIR_REQUEST
+        self.comprimir_min_bytes = GEMINI_COMPRIMIR_MIN_BYTES
+        
+        # Sesión compartida entre requests: reutiliza las conexiones TLS (keep-alive)
+        self.session = requests.Session()
+        self.session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=GEMINI_POOL_CONEXIONES))
+        self.session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=GEMINI_POOL_CONEXIONES))
+        self.session.headers.update({
+            'Content-Type': 'application/json',
+            'X-goog-api-key': self.api_key
+        })
+        
+        # Estadísticas (los hilos de los requests y de los jobs comparten la instancia)
+        self.llamadas = 0
+        self.reintentos_realizados = 0
+        self._lock = threading.Lock()
+        
+        # Cache de respuestas por hash del request (prompts idénticos no vuelven a la API)
+        if cache is None and LLM_CACHE_HABILITADA:
+            cache = LLMCache(
+                LLM_CACHE_DIR,
+                max_entradas_memoria=LLM_CACHE_MAX_ENTRADAS_MEMORIA,
+                max_bytes_disco=LLM_CACHE_MAX_BYTES_DISCO,
+                ttl=LLM_CACHE_TTL_SEGUNDOS
+            )
+        self.cache = cache
+        
         logger.info(f"IAService inicializado con Google Gemini API REST: {self.model}")
     
-    def generar_reporte(self, prompt: str, datos_contexto: dict = None) -> dict:
+    def generar_reporte(self, prompt: str, datos_contexto: dict = None, usar_cache: bool = True) -> dict:
         """
         Genera análisis usando IA basado en prompt
         
         Args:
             prompt: Prompt en lenguaje natural del usuario
             datos_contexto: Datos contextuales para enriquecer la respuesta
+            usar_cache: False para ignorar la cache de respuestas y consultar siempre al modelo
         
         Returns:
             dict con analysis, insights, recomendaciones
@@ -35,52 +85,201 @@ class IAService:
             # Construir prompt con contexto
             prompt_completo = self._construir_prompt(prompt, datos_contexto)
             
-            # URL del endpoint
-            url = f"{self.base_url}/{self.model}:generateContent"
+            clave = None
+            if self.cache is not None:
+                clave = LLMCache.clave(self.model, self.temperature, self.max_tokens, prompt_completo)
+                if usar_cache:
+                    contenido = self.cache.obtener(clave)
+                    if contenido is not None:
+                        logger.info("Reporte IA servido desde cache")
+                        return self._parsear_respuesta(contenido)
             
-            # Headers
-            headers = {
-                'Content-Type': 'application/json',
-                'X-goog-api-key': self.api_key
-            }
+            contenido = self._llamar_api(prompt_completo)
+            logger.info("Reporte generado exitosamente con Google Gemini")
             
-            # Payload
-            payload = {
-                "contents": [
-                    {
-                        "parts": [
-                            {
-                                "text": prompt_completo
-                            }
-                        ]
-                    }
-                ],
-                "generationConfig": {
-                    "temperature": self.temperature,
-                    "maxOutputTokens": self.max_tokens,
-                }
-            }
+            # Con bypass también se guarda: la respuesta nueva reemplaza a la anterior
+            if clave is not None:
+                self.cache.guardar(clave, contenido, self.model)
             
-            # Hacer request
-            response = requests.post(url, json=payload, headers=headers, timeout=60)
+            return self._parsear_respuesta(contenido)
             
-            # Verificar respuesta
-            if response.status_code != 200:
-                logger.error(f"Error en Gemini API: {response.status_code} - {response.text}")
-                raise Exception(f"Gemini API error: {response.status_code} - {response.text}")
+        except Exception as e:
+            logger.error(f"Error generando reporte con IA: {str(e)}")
+            raise
+    
+    def generar_reporte_stream(self, prompt: str, datos_contexto: dict = None, usar_cache: bool = True):
+        """
+        Variante de generar_reporte que entrega el texto a medida que el modelo lo genera
+        
+        Usa streamGenerateContent (SSE). Produce tuplas ('fragmento', texto) y, al
+        final, ('analisis', dict) con la misma estructura que generar_reporte. Un
+        hit de cache se entrega como un único fragmento.
+        """
+        try:
+            prompt_completo = self._construir_prompt(prompt, datos_contexto)
             
-            # Parsear respuesta
-            data = response.json()
-            contenido = data['candidates'][0]['content']['parts'][0]['text']
+            clave = None
+            if self.cache is not None:
+                clave = LLMCache.clave(self.model, self.temperature, self.max_tokens, prompt_completo)
+                if usar_cache:
+                    contenido = self.cache.obtener(clave)
+                    if contenido is not None:
+                        logger.info("Reporte IA servido desde cache")
+                        yield 'fragmento', contenido
+                        yield 'analisis', self._parsear_respuesta(contenido)
+                        return
             
-            logger.info("Reporte generado exitosamente con Google Gemini")
+            fragmentos = []
+            for fragmento in self._llamar_api_stream(prompt_completo):
+                fragmentos.append(fragmento)
+                yield 'fragmento', fragmento
+            contenido = ''.join(fragmentos)
+            logger.info("Reporte generado exitosamente con Google Gemini (streaming)")
             
-            return self._parsear_respuesta(contenido)
+            if clave is not None:
+                self.cache.guardar(clave, contenido, self.model)
+            
+            yield 'analisis', self._parsear_respuesta(contenido)
             
         except Exception as e:
-            logger.error(f"Error generando reporte con IA: {str(e)}")
+            logger.error(f"Error generando reporte con IA (streaming): {str(e)}")
             raise
     
+    def _llamar_api(self, prompt_completo: str) -> str:
+        """Envía el prompt a Gemini y retorna el texto generado"""
+        # URL del endpoint
+        url = f"{self.base_url}/{self.model}:generateContent"
+        
+        # Hacer request
+        response = self._post(url, self._payload(prompt_completo))
+        
+        # Verificar respuesta
+        if response.status_code != 200:
+            logger.error(f"Error en Gemini API: {response.status_code} - {response.text}")
+            raise Exception(f"Gemini API error: {response.status_code} - {response.text}")
+        
+        # Parsear respuesta
+        data = response.json()
+        return data['candidates'][0]['content']['parts'][0]['text']
+    
+    def _llamar_api_stream(self, prompt_completo: str):
+        """Envía el prompt a streamGenerateContent y produce el texto de cada evento SSE"""
+        url = f"{self.base_url}/{self.model}:streamGenerateContent?alt=sse"
+        response = self._post(url, self._payload(prompt_completo), stream=True)
+        try:
+            if response.status_code != 200:
+                logger.error(f"Error en Gemini API: {response.status_code} - {response.text}")
+                raise Exception(f"Gemini API error: {response.status_code} - {response.text}")
+            
+            # text/event-stream sin charset: forzar UTF-8 para decodificar de forma incremental
+            response.encoding = 'utf-8'
+            for linea in response.iter_lines(decode_unicode=True):
+                if not linea or not linea.startswith('data:'):
+                    continue
+                evento = json.loads(linea[5:])
+                if 'error' in evento:
+                    raise Exception(f"Gemini API error: {evento['error']}")
+                # El último evento puede traer solo finishReason/usageMetadata, sin texto
+                for candidato in evento.get('candidates', [])[:1]:
+                    for parte in candidato.get('content', {}).get('parts', []):
+                        if parte.get('text'):
+                            yield parte['text']
+        finally:
+            response.close()
+    
+    def _payload(self, prompt_completo: str) -> dict:
+        """Cuerpo del request a Gemini"""
+        return {
+            "contents": [
+                {
+                    "parts": [
+                        {
+                            "text": prompt_completo
+                        }
+                    ]
+                }
+            ],
+            "generationConfig": {
+                "temperature": self.temperature,
+                "maxOutputTokens": self.max_tokens,
+            }
+        }
+    
+    def _post(self, url: str, payload: dict, stream: bool = False) -> requests.Response:
+        """
+        POST por la sesión compartida, reintentando errores transitorios
+        
+        Se reintentan 429/5xx y los errores de conexión (el request no llegó a
+        procesarse); un timeout de lectura no, porque el modelo pudo haber generado
+        y cobrado la respuesta. La espera es backoff exponencial con jitter, o el
+        Retry-After del servidor si lo envía. Con stream=True solo se reintenta
+        antes de empezar a leer el cuerpo.
+        """
+        cuerpo = json.dumps(payload).encode('utf-8')
+        headers = {}
+        if self.comprimir and len(cuerpo) >= self.comprimir_min_bytes:
+            cuerpo = gzip.compress(cuerpo, compresslevel=5)
+            headers['Content-Encoding'] = 'gzip'
+        
+        intento = 0
+        while True:
+            with self._lock:
+                self.llamadas += 1
+            try:
+                response = self.session.post(url, data=cuerpo, headers=headers, timeout=self.timeout, stream=stream)
+            except requests.ConnectionError as e:
+                # Incluye ConnectTimeout; ReadTimeout no es ConnectionError y se propaga
+                if intento >= self.reintentos:
+                    raise
+                espera = self._espera_reintento(intento)
+                logger.warning(f"Error de conexión con Gemini ({str(e)}); reintento {intento + 1} en {espera:.2f}s")
+            else:
+                if response.status_code not in ESTADOS_REINTENTABLES or intento >= self.reintentos:
+                    return response
+                espera = self._espera_reintento(intento, response.headers.get('Retry-After'))
+                if espera is None:
+                    return response
+                logger.warning(f"Gemini respondió {response.status_code}; reintento {intento + 1} en {espera:.2f}s")
+                response.close()
+            
+            intento += 1
+            with self._lock:
+                self.reintentos_realizados += 1
+            time.sleep(espera)
+    
+    def _espera_reintento(self, intento: int, retry_after: str = None) -> Optional[float]:
+        """
+        Segundos a esperar antes del reintento número `intento` + 1
+        
+        Sin Retry-After: jitter completo sobre backoff_base * 2^intento (acotado por
+        backoff_max). Con Retry-After (segundos o fecha HTTP) se respeta, más un
+        jitter chico; None si pide esperar más que backoff_max (no vale la pena).
+        """
+        if retry_after:
+            try:
+                espera = float(retry_after)
+            except ValueError:
+                try:
+                    espera = (parsedate_to_datetime(retry_after) - datetime.now(timezone.utc)).total_seconds()
+                except (TypeError, ValueError):
+                    espera = None
+            if espera is not None:
+                espera = max(espera, 0.0)
+                if espera > self.backoff_max:
+                    return None
+                return espera + random.uniform(0, self.backoff_base)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** intento))
+    
+    def estadisticas(self) -> dict:
+        """Requests HTTP hechos a Gemini, reintentos y métricas de la cache de respuestas"""
+        with self._lock:
+            llamadas, reintentos = self.llamadas, self.reintentos_realizados
+        return {
+            'llamadas_http': llamadas,
+            'reintentos': reintentos,
+            'cache': self.cache.estadisticas() if self.cache is not None else None
+        }
+    
     def analizar_tendencias(self, datos_historicos: list) -> dict:
         """Analiza tendencias en datos históricos"""
         try:
@@ -0,0 +1,201 @@
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from datetime import datetime
+import threading
+import time
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Estados de un job
+EN_COLA = 'en_cola'
+EJECUTANDO = 'ejecutando'
+COMPLETADO = 'completado'
+ERROR = 'error'
+CANCELADO = 'cancelado'
+TERMINADOS = frozenset({COMPLETADO, ERROR, CANCELADO})
+
+class ColaLlenaError(Exception):
+    """No hay lugar en la cola de jobs; el cliente debe reintentar más tarde"""
+
+class JobCancelado(Exception):
+    """Se pidió cancelar el job; se lanza en el próximo punto de control"""
+
+class _Job:
+    """Estado de un job; lo actualiza el worker y lo leen los requests de consulta"""
+
+    def __init__(self, tipo: str, parametros: dict):
+        self.id = uuid.uuid4().hex
+        self.tipo = tipo
+        self.parametros = parametros
+        self.estado = EN_COLA
+        self.etapa = None
+        self.progreso = 0
+        self.creado = time.time()
+        self.iniciado = None
+        self.terminado = None
+        self.resultado = None
+        self.error = None
+        self.cancelacion = threading.Event()
+        self.future = None
+
+    def avanzar(self, etapa: str, progreso: int):
+        """Callback del pipeline al empezar cada etapa; punto de control de la cancelación"""
+        if self.cancelacion.is_set():
+            raise JobCancelado()
+        self.etapa = etapa
+        self.progreso = progreso
+
+    def a_dict(self, incluir_resultado: bool = True) -> dict:
+        def _iso(instante):
+            return datetime.fromtimestamp(instante).isoformat(timespec='seconds') if instante else None
+
+        datos = {
+            'job_id': self.id,
+            'tipo': self.tipo,
+            'estado': self.estado,
+            'etapa': self.etapa,
+            'progreso': self.progreso,
+            'parametros': self.parametros,
+            'creado': _iso(self.creado),
+            'iniciado': _iso(self.iniciado),
+            'terminado': _iso(self.terminado),
+            'duracion_s': round((self.terminado or time.time()) - self.iniciado, 3) if self.iniciado else None,
+            'error': self.error
+        }
+        if incluir_resultado and self.estado == COMPLETADO:
+            datos['resultado'] = self.resultado
+        return datos
+
+class JobService:
+    """
+    Ejecuta trabajos largos (generar reportes) en un pool acotado de workers
+
+    `enviar()` retorna el job al instante y el request queda libre; el estado,
+    la etapa y el resultado se consultan por id. La cola también es acotada: si
+    está llena se rechaza con ColaLlenaError en lugar de acumular trabajo. Los
+    jobs terminados se conservan `retencion` segundos (o hasta `max_terminados`).
+    """
+
+    def __init__(self, workers: int = 2, max_cola: int = 20, retencion: float = 3600,
+                 max_terminados: int = 200):
+        self.workers = workers
+        self.max_cola = max_cola
+        self.retencion = retencion
+        self.max_terminados = max_terminados
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='job-reporte')
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Estadísticas
+        self._contadores = {COMPLETADO: 0, ERROR: 0, CANCELADO: 0, 'rechazados': 0}
+        self._espera_total = 0.0
+        self._ejecucion_total = 0.0
+
+    def enviar(self, tipo: str, funcion, parametros: dict) -> _Job:
+        """
+        Encola `funcion(parametros, avanzar)`; su retorno queda como resultado del job
+
+        `avanzar(etapa, progreso)` debe llamarse al empezar cada etapa: actualiza
+        el progreso y lanza JobCancelado si se pidió cancelar.
+        """
+        with self._lock:
+            self._purgar()
+            if self._contar(EN_COLA) >= self.max_cola:
+                self._contadores['rechazados'] += 1
+                raise ColaLlenaError(f"Cola de jobs llena ({self.max_cola} en espera)")
+            job = _Job(tipo, parametros)
+            self._jobs[job.id] = job
+            job.future = self._executor.submit(self._ejecutar, job, funcion)
+
+        logger.info(f"Job {job.id} encolado ({tipo})")
+        return job
+
+    def _ejecutar(self, job: _Job, funcion):
+        with self._lock:
+            if job.estado != EN_COLA:
+                return
+            job.estado = EJECUTANDO
+            job.iniciado = time.time()
+            self._espera_total += job.iniciado - job.creado
+
+        try:
+            resultado = funcion(job.parametros, job.avanzar)
+            estado, job.resultado, job.progreso = COMPLETADO, resultado, 100
+            logger.info(f"Job {job.id} completado en {time.time() - job.iniciado:.2f}s")
+        except JobCancelado:
+            estado = CANCELADO
+            logger.info(f"Job {job.id} cancelado en la etapa {job.etapa}")
+        except Exception as e:
+            estado, job.error = ERROR, str(e)
+            logger.error(f"Error en job {job.id}: {str(e)}")
+
+        with self._lock:
+            job.estado = estado
+            job.terminado = time.time()
+            self._contadores[estado] += 1
+            self._ejecucion_total += job.terminado - job.iniciado
+
+    def obtener(self, job_id: str):
+        """Job por id, o None si no existe o ya se descartó"""
+        with self._lock:
+            self._purgar()
+            return self._jobs.get(job_id)
+
+    def cancelar(self, job_id: str):
+        """
+        Cancela un job; retorna el job o None si no existe
+
+        Uno en cola se descarta sin ejecutarse; uno en ejecución se detiene al
+        empezar su próxima etapa (la etapa en curso, p. ej. la llamada a la IA, termina).
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.estado in TERMINADOS:
+                return job
+            job.cancelacion.set()
+            if job.estado == EN_COLA:
+                job.future.cancel()
+                job.estado = CANCELADO
+                job.terminado = time.time()
+                self._contadores[CANCELADO] += 1
+        logger.info(f"Cancelación solicitada para job {job_id}")
+        return job
+
+    def _contar(self, estado: str) -> int:
+        return sum(1 for job in self._jobs.values() if job.estado == estado)
+
+    def _purgar(self):
+        """Descarta terminados vencidos o que exceden max_terminados (llamar con el lock tomado)"""
+        limite = time.time() - self.retencion
+        terminados = [job for job in self._jobs.values() if job.estado in TERMINADOS]
+        sobrantes = len(terminados) - self.max_terminados
+        for job in terminados:
+            if job.terminado < limite or sobrantes > 0:
+                del self._jobs[job.id]
+                sobrantes -= 1
+
+    def detener(self):
+        """Cancela lo que está en cola y espera a que terminen los jobs en ejecución"""
+        for job_id in list(self._jobs):
+            job = self._jobs.get(job_id)
+            if job is not None and job.estado == EN_COLA:
+                self.cancelar(job_id)
+        self._executor.shutdown(wait=True)
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'max_cola': self.max_cola,
+                'en_cola': self._contar(EN_COLA),
+                'ejecutando': self._contar(EJECUTANDO),
+                'completados': self._contadores[COMPLETADO],
+                'errores': self._contadores[ERROR],
+                'cancelados': self._contadores[CANCELADO],
+                'rechazados': self._contadores['rechazados'],
+                'espera_total_s': round(self._espera_total, 3),
+                'ejecucion_total_s': round(self._ejecucion_total, 3),
+                'retenidos': len(self._jobs)
+            }
@@ -0,0 +1,181 @@
+from collections import OrderedDict
+import threading
+import hashlib
+import time
+import json
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+class LLMCache:
+    """
+    Cache de respuestas del modelo direccionada por contenido
+
+    La clave es el SHA-256 de modelo, temperatura, max tokens y prompt completo: un
+    prompt idéntico (p. ej. reabrir el reporte del mes pasado) no vuelve a llamar a
+    la API. Dos niveles: LRU en memoria acotada por entradas y archivos en disco
+    (`<dir>/<ab>/<clave>.json`) acotados por bytes, ambos con el mismo TTL.
+    """
+
+    def __init__(self, directorio: str, max_entradas_memoria: int = 256,
+                 max_bytes_disco: int = 256 * 1024 * 1024, ttl: float = 7 * 24 * 3600):
+        self.directorio = directorio
+        self.max_entradas_memoria = max_entradas_memoria
+        self.max_bytes_disco = max_bytes_disco
+        self.ttl = ttl
+
+        # clave -> (texto, creado epoch)
+        self._memoria = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes_disco = None
+
+        # Estadísticas
+        self._hits_memoria = 0
+        self._hits_disco = 0
+        self._misses = 0
+        self._expiradas = 0
+        self._guardadas = 0
+        self._evictions_disco = 0
+
+    @staticmethod
+    def clave(modelo: str, temperatura: float, max_tokens: int, prompt: str) -> str:
+        """Hash del request completo; cualquier cambio en prompt o parámetros da otra clave"""
+        contenido = json.dumps([modelo, temperatura, max_tokens, prompt], ensure_ascii=False)
+        return hashlib.sha256(contenido.encode('utf-8')).hexdigest()
+
+    def _ruta(self, clave: str) -> str:
+        return os.path.join(self.directorio, clave[:2], f"{clave}.json")
+
+    # ===== OPERACIONES =====
+    def obtener(self, clave: str):
+        """Texto de la respuesta cacheada o None"""
+        ahora = time.time()
+        with self._lock:
+            entrada = self._memoria.get(clave)
+            if entrada is not None:
+                if ahora - entrada[1] < self.ttl:
+                    self._memoria.move_to_end(clave)
+                    self._hits_memoria += 1
+                    return entrada[0]
+                del self._memoria[clave]
+
+        entrada = self._leer_disco(clave, ahora)
+        with self._lock:
+            if entrada is None:
+                self._misses += 1
+                return None
+            self._hits_disco += 1
+            self._guardar_memoria(clave, entrada)
+        return entrada[0]
+
+    def guardar(self, clave: str, texto: str, modelo: str = None):
+        """Guarda la respuesta en memoria y en disco (un error de disco solo se registra)"""
+        entrada = (texto, time.time())
+        with self._lock:
+            self._guardar_memoria(clave, entrada)
+            self._guardadas += 1
+
+        try:
+            self._escribir_disco(clave, entrada, modelo)
+        except OSError as e:
+            logger.warning(f"No se pudo guardar la respuesta IA en disco: {str(e)}")
+
+    def _guardar_memoria(self, clave: str, entrada: tuple):
+        """Inserta en el LRU (llamar con el lock tomado)"""
+        self._memoria[clave] = entrada
+        self._memoria.move_to_end(clave)
+        while len(self._memoria) > self.max_entradas_memoria:
+            self._memoria.popitem(last=False)
+
+    def _leer_disco(self, clave: str, ahora: float):
+        ruta = self._ruta(clave)
+        try:
+            with open(ruta, 'r', encoding='utf-8') as archivo:
+                contenido = json.load(archivo)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Entrada de cache IA ilegible, se descarta: {ruta} ({str(e)})")
+            self._borrar(ruta)
+            return None
+
+        if ahora - contenido['creado'] >= self.ttl:
+            with self._lock:
+                self._expiradas += 1
+            self._borrar(ruta)
+            return None
+        return contenido['texto'], contenido['creado']
+
+    def _escribir_disco(self, clave: str, entrada: tuple, modelo: str):
+        """Escribe con rename atómico y poda los archivos más viejos si se supera max_bytes_disco"""
+        ruta = self._ruta(clave)
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        temporal = f"{ruta}.{threading.get_ident()}.tmp"
+        with open(temporal, 'w', encoding='utf-8') as archivo:
+            json.dump({'texto': entrada[0], 'creado': entrada[1], 'modelo': modelo}, archivo, ensure_ascii=False)
+        anterior = os.path.getsize(ruta) if os.path.exists(ruta) else 0
+        os.replace(temporal, ruta)
+
+        with self._lock:
+            if self._bytes_disco is None:
+                self._bytes_disco = sum(tamano for _, tamano, _ in self._archivos())
+            else:
+                self._bytes_disco += os.path.getsize(ruta) - anterior
+            if self._bytes_disco > self.max_bytes_disco:
+                self._podar()
+
+    def _archivos(self):
+        """(ruta, bytes, mtime) de cada entrada en disco"""
+        if not os.path.isdir(self.directorio):
+            return []
+        archivos = []
+        for carpeta in os.scandir(self.directorio):
+            if not carpeta.is_dir():
+                continue
+            for archivo in os.scandir(carpeta.path):
+                if archivo.name.endswith('.json'):
+                    estado = archivo.stat()
+                    archivos.append((archivo.path, estado.st_size, estado.st_mtime))
+        return archivos
+
+    def _podar(self):
+        """Borra vencidas y luego las más viejas hasta quedar en el 90% del límite (llamar con el lock tomado)"""
+        limite = self.max_bytes_disco * 0.9
+        vencimiento = time.time() - self.ttl
+        archivos = sorted(self._archivos(), key=lambda a: a[2])
+        total = sum(tamano for _, tamano, _ in archivos)
+        for ruta, tamano, mtime in archivos:
+            if total <= limite and mtime >= vencimiento:
+                break
+            self._borrar(ruta)
+            total -= tamano
+            self._evictions_disco += 1
+        self._bytes_disco = total
+
+    @staticmethod
+    def _borrar(ruta: str):
+        try:
+            os.remove(ruta)
+        except OSError:
+            pass
+
+    def estadisticas(self) -> dict:
+        """Retorna métricas actuales de la cache de respuestas"""
+        with self._lock:
+            hits = self._hits_memoria + self._hits_disco
+            consultas = hits + self._misses
+            return {
+                'entradas_memoria': len(self._memoria),
+                'max_entradas_memoria': self.max_entradas_memoria,
+                'bytes_disco': self._bytes_disco,
+                'max_bytes_disco': self.max_bytes_disco,
+                'hits_memoria': self._hits_memoria,
+                'hits_disco': self._hits_disco,
+                'misses': self._misses,
+                'hit_ratio': round(hits / consultas, 4) if consultas else 0,
+                'guardadas': self._guardadas,
+                'expiradas': self._expiradas,
+                'evictions_disco': self._evictions_disco,
+                'ttl_s': self.ttl
+            }
@@ -0,0 +1,185 @@
+from collections import deque
+import threading
+import bisect
+import sys
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Límites (segundos) de los buckets de latencia
+BUCKETS_LATENCIA = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+CUANTILES = (0.5, 0.95, 0.99)
+
+class Histograma:
+    """Histograma acumulado con buckets fijos y ventana de muestras recientes para percentiles"""
+
+    def __init__(self, buckets=BUCKETS_LATENCIA, ventana: int = 1024):
+        self.buckets = buckets
+        self.conteos = [0] * (len(buckets) + 1)
+        self.suma = 0.0
+        self.total = 0
+        self.recientes = deque(maxlen=ventana)
+
+    def observar(self, valor: float):
+        self.conteos[bisect.bisect_left(self.buckets, valor)] += 1
+        self.suma += valor
+        self.total += 1
+        self.recientes.append(valor)
+
+    def percentiles(self, cuantiles=CUANTILES) -> dict:
+        """Percentiles (nearest-rank) sobre las últimas muestras"""
+        if not self.recientes:
+            return {}
+        ordenados = sorted(self.recientes)
+        return {
+            q: ordenados[min(len(ordenados) - 1, max(0, int(round(q * len(ordenados))) - 1))]
+            for q in cuantiles
+        }
+
+class _MetricaQuery:
+    """Acumulados de una query para un llamador"""
+
+    def __init__(self):
+        self.duracion = Histograma()
+        self.filas = 0
+        self.bytes = 0
+        self.errores = 0
+
+def estimar_bytes(filas, muestra: int = 100) -> int:
+    """Tamaño aproximado de un resultado, extrapolado desde las primeras `muestra` filas"""
+    if not filas:
+        return 0
+    parcial = filas[:muestra]
+    total = 0
+    for fila in parcial:
+        valores = fila.values() if isinstance(fila, dict) else fila
+        total += sys.getsizeof(fila) + sum(sys.getsizeof(v) for v in valores)
+    return int(total * len(filas) / len(parcial))
+
+def _etiquetas(**valores) -> str:
+    """Formatea etiquetas Prometheus escapando comillas y barras"""
+    if not valores:
+        return ''
+    partes = []
+    for clave, valor in valores.items():
+        valor = str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        partes.append(f'{clave}="{valor}"')
+    return '{' + ','.join(partes) + '}'
+
+class MetricsService:
+    """Métricas de queries y del pool de conexiones, exportables en formato Prometheus"""
+
+    PREFIJO = 'ia_reportes'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (query, llamador) -> _MetricaQuery
+        self._queries = {}
+        # query -> Histograma (todas las llamadas, para percentiles por nombre)
+        self._por_query = {}
+        self._espera_pool = Histograma()
+
+    def registrar_query(self, query: str, llamador: str, duracion: float, filas: int = 0,
+                        bytes_estimados: int = 0, error: bool = False):
+        """Registra una ejecución de query"""
+        with self._lock:
+            metrica = self._queries.get((query, llamador))
+            if metrica is None:
+                metrica = self._queries[(query, llamador)] = _MetricaQuery()
+            metrica.duracion.observar(duracion)
+            metrica.filas += filas
+            metrica.bytes += bytes_estimados
+            if error:
+                metrica.errores += 1
+
+            histograma = self._por_query.get(query)
+            if histograma is None:
+                histograma = self._por_query[query] = Histograma()
+            histograma.observar(duracion)
+
+    def registrar_espera_pool(self, segundos: float):
+        """Callback para ConnectionPool.on_espera"""
+        with self._lock:
+            self._espera_pool.observar(segundos)
+
+    def resumen(self) -> dict:
+        """Percentiles y totales por query (para logs o JSON)"""
+        with self._lock:
+            return {
+                query: {
+                    'llamadas': histograma.total,
+                    'promedio_ms': round(histograma.suma * 1000 / histograma.total, 3),
+                    **{f'p{int(q * 100)}_ms': round(v * 1000, 3) for q, v in histograma.percentiles().items()}
+                }
+                for query, histograma in sorted(self._por_query.items())
+            }
+
+    def _lineas_histograma(self, nombre: str, etiquetas: dict, histograma: Histograma) -> list:
+        lineas = []
+        acumulado = 0
+        for limite, conteo in zip(histograma.buckets, histograma.conteos):
+            acumulado += conteo
+            lineas.append(f"{nombre}_bucket{_etiquetas(**etiquetas, le=limite)} {acumulado}")
+        lineas.append(f"{nombre}_bucket{_etiquetas(**etiquetas, le='+Inf')} {histograma.total}")
+        lineas.append(f"{nombre}_sum{_etiquetas(**etiquetas)} {histograma.suma:.6f}")
+        lineas.append(f"{nombre}_count{_etiquetas(**etiquetas)} {histograma.total}")
+        return lineas
+
+    def exportar_prometheus(self, estado_pool: dict = None, estado_jobs: dict = None) -> str:
+        """Texto en formato de exposición de Prometheus (version 0.0.4)"""
+        p = self.PREFIJO
+        lineas = []
+        with self._lock:
+            lineas += [
+                f"# HELP {p}_db_query_duration_seconds Duración de las queries por nombre y llamador",
+                f"# TYPE {p}_db_query_duration_seconds histogram"
+            ]
+            for (query, llamador), metrica in sorted(self._queries.items()):
+                lineas += self._lineas_histograma(
+                    f"{p}_db_query_duration_seconds", {'query': query, 'caller': llamador}, metrica.duracion
+                )
+
+            lineas += [
+                f"# HELP {p}_db_query_duration_quantile_seconds Percentiles recientes de duración por query",
+                f"# TYPE {p}_db_query_duration_quantile_seconds gauge"
+            ]
+            for query, histograma in sorted(self._por_query.items()):
+                for q, valor in histograma.percentiles().items():
+                    lineas.append(
+                        f"{p}_db_query_duration_quantile_seconds{_etiquetas(query=query, quantile=q)} {valor:.6f}"
+                    )
+
+            for sufijo, ayuda, atributo in (
+                ('rows_total', 'Filas retornadas', 'filas'),
+                ('bytes_total', 'Bytes leídos (estimados)', 'bytes'),
+                ('errors_total', 'Queries con error', 'errores'),
+            ):
+                lineas += [f"# HELP {p}_db_query_{sufijo} {ayuda}", f"# TYPE {p}_db_query_{sufijo} counter"]
+                for (query, llamador), metrica in sorted(self._queries.items()):
+                    lineas.append(
+                        f"{p}_db_query_{sufijo}{_etiquetas(query=query, caller=llamador)} {getattr(metrica, atributo)}"
+                    )
+
+            lineas += [
+                f"# HELP {p}_db_pool_wait_seconds Espera para obtener una conexión del pool",
+                f"# TYPE {p}_db_pool_wait_seconds histogram"
+            ]
+            lineas += self._lineas_histograma(f"{p}_db_pool_wait_seconds", {}, self._espera_pool)
+
+        if estado_pool and estado_pool.get('inicializado'):
+            for clave in ('en_uso', 'libres', 'esperando', 'maximo'):
+                lineas += [
+                    f"# TYPE {p}_db_pool_{clave} gauge",
+                    f"{p}_db_pool_{clave} {estado_pool[clave]}"
+                ]
+
+        if estado_jobs:
+            for clave, tipo in (('en_cola', 'gauge'), ('ejecutando', 'gauge'), ('completados', 'counter'),
+                                ('errores', 'counter'), ('cancelados', 'counter'), ('rechazados', 'counter')):
+                nombre = f"{p}_jobs_{clave}_total" if tipo == 'counter' else f"{p}_jobs_{clave}"
+                lineas += [
+                    f"# TYPE {nombre} {tipo}",
+                    f"{nombre} {estado_jobs[clave]}"
+                ]
+
+        return '\n'.join(lineas) + '\n'
@@ -0,0 +1,136 @@
+import psycopg2
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+from datetime import date, datetime
+import threading
+import select
+import json
+import logging
+from src.config.settings import DB_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# Canal y tablas con trigger de MIGRACION_NOTIFICACIONES.sql
+CANAL = 'reportes_cambios'
+TABLAS_NOTIFICADAS = frozenset({'PEDIDO', 'PEDIDO_PRODUCTO', 'PRODUCTO', 'INSUMO', 'PRODUCCION'})
+# Tablas cargadas en el cubo de ventas
+TABLAS_CUBO = frozenset({'PEDIDO', 'PEDIDO_PRODUCTO'})
+
+class NotificationListener:
+    """
+    Hilo que escucha los cambios notificados por la BD e invalida la cache de queries
+
+    Cada notificación trae tabla y fecha: solo se quitan las entradas que leen esa
+    tabla y cuyo rango incluye esa fecha. Mientras el listener está conectado, los
+    rangos que incluyen hoy sobre tablas notificadas se cachean con el TTL largo;
+    al perder la conexión esas entradas se descartan (pudo perderse un cambio).
+    Si hay cubo de ventas, los días de pedidos cambiados se le marcan para releer.
+    """
+
+    def __init__(self, db_service, db_config: dict = DB_CONFIG, espera_reconexion: float = 5.0, cubo=None):
+        self.db = db_service
+        self.cubo = cubo
+        self.db_config = db_config
+        self.espera_reconexion = espera_reconexion
+        self._hilo = None
+        self._detener = threading.Event()
+
+        # Estadísticas
+        self.conectado = False
+        self.notificaciones = 0
+        self.invalidadas = 0
+        self.reconexiones = 0
+        self.ultima_notificacion = None
+
+    def _conectar(self):
+        """Conexión propia (fuera del pool) en autocommit, suscrita al canal"""
+        conexion = psycopg2.connect(**self.db_config)
+        conexion.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+        with conexion.cursor() as cursor:
+            cursor.execute(f"LISTEN {CANAL}")
+        return conexion
+
+    def procesar(self, notificaciones) -> int:
+        """Invalida las entradas afectadas por un lote de notificaciones; retorna cuántas se quitaron"""
+        cambios = set()
+        for notificacion in notificaciones:
+            try:
+                payload = json.loads(notificacion.payload)
+                cambios.add((payload['tabla'].upper(), payload.get('fecha')))
+            except (ValueError, KeyError, AttributeError):
+                logger.warning(f"Notificación ignorada (payload inválido): {notificacion.payload!r}")
+
+        invalidadas = 0
+        for tabla, fecha in cambios:
+            # Sin fecha (PRODUCTO, INSUMO): todas las entradas que leen la tabla
+            invalidadas += self.db.invalidar_cache([tabla], fecha, fecha)
+            if self.cubo is not None and tabla in TABLAS_CUBO and fecha:
+                self.cubo.marcar_cambio(fecha)
+
+        self.notificaciones += len(notificaciones)
+        self.invalidadas += invalidadas
+        self.ultima_notificacion = datetime.now().isoformat(timespec='seconds')
+        return invalidadas
+
+    def _activar(self):
+        self.conectado = True
+        if self.db.cache is not None:
+            self.db.cache.tablas_notificadas = TABLAS_NOTIFICADAS
+
+    def _desactivar(self):
+        """Vuelve al TTL corto y descarta lo cacheado con el largo (desde hoy en adelante o sin fechas)"""
+        if not self.conectado:
+            return
+        self.conectado = False
+        if self.db.cache is not None:
+            self.db.cache.tablas_notificadas = frozenset()
+            self.db.invalidar_cache(TABLAS_NOTIFICADAS, date.today())
+
+    def _escuchar(self):
+        conexion = self._conectar()
+        try:
+            self._activar()
+            logger.info(f"Escuchando cambios en el canal {CANAL}")
+            while not self._detener.is_set():
+                # Timeout para revisar periódicamente si hay que detenerse
+                if select.select([conexion], [], [], 1.0) == ([], [], []):
+                    continue
+                conexion.poll()
+                if conexion.notifies:
+                    notificaciones, conexion.notifies[:] = list(conexion.notifies), []
+                    self.procesar(notificaciones)
+        finally:
+            self._desactivar()
+            conexion.close()
+
+    def iniciar(self):
+        """Escucha en un hilo daemon, reconectando si se pierde la conexión"""
+        if self._hilo and self._hilo.is_alive():
+            return
+
+        def _ciclo():
+            espera = 0
+            while not self._detener.wait(espera):
+                try:
+                    self._escuchar()
+                except Exception as e:
+                    logger.error(f"Error en listener de notificaciones: {str(e)}")
+                    self.reconexiones += 1
+                    espera = self.espera_reconexion
+
+        self._detener.clear()
+        self._hilo = threading.Thread(target=_ciclo, name='cache-notificaciones', daemon=True)
+        self._hilo.start()
+
+    def detener(self):
+        """Detiene el hilo (tarda como máximo un segundo en soltar la conexión)"""
+        self._detener.set()
+
+    def estadisticas(self) -> dict:
+        return {
+            'conectado': self.conectado,
+            'canal': CANAL,
+            'notificaciones': self.notificaciones,
+            'invalidadas': self.invalidadas,
+            'reconexiones': self.reconexiones,
+            'ultima_notificacion': self.ultima_notificacion
+        }
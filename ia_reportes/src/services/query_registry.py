@@ -0,0 +1,177 @@
+import psycopg2
+from psycopg2 import errors
+import threading
+import weakref
+import time
+import re
+import logging
+
+logger = logging.getLogger(__name__)
+
+_PATRON_PARAMETRO = re.compile(r'%%|%s')
+_PATRON_NOMBRE = re.compile(r'^[a-z_][a-z0-9_]*$')
+
+def _a_posicionales(sql: str) -> tuple:
+    """Convierte los placeholders %s de psycopg2 a $1..$n; retorna (sql, cantidad)"""
+    contador = 0
+
+    def _reemplazar(coincidencia):
+        nonlocal contador
+        if coincidencia.group(0) == '%%':
+            return '%'
+        contador += 1
+        return f'${contador}'
+
+    return _PATRON_PARAMETRO.sub(_reemplazar, sql), contador
+
+class _Sentencia:
+    """Sentencia registrada con sus métricas acumuladas"""
+
+    def __init__(self, nombre: str, sql: str):
+        self.nombre = nombre
+        self.sql = sql
+        self.sql_preparado, self.parametros = _a_posicionales(sql)
+        self.preparaciones = 0
+        self.tiempo_preparacion = 0.0
+        self.ejecuciones = 0
+        self.tiempo_ejecucion = 0.0
+        self.tiempo_ejecucion_max = 0.0
+        self.repreparaciones = 0
+        self.sin_preparar = 0
+
+class QueryRegistry:
+    """
+    Registro de sentencias con nombre ejecutadas como prepared statements del servidor
+
+    Cada conexión del pool prepara una sentencia la primera vez que la usa. Si el
+    servidor perdió la sentencia (reconexión, DISCARD ALL), se vuelve a preparar y
+    se reintenta una vez; si no se puede preparar se ejecuta el SQL directamente.
+    """
+
+    def __init__(self, habilitado: bool = True):
+        self.habilitado = habilitado
+        self._sentencias = {}
+        # conexión -> nombres ya preparados en esa sesión del servidor
+        self._preparadas = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def registrar(self, nombre: str, sql: str) -> _Sentencia:
+        """Registra (una sola vez) el SQL de una sentencia con nombre"""
+        sentencia = self._sentencias.get(nombre)
+        if sentencia is not None:
+            if sentencia.sql != sql:
+                raise ValueError(f"La sentencia '{nombre}' ya está registrada con otro SQL")
+            return sentencia
+
+        if not _PATRON_NOMBRE.match(nombre):
+            raise ValueError(f"Nombre de sentencia inválido: {nombre}")
+
+        with self._lock:
+            sentencia = self._sentencias.setdefault(nombre, _Sentencia(nombre, sql))
+        return sentencia
+
+    def _nombres_preparados(self, conexion) -> set:
+        """Nombres preparados en la conexión (vacío si es una conexión nueva)"""
+        with self._lock:
+            preparados = self._preparadas.get(conexion)
+            if preparados is None:
+                preparados = self._preparadas[conexion] = set()
+            return preparados
+
+    def _preparar(self, cursor, sentencia: _Sentencia) -> bool:
+        """PREPARE de la sentencia en la sesión del cursor; False si el servidor no lo admite"""
+        conexion = cursor.connection
+        inicio = time.perf_counter()
+        try:
+            cursor.execute(f"PREPARE {sentencia.nombre} AS {sentencia.sql_preparado}")
+        except errors.DuplicatePreparedStatement:
+            # Ya existía en el servidor aunque no lo teníamos registrado
+            conexion.rollback()
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            raise
+        except psycopg2.Error as e:
+            # p. ej. un proxy en modo transacción que no soporta PREPARE
+            logger.warning(f"No se pudo preparar '{sentencia.nombre}', se ejecuta sin preparar: {str(e)}")
+            conexion.rollback()
+            return False
+        duracion = time.perf_counter() - inicio
+        with self._lock:
+            sentencia.preparaciones += 1
+            sentencia.tiempo_preparacion += duracion
+        self._nombres_preparados(conexion).add(sentencia.nombre)
+        return True
+
+    def _ejecutar_preparada(self, cursor, sentencia: _Sentencia, params):
+        """EXECUTE de la sentencia, midiendo el tiempo"""
+        if sentencia.parametros:
+            marcadores = ', '.join(['%s'] * sentencia.parametros)
+            sql = f"EXECUTE {sentencia.nombre}({marcadores})"
+        else:
+            sql = f"EXECUTE {sentencia.nombre}"
+        inicio = time.perf_counter()
+        cursor.execute(sql, params)
+        self._registrar_ejecucion(sentencia, time.perf_counter() - inicio)
+
+    def _registrar_ejecucion(self, sentencia: _Sentencia, duracion: float):
+        with self._lock:
+            sentencia.ejecuciones += 1
+            sentencia.tiempo_ejecucion += duracion
+            sentencia.tiempo_ejecucion_max = max(sentencia.tiempo_ejecucion_max, duracion)
+
+    def _ejecutar_directo(self, cursor, sentencia: _Sentencia, params):
+        """Ejecuta el SQL original sin preparar"""
+        inicio = time.perf_counter()
+        cursor.execute(sentencia.sql, params)
+        self._registrar_ejecucion(sentencia, time.perf_counter() - inicio)
+
+    def ejecutar(self, cursor, nombre: str, sql: str, params=None):
+        """
+        Ejecuta la sentencia con nombre en el cursor (preparándola si hace falta)
+
+        Solo para sentencias de lectura: recuperarse de una sentencia perdida
+        descarta la transacción abierta de la conexión.
+        """
+        sentencia = self.registrar(nombre, sql)
+
+        if not self.habilitado or isinstance(params, dict) or cursor.name:
+            # Parámetros con nombre y cursores del servidor no admiten EXECUTE
+            self._ejecutar_directo(cursor, sentencia, params)
+            return
+
+        conexion = cursor.connection
+        if nombre not in self._nombres_preparados(conexion) and not self._preparar(cursor, sentencia):
+            with self._lock:
+                sentencia.sin_preparar += 1
+            self._ejecutar_directo(cursor, sentencia, params)
+            return
+
+        try:
+            self._ejecutar_preparada(cursor, sentencia, params)
+        except errors.InvalidSqlStatementName:
+            # El servidor perdió la sentencia (DISCARD ALL, proxy): preparar y reintentar una vez
+            logger.info(f"Sentencia '{nombre}' no existe en la sesión; se vuelve a preparar")
+            conexion.rollback()
+            self._nombres_preparados(conexion).discard(nombre)
+            with self._lock:
+                sentencia.repreparaciones += 1
+            if self._preparar(cursor, sentencia):
+                self._ejecutar_preparada(cursor, sentencia, params)
+            else:
+                self._ejecutar_directo(cursor, sentencia, params)
+
+    def estadisticas(self) -> dict:
+        """Métricas por sentencia: preparaciones, ejecuciones y tiempos (ms)"""
+        with self._lock:
+            return {
+                nombre: {
+                    'preparaciones': s.preparaciones,
+                    'tiempo_preparacion_ms': round(s.tiempo_preparacion * 1000, 3),
+                    'ejecuciones': s.ejecuciones,
+                    'tiempo_ejecucion_ms': round(s.tiempo_ejecucion * 1000, 3),
+                    'tiempo_ejecucion_promedio_ms': round(s.tiempo_ejecucion * 1000 / s.ejecuciones, 3) if s.ejecuciones else 0,
+                    'tiempo_ejecucion_max_ms': round(s.tiempo_ejecucion_max * 1000, 3),
+                    'repreparaciones': s.repreparaciones,
+                    'sin_preparar': s.sin_preparar
+                }
+                for nombre, s in sorted(self._sentencias.items())
+            }
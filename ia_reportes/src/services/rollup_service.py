@@ -0,0 +1,143 @@
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+class RollupService:
+    """Refresco incremental del rollup diario de ventas (ver MIGRACION_ROLLUP_VENTAS.sql)"""
+
+    NOMBRE = 'VENTA_DIARIA'
+    TABLAS = ('VENTA_DIARIA', 'VENTA_DIARIA_CATEGORIA', 'PEDIDO_DIARIO')
+
+    def __init__(self, db_service):
+        self.db = db_service
+        self._lock = threading.Lock()
+        self._hilo = None
+        self._detener = threading.Event()
+        self.ultimo_resultado = None
+
+    def refrescar(self) -> dict:
+        """
+        Recalcula solo los días registrados en VENTA_DIARIA_CAMBIO desde el último refresco
+
+        Los cambios se consumen con DELETE ... RETURNING dentro de la misma transacción,
+        así que un cambio confirmado durante el refresco queda para la siguiente pasada.
+        """
+        with self._lock:
+            inicio = time.monotonic()
+            try:
+                with self.db.sesion() as conexion:
+                    try:
+                        with conexion.cursor() as cursor:
+                            # Serializa refrescos concurrentes (p. ej. varios workers)
+                            cursor.execute(
+                                "SELECT ULTIMO_CAMBIO FROM ROLLUP_ESTADO WHERE NOMBRE = %s FOR UPDATE",
+                                (self.NOMBRE,)
+                            )
+                            estado = cursor.fetchone()
+                            if estado is None:
+                                raise RuntimeError("Rollup sin carga inicial: ejecutar MIGRACION_ROLLUP_VENTAS.sql")
+
+                            cursor.execute("DELETE FROM VENTA_DIARIA_CAMBIO RETURNING ID, FECHA")
+                            cambios = cursor.fetchall()
+                            dias = sorted({fecha for _, fecha in cambios})
+                            ultimo_cambio = max((id_cambio for id_cambio, _ in cambios), default=estado[0])
+
+                            if dias:
+                                self._recalcular_dias(cursor, dias)
+
+                            cursor.execute(
+                                """
+                                UPDATE ROLLUP_ESTADO
+                                SET MARCA = CLOCK_TIMESTAMP(), ULTIMO_CAMBIO = %s, DIAS_RECALCULADOS = %s
+                                WHERE NOMBRE = %s
+                                """,
+                                (ultimo_cambio, len(dias), self.NOMBRE)
+                            )
+                        conexion.commit()
+                    except Exception:
+                        conexion.rollback()
+                        raise
+
+                if dias:
+                    # Los agregados cacheados de esos días quedaron desactualizados
+                    self.db.invalidar_cache(self.TABLAS, dias[0], dias[-1])
+
+                self.ultimo_resultado = {
+                    'dias_recalculados': len(dias),
+                    'desde': dias[0].isoformat() if dias else None,
+                    'hasta': dias[-1].isoformat() if dias else None,
+                    'ultimo_cambio': ultimo_cambio,
+                    'duracion_s': round(time.monotonic() - inicio, 3)
+                }
+                logger.info(f"Rollup de ventas refrescado: {self.ultimo_resultado}")
+                return self.ultimo_resultado
+
+            except Exception as e:
+                logger.error(f"Error refrescando rollup de ventas: {str(e)}")
+                raise
+
+    def _recalcular_dias(self, cursor, dias: list):
+        """Reemplaza las filas del rollup de los días indicados"""
+        for tabla in self.TABLAS:
+            cursor.execute(f"DELETE FROM {tabla} WHERE FECHA = ANY(%s::date[])", (dias,))
+
+        cursor.execute(
+            """
+            INSERT INTO VENTA_DIARIA(FECHA, ID_PRODUCTO, ID_CATEGORIA, CI_CLIENTE, CANTIDAD, TOTAL, LINEAS, SUMA_PRECIO)
+            SELECT p.fecha_pedido, pp.id_producto, pr.id_categoria, p.ci_cliente,
+                SUM(pp.cantidad), SUM(pp.total), COUNT(*), SUM(pp.precio)
+            FROM PEDIDO p
+            JOIN PEDIDO_PRODUCTO pp ON p.id = pp.id_pedido
+            JOIN PRODUCTO pr ON pp.id_producto = pr.id
+            WHERE p.fecha_pedido = ANY(%s::date[])
+            GROUP BY p.fecha_pedido, pp.id_producto, pr.id_categoria, p.ci_cliente
+            """,
+            (dias,)
+        )
+        cursor.execute(
+            """
+            INSERT INTO VENTA_DIARIA_CATEGORIA(FECHA, ID_CATEGORIA, CI_CLIENTE, PEDIDOS)
+            SELECT p.fecha_pedido, pr.id_categoria, p.ci_cliente, COUNT(DISTINCT p.id)
+            FROM PEDIDO p
+            JOIN PEDIDO_PRODUCTO pp ON p.id = pp.id_pedido
+            JOIN PRODUCTO pr ON pp.id_producto = pr.id
+            WHERE p.fecha_pedido = ANY(%s::date[])
+            GROUP BY p.fecha_pedido, pr.id_categoria, p.ci_cliente
+            """,
+            (dias,)
+        )
+        cursor.execute(
+            """
+            INSERT INTO PEDIDO_DIARIO(FECHA, CI_CLIENTE, PEDIDOS, TOTAL, LINEAS)
+            SELECT p.fecha_pedido, p.ci_cliente, COUNT(*), SUM(p.total),
+                SUM((SELECT COUNT(*) FROM PEDIDO_PRODUCTO pp WHERE pp.id_pedido = p.id))
+            FROM PEDIDO p
+            WHERE p.fecha_pedido = ANY(%s::date[])
+            GROUP BY p.fecha_pedido, p.ci_cliente
+            """,
+            (dias,)
+        )
+
+    def iniciar_refresco_periodico(self, intervalo_segundos: float):
+        """Lanza un hilo daemon que refresca el rollup cada `intervalo_segundos`"""
+        if self._hilo and self._hilo.is_alive():
+            return
+
+        def _ciclo():
+            while not self._detener.wait(intervalo_segundos):
+                try:
+                    self.refrescar()
+                except Exception:
+                    # Ya registrado en refrescar(); se reintenta en el próximo ciclo
+                    pass
+
+        self._detener.clear()
+        self._hilo = threading.Thread(target=_ciclo, name='rollup-ventas', daemon=True)
+        self._hilo.start()
+        logger.info(f"Refresco periódico del rollup de ventas cada {intervalo_segundos}s")
+
+    def detener(self):
+        """Detiene el hilo de refresco periódico"""
+        self._detener.set()
@@ -0,0 +1,454 @@
+import numpy as np
+import threading
+import time
+from datetime import date, timedelta
+from decimal import Decimal, ROUND_HALF_UP, localcontext
+import logging
+from src.config.settings import CUBO_VENTANA_DIAS
+
+logger = logging.getLogger(__name__)
+
+_EPOCA = date(1970, 1, 1).toordinal()
+
+# PEDIDO.total, PEDIDO_PRODUCTO.precio y PEDIDO_PRODUCTO.total son NUMERIC(12,2): en el cubo
+# van como centavos enteros para que las sumas sean exactas (mismos Decimal que la BD)
+ESCALA_MONTOS = 2
+
+QUERY_CUBO_TOPE = "SELECT COALESCE(MAX(id), 0) as tope FROM PEDIDO"
+
+# Pedidos a (re)leer: hasta el tope y, de esos, los de id nuevo, los de la ventana de días
+# recientes o los de días con cambios notificados. Con id 0 se lee todo (carga completa)
+QUERY_CUBO_PEDIDOS = """
+SELECT p.id, p.fecha_pedido, p.total, p.ci_cliente
+FROM PEDIDO p
+WHERE p.id <= %s AND (p.id > %s OR p.fecha_pedido >= %s OR p.fecha_pedido = ANY(%s::date[]))
+ORDER BY p.fecha_pedido, p.id
+"""
+
+QUERY_CUBO_LINEAS = """
+SELECT pp.id_pedido, p.fecha_pedido, pp.id_producto, pp.cantidad, pp.precio, pp.total
+FROM PEDIDO_PRODUCTO pp
+JOIN PEDIDO p ON pp.id_pedido = p.id
+WHERE p.id <= %s AND (p.id > %s OR p.fecha_pedido >= %s OR p.fecha_pedido = ANY(%s::date[]))
+ORDER BY p.fecha_pedido, p.id
+"""
+
+QUERY_CUBO_CLIENTES = "SELECT ci, nombre FROM CLIENTE"
+
+QUERY_CUBO_PRODUCTOS = """
+SELECT pr.id, pr.nombre, cat.nombre as categoria
+FROM PRODUCTO pr
+LEFT JOIN CATEGORIA cat ON pr.id_categoria = cat.id
+"""
+
+def _dia(fecha) -> int:
+    """Fecha (date o 'YYYY-MM-DD') como días desde 1970-01-01"""
+    if isinstance(fecha, date):
+        return fecha.toordinal() - _EPOCA
+    return int(np.datetime64(str(fecha)[:10], 'D').astype(np.int64))
+
+def _fecha(dia: int) -> date:
+    return date.fromordinal(_EPOCA + int(dia))
+
+def _centavos(montos: np.ndarray) -> np.ndarray:
+    """Montos NUMERIC (float64 del modo columnar) como enteros en la unidad mínima"""
+    return np.rint(montos * 10 ** ESCALA_MONTOS).astype(np.int64)
+
+def _decimal(centavos) -> Decimal:
+    """Suma en centavos como el Decimal que da SUM sobre la columna NUMERIC"""
+    return Decimal(int(round(centavos))).scaleb(-ESCALA_MONTOS)
+
+def _digito_base(valor: Decimal) -> tuple:
+    """Peso y valor del primer dígito no nulo de `valor` en base 10000 (la de NUMERIC)"""
+    if not valor:
+        return 0, 0
+    peso = valor.adjusted() // 4
+    return peso, int(abs(valor).scaleb(-4 * peso))
+
+def _promedio(centavos, cantidad: int) -> Decimal:
+    """
+    AVG de una columna NUMERIC: suma / cantidad con la escala de numeric_div de PostgreSQL
+
+    Al menos 16 dígitos significativos (select_div_scale) y redondeo al más cercano,
+    para que el valor y su representación coincidan con los de la BD.
+    """
+    suma = _decimal(centavos)
+    peso_suma, digito_suma = _digito_base(suma)
+    peso_cantidad, digito_cantidad = _digito_base(Decimal(cantidad))
+    peso = peso_suma - peso_cantidad - (1 if digito_suma <= digito_cantidad else 0)
+    escala = min(max(16 - 4 * peso, ESCALA_MONTOS), 1000)
+    with localcontext() as contexto:
+        contexto.prec = escala + 40
+        return (suma / cantidad).quantize(Decimal(1).scaleb(-escala), rounding=ROUND_HALF_UP)
+
+def _codificar(valores, mapa: dict) -> np.ndarray:
+    """Reemplaza cada valor por su código en `mapa` (agregando los nuevos al final)"""
+    if len(valores) == 0:
+        return np.array([], dtype=np.int32)
+    unicos, inversa = np.unique(valores, return_inverse=True)
+    codigos = np.array([mapa.setdefault(valor, len(mapa)) for valor in unicos.tolist()], dtype=np.int32)
+    return codigos[inversa]
+
+def _agrupar(nombres) -> tuple:
+    """Códigos por nombre (-1 para None) y la lista de nombres distintos"""
+    grupos = {}
+    codigos = np.array(
+        [grupos.setdefault(nombre, len(grupos)) if nombre is not None else -1 for nombre in nombres],
+        dtype=np.int32
+    )
+    return codigos, list(grupos)
+
+def _por_codigo(mapa: dict) -> list:
+    """Inverso de un mapa valor -> código"""
+    valores = [None] * len(mapa)
+    for valor, codigo in mapa.items():
+        valores[codigo] = valor
+    return valores
+
+class _Datos:
+    """Columnas del cubo en un momento dado; se reemplaza entera en cada actualización"""
+
+    def __init__(self, **columnas):
+        self.__dict__.update(columnas)
+
+class CuboVentas:
+    """
+    Cubo de ventas en memoria: columnas NumPy de pedidos y líneas ordenadas por fecha
+
+    Clientes, productos y categorías van codificados como enteros (diccionarios
+    estables entre actualizaciones). Un rango de fechas es un corte por búsqueda
+    binaria y cada group-by un np.bincount sobre el corte.
+
+    Los pedidos se crean vacíos y las líneas llegan después, así que cada
+    actualización reemplaza enteros los días de los últimos `ventana_dias` (líneas
+    tardías, cambios, borrados e ids confirmados fuera de orden), los días marcados
+    con marcar_cambio() (notificaciones de la BD) y agrega los pedidos de id nuevo.
+    Un cambio en un día anterior a la ventana sin notificación requiere recargar().
+    """
+
+    def __init__(self, db_service, ventana_dias: int = CUBO_VENTANA_DIAS):
+        self.db = db_service
+        self.ventana_dias = ventana_dias
+        self._lock = threading.Lock()
+        self._datos = None
+        self._codigo_cliente = {}
+        self._codigo_producto = {}
+        self._hilo = None
+        self._detener = threading.Event()
+        # Días (ordinal desde 1970) con cambios notificados, pendientes de releer
+        self._dias_cambiados = set()
+        self._lock_cambios = threading.Lock()
+
+    @property
+    def cargado(self) -> bool:
+        return self._datos is not None
+
+    # ===== CARGA =====
+    def marcar_cambio(self, fecha):
+        """Registra un día de PEDIDO/PEDIDO_PRODUCTO que cambió; se relee en la próxima actualización"""
+        with self._lock_cambios:
+            self._dias_cambiados.add(_dia(fecha))
+
+    def actualizar(self) -> dict:
+        """Relee la ventana de días recientes y los días con cambios, agrega los pedidos nuevos y refresca los catálogos"""
+        with self._lock:
+            inicio = time.monotonic()
+            anterior = self._datos
+            desde = anterior.ultimo_id if anterior else 0
+            ventana = date.today() - timedelta(days=self.ventana_dias)
+            with self._lock_cambios:
+                dias, self._dias_cambiados = self._dias_cambiados, set()
+            try:
+                with self.db.sesion():
+                    tope = self.db.execute_query(QUERY_CUBO_TOPE, usar_cache=False, nombre='cubo_tope')[0]['tope']
+                    params = (tope, desde, ventana, [_fecha(dia) for dia in sorted(dias)])
+                    pedidos = self.db.execute_columnar(QUERY_CUBO_PEDIDOS, params, nombre='cubo_pedidos')
+                    lineas = self.db.execute_columnar(QUERY_CUBO_LINEAS, params, nombre='cubo_lineas')
+                    clientes = self.db.execute_columnar(QUERY_CUBO_CLIENTES, nombre='cubo_clientes')
+                    productos = self.db.execute_columnar(QUERY_CUBO_PRODUCTOS, nombre='cubo_productos')
+            except Exception as e:
+                # Los días marcados quedan pendientes para el próximo intento
+                with self._lock_cambios:
+                    self._dias_cambiados |= dias
+                logger.error(f"Error actualizando cubo de ventas: {str(e)}")
+                raise
+
+            self._datos = self._construir(
+                anterior, pedidos, lineas, clientes, productos, max(tope, desde), _dia(ventana), dias
+            )
+            resultado = {
+                'pedidos_leidos': len(pedidos['id']),
+                'lineas_leidas': len(lineas['id_pedido']),
+                'dias_notificados': len(dias),
+                'pedidos': len(self._datos.ped_id),
+                'lineas': len(self._datos.lin_pedido),
+                'duracion_ms': round((time.monotonic() - inicio) * 1000, 1)
+            }
+            logger.info(f"Cubo de ventas actualizado: {resultado}")
+            return resultado
+
+    def recargar(self) -> dict:
+        """Descarta el cubo y lo vuelve a cargar completo"""
+        with self._lock:
+            self._datos = None
+            self._codigo_cliente = {}
+            self._codigo_producto = {}
+        return self.actualizar()
+
+    def _construir(self, anterior, pedidos, lineas, clientes, productos, ultimo_id, ventana: int = None,
+                   dias=()) -> _Datos:
+        """
+        Nuevo _Datos con las filas leídas, las anteriores que no se releyeron y los catálogos actuales
+
+        De `anterior` se descartan los días desde `ventana`, los días en `dias` y los
+        pedidos releídos (pudo cambiar su fecha): las filas leídas los reemplazan,
+        así que entran las líneas agregadas y salen las borradas desde la carga anterior.
+        """
+        nuevas = {
+            'ped_fecha': pedidos['fecha_pedido'].astype('datetime64[D]').astype(np.int32),
+            'ped_id': pedidos['id'].astype(np.int64),
+            'ped_total': _centavos(pedidos['total']),
+            'ped_cliente': _codificar(pedidos['ci_cliente'], self._codigo_cliente),
+            'lin_fecha': lineas['fecha_pedido'].astype('datetime64[D]').astype(np.int32),
+            'lin_pedido': lineas['id_pedido'].astype(np.int64),
+            'lin_producto': _codificar(lineas['id_producto'], self._codigo_producto),
+            'lin_cantidad': lineas['cantidad'].astype(np.int64),
+            'lin_precio': _centavos(lineas['precio']),
+            'lin_total': _centavos(lineas['total']),
+        }
+
+        if anterior is not None:
+            releidos = np.unique(nuevas['ped_id'])
+            dias = np.array(sorted(dias), dtype=np.int32)
+            conservar = {
+                'ped': ~((anterior.ped_fecha >= ventana) | np.isin(anterior.ped_fecha, dias)
+                         | np.isin(anterior.ped_id, releidos)),
+                'lin': ~((anterior.lin_fecha >= ventana) | np.isin(anterior.lin_fecha, dias)
+                         | np.isin(anterior.lin_pedido, releidos))
+            }
+            for clave in nuevas:
+                nuevas[clave] = np.concatenate([getattr(anterior, clave)[conservar[clave[:3]]], nuevas[clave]])
+
+            # Lo releído no siempre va después de lo conservado (días notificados, ids nuevos
+            # con fecha vieja): en ese caso reordenar por fecha e id (estable, las líneas de un
+            # pedido siguen contiguas)
+            for prefijo, ids in (('ped', 'ped_id'), ('lin', 'lin_pedido')):
+                fechas = nuevas[f'{prefijo}_fecha']
+                conservadas = int(np.count_nonzero(conservar[prefijo]))
+                if 0 < conservadas < len(fechas) and fechas[conservadas] <= fechas[conservadas - 1]:
+                    orden = np.lexsort((nuevas[ids], fechas))
+                    for clave in nuevas:
+                        if clave.startswith(prefijo):
+                            nuevas[clave] = nuevas[clave][orden]
+
+        # Catálogos: todos los clientes/productos actuales, sin cambiar los códigos existentes
+        for ci in clientes['ci'].tolist():
+            self._codigo_cliente.setdefault(ci, len(self._codigo_cliente))
+        for id_producto in productos['id'].tolist():
+            self._codigo_producto.setdefault(id_producto, len(self._codigo_producto))
+
+        nombre_cliente = dict(zip(clientes['ci'].tolist(), clientes['nombre'].tolist()))
+        cliente_ci = _por_codigo(self._codigo_cliente)
+        cliente_grupo, nombres_cliente = _agrupar([nombre_cliente.get(ci) for ci in cliente_ci])
+
+        producto = {
+            id_producto: (nombre, categoria)
+            for id_producto, nombre, categoria in zip(
+                productos['id'].tolist(), productos['nombre'].tolist(), productos['categoria'].tolist()
+            )
+        }
+        producto_id = _por_codigo(self._codigo_producto)
+        producto_grupo, nombres_producto = _agrupar([producto.get(i, (None, None))[0] for i in producto_id])
+        producto_categoria, nombres_categoria = _agrupar([producto.get(i, (None, None))[1] for i in producto_id])
+
+        return _Datos(
+            **nuevas,
+            ultimo_id=ultimo_id,
+            cliente_ci=cliente_ci,
+            cliente_nombre=[nombre_cliente.get(ci) for ci in cliente_ci],
+            cliente_activo=np.array([ci in nombre_cliente for ci in cliente_ci], dtype=bool),
+            cliente_grupo=cliente_grupo,
+            nombres_cliente=nombres_cliente,
+            producto_grupo=producto_grupo,
+            nombres_producto=nombres_producto,
+            producto_categoria=producto_categoria,
+            nombres_categoria=nombres_categoria
+        )
+
+    def iniciar_refresco_periodico(self, intervalo_segundos: float):
+        """Carga el cubo en un hilo daemon que luego lo actualiza cada `intervalo_segundos` (0 = solo cargar)"""
+        if self._hilo and self._hilo.is_alive():
+            return
+
+        def _ciclo():
+            espera = 0
+            while not self._detener.wait(espera):
+                try:
+                    self.actualizar()
+                except Exception:
+                    # Ya registrado en actualizar(); se reintenta en el próximo ciclo
+                    if intervalo_segundos <= 0:
+                        espera = 60
+                        continue
+                if intervalo_segundos <= 0 and self.cargado:
+                    return
+                espera = intervalo_segundos
+
+        self._detener.clear()
+        self._hilo = threading.Thread(target=_ciclo, name='cubo-ventas', daemon=True)
+        self._hilo.start()
+        logger.info(f"Actualización periódica del cubo de ventas cada {intervalo_segundos}s")
+
+    def detener(self):
+        """Detiene el hilo de actualización periódica"""
+        self._detener.set()
+
+    # ===== CONSULTAS =====
+    def _corte(self, fechas: np.ndarray, fecha_inicio, fecha_fin) -> slice:
+        """Posiciones del rango [fecha_inicio, fecha_fin] por búsqueda binaria"""
+        # Mismo dtype que la columna: con otro, numpy convertiría la columna entera
+        desde = np.searchsorted(fechas, fechas.dtype.type(_dia(fecha_inicio)), 'left')
+        hasta = np.searchsorted(fechas, fechas.dtype.type(_dia(fecha_fin)), 'right')
+        return slice(desde, hasta)
+
+    def get_ventas_por_categoria(self, fecha_inicio, fecha_fin) -> list:
+        """Como DatabaseService.get_ventas_por_categoria"""
+        d = self._datos
+        corte = self._corte(d.lin_fecha, fecha_inicio, fecha_fin)
+        categoria = d.producto_categoria[d.lin_producto[corte]]
+        con_categoria = categoria >= 0
+        categoria = categoria[con_categoria]
+        n = len(d.nombres_categoria)
+
+        total = np.bincount(categoria, weights=d.lin_total[corte][con_categoria], minlength=n)
+        cantidad = np.bincount(categoria, weights=d.lin_cantidad[corte][con_categoria], minlength=n)
+        lineas = np.bincount(categoria, minlength=n)
+        # Pedidos distintos por categoría. Las líneas de un pedido son contiguas (mismo
+        # día, ordenadas por id), así que basta marcar pares (pedido local, categoría)
+        pedido = d.lin_pedido[corte][con_categoria]
+        local = np.concatenate([[0], np.cumsum(pedido[1:] != pedido[:-1])]) if len(pedido) else pedido
+        marcados = np.zeros((len(pedido) and int(local[-1]) + 1, n), dtype=bool)
+        marcados[local, categoria] = True
+        pedidos = marcados.sum(axis=0)
+
+        presentes = np.flatnonzero(lineas)
+        orden = presentes[np.argsort(-total[presentes], kind='stable')]
+        return [
+            {
+                'categoria': d.nombres_categoria[i],
+                'cantidad_vendida': int(cantidad[i]),
+                'total_vendido': _decimal(total[i]),
+                'pedidos': int(pedidos[i])
+            }
+            for i in orden
+        ]
+
+    def get_productos_mas_vendidos(self, fecha_inicio, fecha_fin, limite=10) -> list:
+        """Como DatabaseService.get_productos_mas_vendidos"""
+        d = self._datos
+        corte = self._corte(d.lin_fecha, fecha_inicio, fecha_fin)
+        grupo = d.producto_grupo[d.lin_producto[corte]]
+        con_producto = grupo >= 0
+        grupo = grupo[con_producto]
+        n = len(d.nombres_producto)
+
+        cantidad = np.bincount(grupo, weights=d.lin_cantidad[corte][con_producto], minlength=n)
+        total = np.bincount(grupo, weights=d.lin_total[corte][con_producto], minlength=n)
+        suma_precio = np.bincount(grupo, weights=d.lin_precio[corte][con_producto], minlength=n)
+        lineas = np.bincount(grupo, minlength=n)
+
+        presentes = np.flatnonzero(lineas)
+        orden = presentes[np.argsort(-cantidad[presentes], kind='stable')][:limite]
+        return [
+            {
+                'producto': d.nombres_producto[i],
+                'cantidad': int(cantidad[i]),
+                'total_vendido': _decimal(total[i]),
+                'precio_promedio': _promedio(suma_precio[i], int(lineas[i]))
+            }
+            for i in orden
+        ]
+
+    def get_resumen_ventas(self, fecha_inicio, fecha_fin) -> dict:
+        """Como DatabaseService.get_resumen_ventas"""
+        d = self._datos
+        corte = self._corte(d.ped_fecha, fecha_inicio, fecha_fin)
+        cantidad_ordenes = int(corte.stop - corte.start)
+        if not cantidad_ordenes:
+            return {
+                'total_ventas': 0,
+                'cantidad_ordenes': 0,
+                'ticket_promedio': 0,
+                'productos_vendidos': 0,
+                'clientes_unicos': 0
+            }
+
+        lineas = self._corte(d.lin_fecha, fecha_inicio, fecha_fin)
+        grupos = d.cliente_grupo[d.ped_cliente[corte]]
+        # Los pedidos sin cliente cuentan como un cliente más
+        clientes_unicos = int(np.count_nonzero(np.bincount(grupos[grupos >= 0], minlength=len(d.nombres_cliente))))
+        clientes_unicos += int(bool((grupos < 0).any()))
+
+        total_ventas = float(_decimal(d.ped_total[corte].sum()))
+        return {
+            'total_ventas': total_ventas,
+            'cantidad_ordenes': cantidad_ordenes,
+            'ticket_promedio': total_ventas / cantidad_ordenes,
+            'productos_vendidos': int(lineas.stop - lineas.start),
+            'clientes_unicos': clientes_unicos
+        }
+
+    def get_clientes_datos(self, fecha_inicio, fecha_fin) -> list:
+        """Como DatabaseService.get_clientes_datos (todos los clientes, mayor gasto primero)"""
+        d = self._datos
+        corte = self._corte(d.ped_fecha, fecha_inicio, fecha_fin)
+        cliente = d.ped_cliente[corte]
+        n = len(d.cliente_ci)
+
+        pedidos = np.bincount(cliente, minlength=n)
+        gastado = np.bincount(cliente, weights=d.ped_total[corte], minlength=n)
+        # Última compra: primera aparición recorriendo el corte (ordenado por fecha) al revés
+        ultima = np.full(n, -1, dtype=np.int64)
+        codigos, posiciones = np.unique(cliente[::-1], return_index=True)
+        ultima[codigos] = d.ped_fecha[corte][::-1][posiciones]
+
+        activos = np.flatnonzero(d.cliente_activo)
+        con_pedidos = activos[pedidos[activos] > 0]
+        orden = np.concatenate([
+            con_pedidos[np.argsort(-gastado[con_pedidos], kind='stable')],
+            activos[pedidos[activos] == 0]
+        ])
+        return [
+            {
+                'ci': d.cliente_ci[i],
+                'nombre': d.cliente_nombre[i],
+                'total_pedidos': int(pedidos[i]),
+                'total_gastado': _decimal(gastado[i]) if pedidos[i] else None,
+                'ticket_promedio': _promedio(gastado[i], int(pedidos[i])) if pedidos[i] else None,
+                'ultima_compra': _fecha(ultima[i]) if pedidos[i] else None
+            }
+            for i in orden
+        ]
+
+    def get_resumen_clientes(self) -> dict:
+        """Como DatabaseService.get_resumen_clientes"""
+        return {'cantidad_clientes': int(np.count_nonzero(self._datos.cliente_activo))}
+
+    def estadisticas(self) -> dict:
+        """Tamaño del cubo en filas y bytes"""
+        d = self._datos
+        if d is None:
+            return {'cargado': False}
+        columnas = [valor for valor in vars(d).values() if isinstance(valor, np.ndarray)]
+        return {
+            'cargado': True,
+            'pedidos': len(d.ped_id),
+            'lineas': len(d.lin_pedido),
+            'clientes': len(d.cliente_ci),
+            'productos': len(d.nombres_producto),
+            'categorias': len(d.nombres_categoria),
+            'ultimo_id': d.ultimo_id,
+            'desde': _fecha(d.ped_fecha[0]).isoformat() if len(d.ped_fecha) else None,
+            'hasta': _fecha(d.ped_fecha[-1]).isoformat() if len(d.ped_fecha) else None,
+            'bytes': int(sum(columna.nbytes for columna in columnas))
+        }
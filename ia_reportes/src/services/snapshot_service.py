@@ -0,0 +1,374 @@
+import os
+import glob
+import threading
+import time
+from datetime import date, timedelta
+import logging
+from src.config.settings import SNAPSHOTS_DIR, SNAPSHOTS_DIAS_CIERRE, FECHA_INICIO_OPERACIONES
+from src.services.database_service import (
+    QUERY_VENTAS_DATA, QUERY_VENTAS_LINEAS, QUERY_PRODUCCION_DATOS, QUERY_COMPRAS_DATOS,
+    QUERY_RESUMEN_PRODUCCION, QUERY_RESUMEN_COMPRAS
+)
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:
+    # Dependencia opcional: sin pyarrow no hay snapshots y todo se consulta en la BD
+    pa = pc = None
+
+logger = logging.getLogger(__name__)
+
+# dataset -> (query sobre [fecha_inicio, fecha_fin], nombre de la query, columna fecha, más nuevas primero)
+DATASETS = {
+    'ventas': (QUERY_VENTAS_DATA, 'ventas_data', 'fecha_pedido', True),
+    'ventas_lineas': (QUERY_VENTAS_LINEAS, 'ventas_lineas', 'fecha_pedido', False),
+    'produccion': (QUERY_PRODUCCION_DATOS, 'produccion_datos', 'fecha', True),
+    'compras': (QUERY_COMPRAS_DATOS, 'compras_datos', 'fecha_pedido', True)
+}
+
+def _a_fecha(valor) -> date:
+    """date o 'YYYY-MM-DD' como date"""
+    if isinstance(valor, date):
+        return date(valor.year, valor.month, valor.day)
+    return date.fromisoformat(str(valor)[:10])
+
+def _mes(fecha: date) -> date:
+    return fecha.replace(day=1)
+
+def _fin_mes(mes: date) -> date:
+    return (mes.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+
+def _meses(desde: date, hasta: date):
+    """Primer día de cada mes entre desde y hasta (inclusive)"""
+    mes = _mes(desde)
+    while mes <= hasta:
+        yield mes
+        mes = _fin_mes(mes) + timedelta(days=1)
+
+class SnapshotService:
+    """
+    Snapshots inmutables por mes cerrado en archivos Arrow IPC (outputs/snapshots)
+
+    Cada dataset se guarda como <dataset>/mes=YYYY-MM.arrow con las mismas filas que
+    su query. Las lecturas abren los archivos con memory map (sin copiar los buffers)
+    y solo consultan la BD para los días sin snapshot (normalmente el mes en curso).
+    Si un mes cerrado se corrige, hay que regenerarlo con generar(forzar=True).
+    """
+
+    def __init__(self, db_service, directorio: str = SNAPSHOTS_DIR, dias_cierre: int = SNAPSHOTS_DIAS_CIERRE):
+        self.db = db_service
+        self.directorio = directorio
+        self.dias_cierre = dias_cierre
+        self._lock = threading.Lock()
+        # (dataset, mes) -> pa.Table sobre el memory map del archivo
+        self._tablas = {}
+        self._hilo = None
+        self._detener = threading.Event()
+        self.ultimo_resultado = None
+        if pa is None:
+            logger.warning("pyarrow no está instalado: los reportes históricos se consultan en la BD")
+
+    @property
+    def disponible(self) -> bool:
+        return pa is not None
+
+    def _ruta(self, dataset: str, mes: date) -> str:
+        return os.path.join(self.directorio, dataset, f"mes={mes:%Y-%m}.arrow")
+
+    def ultimo_mes_cerrado(self, hoy: date = None) -> date:
+        """Último mes que ya no cambia: terminó hace al menos `dias_cierre` días"""
+        hoy = hoy or date.today()
+        return _mes(_mes(hoy - timedelta(days=self.dias_cierre)) - timedelta(days=1))
+
+    # ===== GENERACIÓN =====
+    def generar(self, desde=None, hasta=None, forzar: bool = False) -> dict:
+        """Escribe los snapshots faltantes de los meses cerrados (con forzar=True los reescribe)"""
+        if pa is None:
+            raise RuntimeError("pyarrow no está instalado")
+
+        with self._lock:
+            inicio = time.monotonic()
+            cerrado = self.ultimo_mes_cerrado()
+            hasta = min(_mes(_a_fecha(hasta)), cerrado) if hasta else cerrado
+            escritos = []
+            try:
+                for mes in _meses(_a_fecha(desde or FECHA_INICIO_OPERACIONES), hasta):
+                    for dataset, (query, nombre, _, _) in DATASETS.items():
+                        ruta = self._ruta(dataset, mes)
+                        if os.path.exists(ruta) and not forzar:
+                            continue
+                        filas = self.db.execute_query(
+                            query, (mes, _fin_mes(mes)), usar_cache=False, nombre=f'snapshot_{nombre}'
+                        )
+                        self._escribir(ruta, pa.Table.from_pylist(filas))
+                        self._tablas.pop((dataset, mes), None)
+                        escritos.append(f"{dataset}/{mes:%Y-%m}")
+            except Exception as e:
+                logger.error(f"Error generando snapshots: {str(e)}")
+                raise
+
+            self.ultimo_resultado = {
+                'escritos': len(escritos),
+                'ultimo_mes_cerrado': f"{cerrado:%Y-%m}",
+                'duracion_s': round(time.monotonic() - inicio, 3)
+            }
+            if escritos:
+                logger.info(f"Snapshots generados: {escritos[0]} .. {escritos[-1]} ({self.ultimo_resultado})")
+            return self.ultimo_resultado
+
+    @staticmethod
+    def _escribir(ruta: str, tabla):
+        """Escribe el archivo Arrow IPC sin comprimir (para poder mapearlo) y lo publica con rename atómico"""
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        # Nombre por proceso: dos procesos generando el mismo mes no comparten el temporal
+        temporal = f"{ruta}.{os.getpid()}.tmp"
+        with pa.OSFile(temporal, 'wb') as archivo:
+            with pa.ipc.new_file(archivo, tabla.schema) as escritor:
+                escritor.write_table(tabla)
+        os.replace(temporal, ruta)
+
+    def iniciar_generacion_periodica(self, intervalo_segundos: float):
+        """Genera los snapshots faltantes en un hilo daemon y repite cada `intervalo_segundos` (0 = una vez)"""
+        if pa is None or (self._hilo and self._hilo.is_alive()):
+            return
+
+        def _ciclo():
+            while True:
+                try:
+                    self.generar()
+                except Exception:
+                    # Ya registrado en generar(); se reintenta en el próximo ciclo
+                    pass
+                if intervalo_segundos <= 0 or self._detener.wait(intervalo_segundos):
+                    return
+
+        self._detener.clear()
+        self._hilo = threading.Thread(target=_ciclo, name='snapshots', daemon=True)
+        self._hilo.start()
+        logger.info(f"Generación periódica de snapshots cada {intervalo_segundos}s")
+
+    def detener(self):
+        """Detiene el hilo de generación periódica"""
+        self._detener.set()
+
+    def estadisticas(self) -> dict:
+        """Meses y tamaño en disco de cada dataset"""
+        datasets = {}
+        for dataset in DATASETS:
+            archivos = sorted(glob.glob(os.path.join(self.directorio, dataset, 'mes=*.arrow')))
+            meses = [os.path.basename(archivo)[4:11] for archivo in archivos]
+            datasets[dataset] = {
+                'meses': len(meses),
+                'desde': meses[0] if meses else None,
+                'hasta': meses[-1] if meses else None,
+                'bytes': sum(os.path.getsize(archivo) for archivo in archivos)
+            }
+        return {
+            'disponible': self.disponible,
+            'ultimo_mes_cerrado': f"{self.ultimo_mes_cerrado():%Y-%m}",
+            'meses_abiertos_en_memoria': len(self._tablas),
+            'datasets': datasets,
+            'ultimo_resultado': self.ultimo_resultado
+        }
+
+    # ===== LECTURA =====
+    def _snapshot(self, dataset: str, mes: date):
+        """Tabla del snapshot (memory map, cacheada) o None si el mes no tiene archivo"""
+        tabla = self._tablas.get((dataset, mes))
+        if tabla is None:
+            ruta = self._ruta(dataset, mes)
+            if not os.path.exists(ruta):
+                return None
+            tabla = pa.ipc.open_file(pa.memory_map(ruta)).read_all()
+            self._tablas[(dataset, mes)] = tabla
+        return tabla
+
+    def _piezas(self, dataset: str, fecha_inicio, fecha_fin) -> list:
+        """
+        Partes del rango en el orden de la query: ('snapshot', tabla) o ('sql', (desde, hasta))
+
+        Los meses con snapshot se recortan al rango; los días sin snapshot contiguos
+        se agrupan en un solo rango para consultar la BD una vez.
+        """
+        fecha_inicio, fecha_fin = _a_fecha(fecha_inicio), _a_fecha(fecha_fin)
+        if pa is None:
+            return [('sql', (fecha_inicio, fecha_fin))]
+
+        columna, descendente = DATASETS[dataset][2], DATASETS[dataset][3]
+        piezas = []
+        for mes in _meses(fecha_inicio, fecha_fin):
+            desde, hasta = max(mes, fecha_inicio), min(_fin_mes(mes), fecha_fin)
+            tabla = self._snapshot(dataset, mes)
+            if tabla is None:
+                if piezas and piezas[-1][0] == 'sql':
+                    piezas[-1] = ('sql', (piezas[-1][1][0], hasta))
+                else:
+                    piezas.append(('sql', (desde, hasta)))
+                continue
+            if tabla.num_rows and (desde > mes or hasta < _fin_mes(mes)):
+                fechas = tabla[columna]
+                tabla = tabla.filter(pc.and_(
+                    pc.greater_equal(fechas, pa.scalar(desde, fechas.type)),
+                    pc.less_equal(fechas, pa.scalar(hasta, fechas.type))
+                ))
+            piezas.append(('snapshot', tabla))
+        return piezas[::-1] if descendente else piezas
+
+    @staticmethod
+    def _con_snapshots(piezas: list) -> bool:
+        return any(origen == 'snapshot' for origen, _ in piezas)
+
+    def _filas(self, dataset: str, fecha_inicio, fecha_fin) -> list:
+        """Filas del rango como las retorna la query (dicts, en el mismo orden)"""
+        query, nombre = DATASETS[dataset][:2]
+        filas = []
+        for origen, valor in self._piezas(dataset, fecha_inicio, fecha_fin):
+            filas.extend(valor.to_pylist() if origen == 'snapshot' else self.db.execute_query(query, valor, nombre=nombre))
+        return filas
+
+    def _tabla(self, dataset: str, piezas: list):
+        """Una sola tabla Arrow con todas las piezas (None si no hay filas)"""
+        query, nombre = DATASETS[dataset][:2]
+        tablas = []
+        for origen, valor in piezas:
+            if origen == 'sql':
+                valor = pa.Table.from_pylist(self.db.execute_query(query, valor, nombre=nombre))
+            if valor.num_rows:
+                tablas.append(valor)
+        if not tablas:
+            return None
+        # Un mes con todos los valores NULL o decimales más chicos infiere otro tipo
+        return pa.concat_tables(tablas, promote_options='permissive')
+
+    def get_ventas_data(self, fecha_inicio, fecha_fin) -> list:
+        """Como DatabaseService.get_ventas_data"""
+        return self._filas('ventas', fecha_inicio, fecha_fin)
+
+    def get_produccion_datos(self, fecha_inicio, fecha_fin) -> list:
+        """Como DatabaseService.get_produccion_datos"""
+        return self._filas('produccion', fecha_inicio, fecha_fin)
+
+    def get_compras_datos(self, fecha_inicio, fecha_fin) -> list:
+        """Como DatabaseService.get_compras_datos"""
+        return self._filas('compras', fecha_inicio, fecha_fin)
+
+    def get_ventas_por_categoria(self, fecha_inicio, fecha_fin) -> list:
+        """Como DatabaseService.get_ventas_por_categoria"""
+        piezas = self._piezas('ventas_lineas', fecha_inicio, fecha_fin)
+        if not self._con_snapshots(piezas):
+            return self.db.get_ventas_por_categoria(fecha_inicio, fecha_fin)
+
+        tabla = self._tabla('ventas_lineas', piezas)
+        if tabla is None:
+            return []
+        tabla = tabla.filter(pc.is_valid(tabla['categoria']))
+        grupos = tabla.group_by('categoria').aggregate([
+            ('cantidad', 'sum'), ('total', 'sum'), ('id_pedido', 'count_distinct')
+        ])
+        resultado = [
+            {
+                'categoria': fila['categoria'],
+                'cantidad_vendida': int(fila['cantidad_sum'] or 0),
+                'total_vendido': round(float(fila['total_sum'] or 0), 2),
+                'pedidos': fila['id_pedido_count_distinct']
+            }
+            for fila in grupos.to_pylist()
+        ]
+        resultado.sort(key=lambda fila: fila['total_vendido'], reverse=True)
+        return resultado
+
+    def get_productos_mas_vendidos(self, fecha_inicio, fecha_fin, limite=10) -> list:
+        """Como DatabaseService.get_productos_mas_vendidos"""
+        piezas = self._piezas('ventas_lineas', fecha_inicio, fecha_fin)
+        if not self._con_snapshots(piezas):
+            return self.db.get_productos_mas_vendidos(fecha_inicio, fecha_fin, limite)
+
+        tabla = self._tabla('ventas_lineas', piezas)
+        if tabla is None:
+            return []
+        grupos = tabla.group_by('producto').aggregate([
+            ('cantidad', 'sum'), ('total', 'sum'), ('precio', 'sum'), ('precio', 'count')
+        ])
+        resultado = [
+            {
+                'producto': fila['producto'],
+                'cantidad': int(fila['cantidad_sum'] or 0),
+                'total_vendido': round(float(fila['total_sum'] or 0), 2),
+                'precio_promedio': float(fila['precio_sum']) / fila['precio_count'] if fila['precio_count'] else None
+            }
+            for fila in grupos.to_pylist()
+        ]
+        resultado.sort(key=lambda fila: fila['cantidad'], reverse=True)
+        return resultado[:limite]
+
+    def get_resumen_ventas(self, fecha_inicio, fecha_fin) -> dict:
+        """Como DatabaseService.get_resumen_ventas"""
+        piezas = self._piezas('ventas', fecha_inicio, fecha_fin)
+        if not self._con_snapshots(piezas):
+            return self.db.get_resumen_ventas(fecha_inicio, fecha_fin)
+
+        tabla = self._tabla('ventas', piezas)
+        if tabla is None:
+            return {
+                'total_ventas': 0,
+                'cantidad_ordenes': 0,
+                'ticket_promedio': 0,
+                'productos_vendidos': 0,
+                'clientes_unicos': 0
+            }
+
+        cliente = tabla['cliente']
+        total_ventas = float(pc.sum(tabla['total']).as_py() or 0)
+        return {
+            'total_ventas': total_ventas,
+            'cantidad_ordenes': tabla.num_rows,
+            'ticket_promedio': total_ventas / tabla.num_rows,
+            'productos_vendidos': pc.sum(tabla['cantidad_items']).as_py() or 0,
+            # Como SQL_CLIENTES_UNICOS: el NULL (pedidos sin cliente) cuenta como un valor más
+            'clientes_unicos': 1 if pa.types.is_null(cliente.type) else pc.count_distinct(cliente, mode='all').as_py()
+        }
+
+    def _sumar(self, dataset: str, fecha_inicio, fecha_fin, resumir_tabla, query: str, nombre: str) -> dict:
+        """
+        Suma por clave los resúmenes de cada pieza del rango: `resumir_tabla(tabla)` en los
+        snapshots y `query` (con las mismas claves) en la BD para los días sin snapshot
+        """
+        totales = {}
+        for origen, valor in self._piezas(dataset, fecha_inicio, fecha_fin):
+            parcial = resumir_tabla(valor) if origen == 'snapshot' else self.db.execute_query(query, valor, nombre=nombre)[0]
+            for clave, cantidad in parcial.items():
+                totales[clave] = totales.get(clave, 0) + (cantidad or 0)
+        return totales
+
+    def get_resumen_produccion(self, fecha_inicio, fecha_fin) -> dict:
+        """Como DatabaseService.get_resumen_produccion"""
+        totales = self._sumar(
+            'produccion', fecha_inicio, fecha_fin,
+            lambda tabla: {
+                'total_produccion': tabla.num_rows,
+                'produccion_exitosa': pc.sum(tabla['terminado']).as_py() if tabla.num_rows else 0
+            },
+            QUERY_RESUMEN_PRODUCCION, 'resumen_produccion'
+        )
+        return {
+            'total_produccion': totales.get('total_produccion', 0),
+            'produccion_exitosa': totales.get('produccion_exitosa', 0)
+        }
+
+    def get_resumen_compras(self, fecha_inicio, fecha_fin) -> dict:
+        """Como DatabaseService.get_resumen_compras"""
+        # Los totales de los snapshots y de la BD son Decimal: la suma es exacta hasta el float final
+        totales = self._sumar(
+            'compras', fecha_inicio, fecha_fin,
+            lambda tabla: {
+                'cantidad_compras': tabla.num_rows,
+                'total_compras': pc.sum(tabla['total_compra']).as_py() if tabla.num_rows else 0
+            },
+            QUERY_RESUMEN_COMPRAS, 'resumen_compras'
+        )
+        cantidad = totales.get('cantidad_compras', 0)
+        return {
+            'total_compras': float(totales.get('total_compras', 0)) if cantidad else 0,
+            'cantidad_compras': cantidad
+        }
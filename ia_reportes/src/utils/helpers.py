@@ -1,6 +1,10 @@
 import logging
 import json
-from datetime import datetime
+import base64
+from datetime import date, datetime
+from decimal import Decimal
+import numpy as np
+import pandas as pd
 from src.config.settings import REPORTS_LOGS_DIR
 
 def configurar_logging():
@@ -58,6 +62,85 @@ def calcular_variacion_porcentual(actual: float, anterior: float) -> float:
         return 0
     return ((actual - anterior) / anterior) * 100
 
+def contar_filas(datos) -> int:
+    """Filas de un resultado en cualquier forma: lista de dicts, columnas numpy o DataFrame"""
+    if datos is None:
+        return 0
+    if isinstance(datos, dict):
+        return len(next(iter(datos.values()), ()))
+    return len(datos)
+
+def resumir_ventas(ventas) -> dict:
+    """
+    Métricas de resumen de VENTAS en una sola pasada
+    
+    Acepta cualquier iterable de filas de get_ventas_data (lista o el iterador de
+    DatabaseService.iterar_filas), por lo que no necesita tener todas en memoria.
+    También acepta las columnas de get_ventas_columnas o un DataFrame.
+    """
+    if isinstance(ventas, (dict, pd.DataFrame)):
+        return _resumir_ventas_columnas(ventas)
+    
+    # Los totales (Decimal) se suman exactos y se pasan a float al final, como SUM en SQL
+    total_ventas = Decimal(0)
+    cantidad_ordenes = 0
+    productos_vendidos = 0
+    clientes = set()
+    
+    for venta in ventas:
+        total_ventas += Decimal(venta.get('total') or 0)
+        cantidad_ordenes += 1
+        productos_vendidos += int(venta.get('cantidad_items', 0))
+        clientes.add(str(venta.get('cliente', '')))
+    
+    if not cantidad_ordenes:
+        return {
+            'total_ventas': 0,
+            'cantidad_ordenes': 0,
+            'ticket_promedio': 0,
+            'productos_vendidos': 0,
+            'clientes_unicos': 0
+        }
+    
+    total_ventas = float(total_ventas)
+    return {
+        'total_ventas': total_ventas,
+        'cantidad_ordenes': cantidad_ordenes,
+        'ticket_promedio': total_ventas / cantidad_ordenes,
+        'productos_vendidos': productos_vendidos,
+        'clientes_unicos': len(clientes)
+    }
+
+def _resumir_ventas_columnas(ventas) -> dict:
+    """resumir_ventas vectorizado sobre columnas (la suma en float64 puede diferir en el último bit)"""
+    total = np.asarray(ventas['total'], dtype='float64')
+    cantidad_ordenes = len(total)
+    if not cantidad_ordenes:
+        return resumir_ventas([])
+    
+    total_ventas = float(total.sum())
+    return {
+        'total_ventas': total_ventas,
+        'cantidad_ordenes': cantidad_ordenes,
+        'ticket_promedio': total_ventas / cantidad_ordenes,
+        'productos_vendidos': int(np.asarray(ventas['cantidad_items']).sum()),
+        'clientes_unicos': len(pd.unique(np.asarray(ventas['cliente'], dtype=object)))
+    }
+
+def codificar_cursor(fecha, id_fila: int) -> str:
+    """Token opaco de paginación a partir de la clave (fecha, id) de la última fila"""
+    crudo = json.dumps([fecha.isoformat() if hasattr(fecha, 'isoformat') else str(fecha), int(id_fila)])
+    return base64.urlsafe_b64encode(crudo.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decodificar_cursor(token: str) -> tuple:
+    """Inverso de codificar_cursor; ValueError si el token no es válido"""
+    try:
+        crudo = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        fecha, id_fila = json.loads(crudo)
+        return date.fromisoformat(fecha), int(id_fila)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Cursor de paginación inválido: {token}") from e
+
 def agrupar_por_fecha(datos: list, clave_fecha: str = 'fecha') -> dict:
     """Agrupa datos por fecha"""
     agrupado = {}
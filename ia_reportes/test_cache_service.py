@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Pruebas de la cache de queries (TTL por período, límite en bytes, LRU e invalidación)
+
+Ejecutar: python test_cache_service.py  (o python -m pytest test_cache_service.py)
+"""
+
+from datetime import date, timedelta
+import unittest
+import time
+
+from src.services.cache_service import QueryCache
+
+HOY = date.today()
+AYER = HOY - timedelta(days=1)
+
+QUERY_PEDIDOS = "SELECT * FROM PEDIDO p WHERE p.fecha_pedido BETWEEN %s AND %s"
+QUERY_PRODUCCION = "SELECT * FROM PRODUCCION prod WHERE prod.fecha BETWEEN %s AND %s"
+QUERY_STOCK = "SELECT * FROM PRODUCTO pr JOIN CATEGORIA cat ON pr.id_categoria = cat.id"
+
+
+def _fila(n: int) -> list:
+    return [{'n': n}]
+
+
+class TestPoliticaTTL(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = QueryCache(ttl_cerrado=3600, ttl_abierto=60, ttl_notificado=1800)
+
+    def test_periodo_cerrado_usa_el_ttl_largo(self):
+        self.assertEqual(self.cache.ttl_para(AYER), 3600)
+        # Aunque sus tablas no notifiquen cambios
+        self.assertEqual(self.cache.ttl_para(AYER, frozenset({'PEDIDO'})), 3600)
+
+    def test_periodo_abierto_o_sin_fechas_usa_el_ttl_corto(self):
+        self.assertEqual(self.cache.ttl_para(HOY), 60)
+        self.assertEqual(self.cache.ttl_para(None), 60)
+        self.assertEqual(self.cache.ttl_para(HOY, frozenset({'PEDIDO'})), 60)
+
+    def test_tablas_notificadas(self):
+        self.cache.tablas_notificadas = frozenset({'PEDIDO', 'CLIENTE'})
+        self.assertEqual(self.cache.ttl_para(HOY, frozenset({'PEDIDO'})), 1800)
+        self.assertEqual(self.cache.ttl_para(None, frozenset({'PEDIDO', 'CLIENTE'})), 1800)
+        # Basta una tabla sin notificaciones para volver al TTL corto
+        self.assertEqual(self.cache.ttl_para(HOY, frozenset({'PEDIDO', 'PRODUCTO'})), 60)
+        self.assertEqual(self.cache.ttl_para(HOY, frozenset()), 60)
+
+    def test_entrada_abierta_expira(self):
+        cache = QueryCache(ttl_abierto=0.05)
+        clave = QueryCache.clave(QUERY_PEDIDOS, (AYER, HOY))
+        cache.guardar(clave, _fila(1), QUERY_PEDIDOS, (AYER, HOY))
+        self.assertEqual(cache.obtener(clave), (True, _fila(1)))
+        time.sleep(0.1)
+        self.assertEqual(cache.obtener(clave), (False, None))
+        estadisticas = cache.estadisticas()
+        self.assertEqual((estadisticas['entradas'], estadisticas['expiradas'], estadisticas['bytes']), (0, 1, 0))
+
+    def test_rango_y_tablas_de_la_query(self):
+        self.assertEqual(self.cache.rango_de((str(AYER), HOY, 10)), (AYER, HOY))
+        self.assertEqual(self.cache.rango_de({'desde': HOY, 'limite': 5}), (HOY, HOY))
+        self.assertEqual(self.cache.rango_de((10,)), (None, None))
+        query = "WITH pedidos AS (SELECT * FROM PEDIDO) SELECT * FROM pedidos JOIN cliente c ON true"
+        self.assertEqual(QueryCache.tablas_de(query), frozenset({'PEDIDO', 'CLIENTE'}))
+
+    def test_clave_ignora_espacios(self):
+        self.assertEqual(QueryCache.clave("SELECT  1\n FROM x", (1,)), QueryCache.clave("SELECT 1 FROM x", (1,)))
+        self.assertNotEqual(QueryCache.clave("SELECT 1", (1,)), QueryCache.clave("SELECT 1", ('1',)))
+
+
+class TestLimiteYLRU(unittest.TestCase):
+
+    def setUp(self):
+        self.tamano = QueryCache.estimar_bytes(_fila(1))
+        self.cache = QueryCache(max_bytes=3 * self.tamano)
+
+    def _guardar(self, n: int):
+        clave = QueryCache.clave(QUERY_STOCK, (n,))
+        self.cache.guardar(clave, _fila(n), QUERY_STOCK, (n,))
+        return clave
+
+    def test_desaloja_la_menos_usada(self):
+        claves = [self._guardar(n) for n in range(3)]
+        # Leer la primera la vuelve la más reciente: al llenarse sale la segunda
+        self.assertTrue(self.cache.obtener(claves[0])[0])
+        self._guardar(3)
+        self.assertTrue(self.cache.obtener(claves[0])[0])
+        self.assertFalse(self.cache.obtener(claves[1])[0])
+        self.assertTrue(self.cache.obtener(claves[2])[0])
+        estadisticas = self.cache.estadisticas()
+        self.assertEqual((estadisticas['entradas'], estadisticas['evictions']), (3, 1))
+        self.assertLessEqual(estadisticas['bytes'], self.cache.max_bytes)
+
+    def test_no_guarda_resultados_mas_grandes_que_la_cache(self):
+        clave = QueryCache.clave(QUERY_STOCK)
+        self.cache.guardar(clave, [{'n': n} for n in range(10)], QUERY_STOCK)
+        self.assertEqual(self.cache.obtener(clave), (False, None))
+        self.assertEqual(self.cache.estadisticas()['bytes'], 0)
+
+    def test_reemplazar_una_clave_no_duplica_bytes(self):
+        clave = self._guardar(1)
+        self._guardar(1)
+        self.assertEqual(self.cache.estadisticas()['bytes'], self.tamano)
+        self.assertTrue(self.cache.obtener(clave)[0])
+
+
+class TestInvalidacion(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = QueryCache()
+        self.entradas = {
+            'pedidos_enero': (QUERY_PEDIDOS, (date(2024, 1, 1), date(2024, 1, 31))),
+            'pedidos_marzo': (QUERY_PEDIDOS, (date(2024, 3, 1), date(2024, 3, 31))),
+            'produccion_enero': (QUERY_PRODUCCION, (date(2024, 1, 1), date(2024, 1, 31))),
+            'stock': (QUERY_STOCK, None),
+        }
+        for n, (query, params) in enumerate(self.entradas.values()):
+            self.cache.guardar(QueryCache.clave(query, params), _fila(n), query, params)
+
+    def _vigentes(self) -> set:
+        return {
+            nombre for nombre, (query, params) in self.entradas.items()
+            if self.cache.obtener(QueryCache.clave(query, params))[0]
+        }
+
+    def test_por_tabla(self):
+        self.assertEqual(self.cache.invalidar(['pedido']), 2)
+        self.assertEqual(self._vigentes(), {'produccion_enero', 'stock'})
+
+    def test_por_fechas(self):
+        # Solapa con enero; las entradas sin fechas siempre se consideran solapadas
+        self.assertEqual(self.cache.invalidar(fecha_inicio='2024-01-15', fecha_fin='2024-02-10'), 3)
+        self.assertEqual(self._vigentes(), {'pedidos_marzo'})
+
+    def test_por_tabla_y_fechas(self):
+        self.assertEqual(self.cache.invalidar(['PEDIDO'], '2024-03-31', '2024-04-30'), 1)
+        self.assertEqual(self._vigentes(), {'pedidos_enero', 'produccion_enero', 'stock'})
+
+    def test_todo(self):
+        self.assertEqual(self.cache.invalidar(), 4)
+        estadisticas = self.cache.estadisticas()
+        self.assertEqual((estadisticas['entradas'], estadisticas['bytes'], estadisticas['invalidadas']), (0, 0, 4))
+
+
+if __name__ == '__main__':
+    unittest.main()
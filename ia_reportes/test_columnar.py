@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Pruebas del modo columnar (a_columnas, a_dataframe) y de resumir_ventas sobre columnas
+
+Ejecutar: python test_columnar.py  (o python -m pytest test_columnar.py)
+"""
+
+from collections import namedtuple
+from datetime import date
+from decimal import Decimal
+import unittest
+
+import numpy as np
+
+from src.services.cache_service import QueryCache
+from src.services.columnar import (
+    a_columnas, a_dataframe, OID_ENTEROS, OID_NUMERIC, OID_DATE
+)
+from src.utils.helpers import resumir_ventas, contar_filas
+
+_Columna = namedtuple('_Columna', 'name type_code')
+
+DESCRIPCION = [_Columna('id', OID_ENTEROS[0]), _Columna('fecha_pedido', OID_DATE),
+               _Columna('cliente', 25), _Columna('cantidad_items', OID_ENTEROS[0]),
+               _Columna('total', OID_NUMERIC)]
+
+# Filas como las de get_ventas_data (el cliente puede ser NULL)
+FILAS = [
+    {'id': 1, 'fecha_pedido': date(2024, 1, 1), 'cliente': 'Ana', 'cantidad_items': 2, 'total': Decimal('3.10')},
+    {'id': 2, 'fecha_pedido': date(2024, 1, 1), 'cliente': None, 'cantidad_items': 1, 'total': Decimal('10.00')},
+    {'id': 3, 'fecha_pedido': date(2024, 1, 2), 'cliente': 'Ana', 'cantidad_items': 5, 'total': Decimal('0.20')},
+    {'id': 4, 'fecha_pedido': date(2024, 1, 3), 'cliente': 'Beto', 'cantidad_items': 3, 'total': Decimal('7.70')},
+]
+
+
+def _lotes(filas, tamano):
+    """Tuplas por lotes como las da fetchmany con los decodificadores de registrar_tipos"""
+    tuplas = [(f['id'], f['fecha_pedido'].isoformat(), f['cliente'], f['cantidad_items'], float(f['total']))
+              for f in filas]
+    return [tuplas[i:i + tamano] for i in range(0, len(tuplas), tamano)]
+
+
+class TestColumnar(unittest.TestCase):
+
+    def test_tipos_y_lotes(self):
+        columnas = a_columnas(_lotes(FILAS, 3), DESCRIPCION)
+        self.assertEqual(columnas['id'].dtype, np.int64)
+        self.assertEqual(columnas['fecha_pedido'].dtype, np.dtype('datetime64[D]'))
+        self.assertEqual(columnas['total'].dtype, np.float64)
+        self.assertEqual(columnas['cliente'].dtype, object)
+        self.assertEqual(columnas['fecha_pedido'][-1], np.datetime64('2024-01-03'))
+        self.assertEqual(contar_filas(columnas), len(FILAS))
+
+    def test_sin_filas(self):
+        columnas = a_columnas([], DESCRIPCION)
+        self.assertEqual(columnas['total'].dtype, np.float64)
+        self.assertEqual(contar_filas(columnas), 0)
+        self.assertEqual(resumir_ventas(columnas), resumir_ventas([]))
+
+    def test_resumir_ventas_igual_en_filas_columnas_y_dataframe(self):
+        columnas = a_columnas(_lotes(FILAS, 2), DESCRIPCION)
+        esperado = resumir_ventas(FILAS)
+        for datos in (columnas, a_dataframe(columnas)):
+            resumen = resumir_ventas(datos)
+            self.assertEqual(resumen.keys(), esperado.keys())
+            self.assertAlmostEqual(resumen['total_ventas'], esperado['total_ventas'])
+            self.assertAlmostEqual(resumen['ticket_promedio'], esperado['ticket_promedio'])
+            for clave in ('cantidad_ordenes', 'productos_vendidos', 'clientes_unicos'):
+                self.assertEqual(resumen[clave], esperado[clave])
+
+    def test_bytes_de_columnas_en_la_cache(self):
+        columnas = a_columnas(_lotes(FILAS, 4), DESCRIPCION)
+        self.assertEqual(QueryCache.estimar_bytes(columnas), sum(c.nbytes for c in columnas.values()))
+
+
+if __name__ == '__main__':
+    unittest.main()
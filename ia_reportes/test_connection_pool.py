@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Pruebas del pool de conexiones con conexiones falsas (sin PostgreSQL)
+
+Ejecutar: python test_connection_pool.py  (o python -m pytest test_connection_pool.py)
+"""
+
+import threading
+import unittest
+import time
+
+import psycopg2
+from psycopg2.pool import PoolError
+
+from src.services.connection_pool import ConnectionPool
+
+
+class _ConexionFalsa:
+    """Conexión con lo que usa el pool: closed, cursor() para el health check, rollback y close"""
+
+    def __init__(self):
+        self.closed = False
+        self.caida = False
+        self.falla_rollback = False
+        self.rollbacks = 0
+
+    def cursor(self):
+        conexion = self
+
+        class _Cursor:
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *args):
+                return False
+
+            def execute(self, query):
+                if conexion.caida:
+                    raise psycopg2.OperationalError("server closed the connection unexpectedly")
+
+        return _Cursor()
+
+    def rollback(self):
+        if self.falla_rollback:
+            raise psycopg2.InterfaceError("connection already closed")
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = True
+
+
+class _Pool(ConnectionPool):
+    def __init__(self, minimo: int = 0, maximo: int = 2, **kwargs):
+        super().__init__({}, minimo=minimo, maximo=maximo, **kwargs)
+        self.creadas = []
+        self.falla_al_crear = False
+
+    def _crear_conexion(self):
+        if self.falla_al_crear:
+            raise psycopg2.OperationalError("could not connect to server")
+        conexion = _ConexionFalsa()
+        self.creadas.append(conexion)
+        with self._condicion:
+            self._conexiones_creadas += 1
+        return conexion
+
+
+class TestConnectionPool(unittest.TestCase):
+
+    def test_tamano_invalido(self):
+        for minimo, maximo in ((-1, 2), (0, 0), (3, 2)):
+            with self.assertRaises(ValueError):
+                _Pool(minimo, maximo)
+
+    def test_calentar_abre_el_minimo(self):
+        pool = _Pool(minimo=2, maximo=4)
+        pool.calentar()
+        pool.calentar()
+        self.assertEqual(len(pool.creadas), 2)
+        self.assertEqual(pool.estadisticas()['libres'], 2)
+
+    def test_reutiliza_la_conexion_devuelta(self):
+        pool = _Pool()
+        conexion = pool.tomar()
+        pool.devolver(conexion)
+        # Vuelve al pool sin transacción abierta
+        self.assertEqual(conexion.rollbacks, 1)
+        self.assertIs(pool.tomar(), conexion)
+        self.assertEqual(len(pool.creadas), 1)
+
+    def test_respeta_el_maximo_y_agota_el_timeout(self):
+        pool = _Pool(maximo=2)
+        pool.tomar(), pool.tomar()
+        inicio = time.monotonic()
+        with self.assertRaises(PoolError):
+            pool.tomar(timeout=0.1)
+        self.assertGreaterEqual(time.monotonic() - inicio, 0.1)
+        with self.assertRaises(PoolError):
+            pool.tomar(timeout=0)
+        estadisticas = pool.estadisticas()
+        self.assertEqual((estadisticas['en_uso'], estadisticas['conexiones_creadas']), (2, 2))
+
+    def test_espera_hasta_que_se_devuelve_una(self):
+        pool = _Pool(maximo=1)
+        esperas = []
+        pool.on_espera = esperas.append
+        conexion = pool.tomar()
+        temporizador = threading.Timer(0.1, pool.devolver, args=(conexion,))
+        temporizador.start()
+        self.assertIs(pool.tomar(timeout=2), conexion)
+        temporizador.join()
+        self.assertGreaterEqual(esperas[-1], 0.05)
+        estadisticas = pool.estadisticas()
+        self.assertEqual((estadisticas['total_tomas'], estadisticas['total_esperas']), (2, 1))
+
+    def test_descarta_conexiones_caidas_al_tomar(self):
+        pool = _Pool()
+        cerrada, caida = pool.tomar(), pool.tomar()
+        pool.devolver(cerrada)
+        pool.devolver(caida)
+        cerrada.close()
+        caida.caida = True
+        # Cada toma descarta la libre que falla y abre una nueva en su lugar
+        nuevas = [pool.tomar(), pool.tomar()]
+        self.assertFalse(set(nuevas) & {cerrada, caida})
+        self.assertTrue(caida.closed)
+        estadisticas = pool.estadisticas()
+        self.assertEqual((estadisticas['conexiones_descartadas'], estadisticas['en_uso']), (2, 2))
+
+    def test_sin_health_check_no_consulta(self):
+        pool = _Pool(verificar_al_tomar=False)
+        conexion = pool.tomar()
+        pool.devolver(conexion)
+        conexion.caida = True
+        self.assertIs(pool.tomar(), conexion)
+
+    def test_devolver_descartando(self):
+        pool = _Pool()
+        conexion = pool.tomar()
+        pool.devolver(conexion, descartar=True)
+        self.assertTrue(conexion.closed)
+        otra = pool.tomar()
+        otra.falla_rollback = True
+        pool.devolver(otra)
+        self.assertTrue(otra.closed)
+        estadisticas = pool.estadisticas()
+        self.assertEqual((estadisticas['libres'], estadisticas['en_uso'], estadisticas['conexiones_descartadas']),
+                         (0, 0, 2))
+
+    def test_context_manager_descarta_en_error_de_conexion(self):
+        pool = _Pool()
+        with self.assertRaises(psycopg2.OperationalError):
+            with pool.conexion() as conexion:
+                raise psycopg2.OperationalError("terminating connection")
+        self.assertTrue(conexion.closed)
+        with self.assertRaises(ValueError):
+            with pool.conexion() as otra:
+                raise ValueError("error de la aplicación")
+        self.assertFalse(otra.closed)
+        self.assertEqual(pool.estadisticas()['libres'], 1)
+
+    def test_error_al_crear_libera_el_cupo(self):
+        pool = _Pool(maximo=1)
+        pool.falla_al_crear = True
+        with self.assertRaises(psycopg2.OperationalError):
+            pool.tomar()
+        pool.falla_al_crear = False
+        self.assertIsNotNone(pool.tomar(timeout=0))
+
+    def test_cerrar(self):
+        pool = _Pool(minimo=1, maximo=2)
+        pool.calentar()
+        en_uso = pool.tomar()
+        libre = pool.tomar()
+        pool.devolver(libre)
+        pool.cerrar()
+        self.assertTrue(libre.closed)
+        with self.assertRaises(PoolError):
+            pool.tomar()
+        # Las que estaban en uso se cierran al devolverse
+        pool.devolver(en_uso)
+        self.assertTrue(en_uso.closed)
+        self.assertEqual(pool.estadisticas()['libres'], 0)
+
+    def test_cerrar_despierta_a_los_que_esperan(self):
+        pool = _Pool(maximo=1)
+        pool.tomar()
+        errores = []
+
+        def esperar():
+            try:
+                pool.tomar(timeout=5)
+            except PoolError as e:
+                errores.append(e)
+
+        hilo = threading.Thread(target=esperar)
+        hilo.start()
+        time.sleep(0.05)
+        pool.cerrar()
+        hilo.join(timeout=1)
+        self.assertFalse(hilo.is_alive())
+        self.assertEqual(len(errores), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Pruebas de DatabaseService que no necesitan PostgreSQL (pool con conexiones falsas)
+
+Ejecutar: python test_database_service.py  (o python -m pytest test_database_service.py)
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import unittest
+import time
+
+from src.services.connection_pool import ConnectionPool
+from src.services.database_service import DatabaseService
+
+
+class _CursorFalso:
+    def __init__(self, conexion):
+        self.conexion = conexion
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def execute(self, query, params=None):
+        time.sleep(self.conexion.demora)
+
+    def fetchall(self):
+        return [{'conexion': id(self.conexion)}]
+
+
+class _ConexionFalsa:
+    """Lo que usan ConnectionPool y DatabaseService._cursor de una conexión psycopg2"""
+
+    def __init__(self, demora: float):
+        self.demora = demora
+        self.closed = False
+
+    def cursor(self, name=None, cursor_factory=None):
+        return _CursorFalso(self)
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+class _PoolFalso(ConnectionPool):
+    def __init__(self, maximo: int, timeout_espera: float = 1.0, demora: float = 0.05):
+        super().__init__({}, minimo=0, maximo=maximo, timeout_espera=timeout_espera, verificar_al_tomar=False)
+        self.demora = demora
+
+    def _crear_conexion(self):
+        with self._condicion:
+            self._conexiones_creadas += 1
+        return _ConexionFalsa(self.demora)
+
+
+def _servicio(pool, workers: int = 4) -> DatabaseService:
+    db = DatabaseService(pool=pool, consultas_paralelas=True, workers_paralelos=workers, usar_dimensiones=False)
+    db.cache = None
+    return db
+
+
+class TestConsultasParalelas(unittest.TestCase):
+
+    def _consulta(self, db):
+        def consulta():
+            with db._cursor() as cursor:
+                cursor.execute("SELECT 1")
+                return cursor.fetchall()[0]['conexion']
+        return consulta
+
+    def test_n_mas_uno_reportes_con_pool_de_n(self):
+        n = 3
+        pool = _PoolFalso(maximo=n, timeout_espera=1.0)
+        db = _servicio(pool)
+        consulta = self._consulta(db)
+        con_sesion = [0]
+        todos_con_sesion = threading.Event()
+        lock = threading.Lock()
+
+        def reporte():
+            # Como _ejecutar_pipeline_reporte: la sesión queda tomada durante el fan-out
+            with db.sesion():
+                with lock:
+                    con_sesion[0] += 1
+                    if con_sesion[0] == n:
+                        todos_con_sesion.set()
+                todos_con_sesion.wait(2)
+                return db.ejecutar_consultas({clave: (consulta,) for clave in 'abcd'})
+
+        inicio = time.monotonic()
+        with ThreadPoolExecutor(max_workers=n + 1) as executor:
+            futuros = [executor.submit(reporte) for _ in range(n + 1)]
+            resultados = [futuro.result() for futuro in futuros]
+        duracion = time.monotonic() - inicio
+
+        self.assertTrue(all(list(resultado) == list('abcd') for resultado in resultados))
+        # Sin esperar el timeout del pool (1 s) por workers bloqueados
+        self.assertLess(duracion, pool.timeout_espera)
+        estadisticas = pool.estadisticas()
+        self.assertEqual(estadisticas['en_uso'], 0)
+        self.assertLessEqual(estadisticas['conexiones_creadas'], n)
+        db.cerrar_pool()
+
+    def test_usa_la_conexion_del_llamador_y_paraleliza_con_pool_libre(self):
+        pool = _PoolFalso(maximo=5, demora=0.2)
+        db = _servicio(pool)
+        consulta = self._consulta(db)
+        with db.sesion() as conexion:
+            inicio = time.monotonic()
+            resultado = db.ejecutar_consultas({clave: (consulta,) for clave in 'abcd'})
+            duracion = time.monotonic() - inicio
+        self.assertIn(id(conexion), resultado.values())
+        self.assertGreater(len(set(resultado.values())), 1)
+        self.assertLess(duracion, 0.2 * 4)
+        db.cerrar_pool()
+
+    def test_workers_acotados_por_el_pool(self):
+        self.assertEqual(_servicio(_PoolFalso(maximo=3), workers=8)._workers_fanout(), 2)
+        db = _servicio(_PoolFalso(maximo=1))
+        consulta = self._consulta(db)
+        with db.sesion() as conexion:
+            resultado = db.ejecutar_consultas({'a': (consulta,), 'b': (consulta,)})
+        self.assertEqual(set(resultado.values()), {id(conexion)})
+
+    def test_propaga_el_error_y_conserva_el_orden(self):
+        db = _servicio(_PoolFalso(maximo=4))
+        consulta = self._consulta(db)
+
+        def falla():
+            raise ValueError("query inválida")
+
+        with self.assertRaises(ValueError):
+            db.ejecutar_consultas({'a': (consulta,), 'b': (falla,), 'c': (consulta,)})
+        resultado = db.ejecutar_consultas({'z': (lambda: 1,), 'a': (lambda: 2,), 'm': (lambda: 3,)})
+        self.assertEqual(list(resultado.items()), [('z', 1), ('a', 2), ('m', 3)])
+        self.assertEqual(db.pool.estadisticas()['en_uso'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
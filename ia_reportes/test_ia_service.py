@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Pruebas del cliente HTTP de IAService contra un servidor Gemini falso local
+
+Ejecutar: python test_ia_service.py  (o python -m pytest test_ia_service.py)
+"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from email.utils import formatdate
+import threading
+import unittest
+import time
+import gzip
+import json
+
+import requests
+
+from src.services.ia_service import IAService
+
+
+class _ServidorGemini(BaseHTTPRequestHandler):
+    """Responde generateContent según la cola `respuestas` del servidor: (estado, headers, cuerpo)"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        servidor = self.server
+        cuerpo = self.rfile.read(int(self.headers['Content-Length']))
+        if self.headers.get('Content-Encoding') == 'gzip':
+            cuerpo = gzip.decompress(cuerpo)
+        servidor.requests.append({
+            'path': self.path,
+            'headers': dict(self.headers),
+            'payload': json.loads(cuerpo),
+            'puerto_cliente': self.client_address[1]
+        })
+
+        estado, headers, respuesta = servidor.respuestas.pop(0) if servidor.respuestas else (200, {}, None)
+        if estado == 200 and ':streamGenerateContent' in self.path:
+            return self._responder_sse(servidor.fragmentos)
+        if respuesta is None:
+            texto = servidor.requests[-1]['payload']['contents'][0]['parts'][0]['text']
+            respuesta = {'candidates': [{'content': {'parts': [{'text': json.dumps({'analysis': texto[-20:]})}]}}]}
+        datos = json.dumps(respuesta).encode('utf-8')
+
+        self.send_response(estado)
+        for nombre, valor in headers.items():
+            self.send_header(nombre, valor)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(datos)))
+        self.end_headers()
+        self.wfile.write(datos)
+
+    def _responder_sse(self, fragmentos):
+        """Un evento SSE por fragmento, con pausa entre eventos, en chunked como la API real"""
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        eventos = [{'candidates': [{'content': {'parts': [{'text': texto}], 'role': 'model'}}]} for texto in fragmentos]
+        eventos.append({'candidates': [{'finishReason': 'STOP'}], 'usageMetadata': {'totalTokenCount': 10}})
+        for evento in eventos:
+            datos = f"data: {json.dumps(evento)}\r\n\r\n".encode('utf-8')
+            self.wfile.write(f"{len(datos):x}\r\n".encode() + datos + b"\r\n")
+            self.wfile.flush()
+            time.sleep(self.server.pausa_sse)
+        self.wfile.write(b"0\r\n\r\n")
+
+    def log_message(self, *args):
+        pass
+
+
+class TestIAServiceHTTP(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.servidor = ThreadingHTTPServer(('127.0.0.1', 0), _ServidorGemini)
+        cls.hilo = threading.Thread(target=cls.servidor.serve_forever, daemon=True)
+        cls.hilo.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.servidor.shutdown()
+        cls.servidor.server_close()
+
+    def setUp(self):
+        self.servidor.requests = []
+        self.servidor.respuestas = []
+        self.servidor.fragmentos = []
+        self.servidor.pausa_sse = 0
+        self.ia = IAService()
+        self.ia.cache = None
+        self.ia.base_url = f"http://127.0.0.1:{self.servidor.server_address[1]}/v1beta/models"
+        self.ia.backoff_base = 0.01
+        self.ia.backoff_max = 2
+        self.ia.reintentos = 3
+
+    def test_reutiliza_la_conexion(self):
+        for i in range(3):
+            self.assertIn('analysis', self.ia.generar_reporte(f"prompt {i}"))
+        self.assertEqual(len(self.servidor.requests), 3)
+        self.assertEqual(len({r['puerto_cliente'] for r in self.servidor.requests}), 1)
+        self.assertTrue(self.servidor.requests[0]['path'].endswith(f"/{self.ia.model}:generateContent"))
+
+    def test_contadores_con_hilos_concurrentes(self):
+        def generar(hilo):
+            for i in range(5):
+                self.ia.generar_reporte(f"hilo {hilo} prompt {i}")
+
+        hilos = [threading.Thread(target=generar, args=(hilo,)) for hilo in range(8)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        self.assertEqual(len(self.servidor.requests), 40)
+        self.assertEqual(self.ia.estadisticas()['llamadas_http'], 40)
+
+    def test_reintenta_503_y_429(self):
+        self.servidor.respuestas = [(503, {}, {'error': 'ocupado'}), (429, {}, {'error': 'cuota'})]
+        respuesta = self.ia.generar_reporte("reintentos")
+        self.assertIn('analysis', respuesta)
+        self.assertEqual(len(self.servidor.requests), 3)
+        self.assertEqual(self.ia.reintentos_realizados, 2)
+
+    def test_respeta_retry_after(self):
+        self.servidor.respuestas = [(429, {'Retry-After': '1'}, {'error': 'cuota'})]
+        inicio = time.monotonic()
+        self.ia.generar_reporte("retry-after")
+        self.assertGreaterEqual(time.monotonic() - inicio, 1.0)
+        self.assertEqual(len(self.servidor.requests), 2)
+
+    def test_retry_after_mayor_al_maximo_no_espera(self):
+        self.servidor.respuestas = [(429, {'Retry-After': '120'}, {'error': 'cuota'})]
+        inicio = time.monotonic()
+        with self.assertRaises(Exception):
+            self.ia.generar_reporte("retry-after largo")
+        self.assertLess(time.monotonic() - inicio, 1.0)
+        self.assertEqual(len(self.servidor.requests), 1)
+
+    def test_retry_after_como_fecha(self):
+        espera = self.ia._espera_reintento(0, formatdate(time.time() + 1, usegmt=True))
+        self.assertTrue(0 <= espera <= 1 + self.ia.backoff_base)
+        self.assertIsNone(self.ia._espera_reintento(0, formatdate(time.time() + 600, usegmt=True)))
+
+    def test_backoff_exponencial_acotado(self):
+        self.ia.backoff_base, self.ia.backoff_max = 1, 4
+        for intento in range(6):
+            self.assertLessEqual(self.ia._espera_reintento(intento), min(4, 2 ** intento))
+
+    def test_agota_reintentos(self):
+        self.servidor.respuestas = [(503, {}, {'error': 'ocupado'})] * 4
+        with self.assertRaises(Exception) as contexto:
+            self.ia.generar_reporte("siempre 503")
+        self.assertIn('503', str(contexto.exception))
+        self.assertEqual(len(self.servidor.requests), 4)
+
+    def test_no_reintenta_400(self):
+        self.servidor.respuestas = [(400, {}, {'error': 'inválido'})]
+        with self.assertRaises(Exception):
+            self.ia.generar_reporte("mal request")
+        self.assertEqual(len(self.servidor.requests), 1)
+
+    def test_comprime_el_cuerpo(self):
+        self.ia.comprimir, self.ia.comprimir_min_bytes = True, 1024
+        self.ia.generar_reporte("x" * 5000)
+        self.ia.generar_reporte("corto")
+        self.assertEqual(self.servidor.requests[0]['headers'].get('Content-Encoding'), 'gzip')
+        self.assertLess(int(self.servidor.requests[0]['headers']['Content-Length']), 5000)
+        self.assertIsNone(self.servidor.requests[1]['headers'].get('Content-Encoding'))
+
+    def test_reintenta_error_de_conexion(self):
+        self.ia.base_url = "http://127.0.0.1:9/v1beta/models"
+        self.ia.reintentos = 2
+        with self.assertRaises(requests.ConnectionError):
+            self.ia.generar_reporte("sin servidor")
+        self.assertEqual(self.ia.llamadas, 3)
+
+    def test_stream_entrega_fragmentos_antes_del_final(self):
+        self.servidor.fragmentos = ['{"analysis": "ventas ', 'subieron ñ', ' 10%", "insights": []}']
+        self.servidor.pausa_sse = 0.3
+        inicio = time.monotonic()
+        eventos = []
+        for tipo, valor in self.ia.generar_reporte_stream("stream"):
+            eventos.append((tipo, valor, time.monotonic() - inicio))
+
+        fragmentos = [valor for tipo, valor, _ in eventos if tipo == 'fragmento']
+        self.assertEqual(fragmentos, self.servidor.fragmentos)
+        self.assertLess(eventos[0][2], 0.3)
+        self.assertEqual(eventos[-1][:2], ('analisis', {'analysis': 'ventas subieron ñ 10%', 'insights': []}))
+        self.assertIn(':streamGenerateContent?alt=sse', self.servidor.requests[0]['path'])
+
+    def test_stream_reintenta_antes_de_empezar(self):
+        self.servidor.respuestas = [(503, {}, {'error': 'ocupado'})]
+        self.servidor.fragmentos = ['hola']
+        eventos = list(self.ia.generar_reporte_stream("stream 503"))
+        self.assertEqual(eventos[0], ('fragmento', 'hola'))
+        self.assertEqual(len(self.servidor.requests), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Pruebas del servicio de jobs (ejecución, cancelación, cola acotada y purga)
+
+Ejecutar: python test_job_service.py  (o python -m pytest test_job_service.py)
+"""
+
+import threading
+import unittest
+import time
+
+from src.services.job_service import (
+    JobService, ColaLlenaError, EN_COLA, EJECUTANDO, COMPLETADO, ERROR, CANCELADO
+)
+
+
+def _esperar(job, estados, timeout: float = 2.0):
+    """Espera a que el job llegue a alguno de `estados`"""
+    limite = time.monotonic() + timeout
+    while job.estado not in estados:
+        if time.monotonic() > limite:
+            raise AssertionError(f"El job quedó en {job.estado}")
+        time.sleep(0.005)
+
+
+class TestJobService(unittest.TestCase):
+
+    def setUp(self):
+        self.jobs = JobService(workers=1, max_cola=1)
+        self.liberar = threading.Event()
+
+    def tearDown(self):
+        self.liberar.set()
+        self.jobs.detener()
+
+    def _bloqueante(self, parametros, avanzar):
+        avanzar('datos', 5)
+        self.liberar.wait(2)
+        return parametros
+
+    def test_completa_con_resultado(self):
+        job = self.jobs.enviar('VENTAS', lambda parametros, avanzar: {'total': parametros['n'] * 2}, {'n': 21})
+        job.future.result(timeout=2)
+        self.assertEqual(job.estado, COMPLETADO)
+        self.assertEqual(job.progreso, 100)
+        self.assertEqual(self.jobs.obtener(job.id).a_dict()['resultado'], {'total': 42})
+        self.assertNotIn('resultado', job.a_dict(incluir_resultado=False))
+
+    def test_error(self):
+        def falla(parametros, avanzar):
+            avanzar('analisis_ia', 30)
+            raise RuntimeError("Gemini no responde")
+
+        job = self.jobs.enviar('VENTAS', falla, {})
+        job.future.result(timeout=2)
+        self.assertEqual((job.estado, job.etapa, job.error), (ERROR, 'analisis_ia', "Gemini no responde"))
+        self.assertNotIn('resultado', job.a_dict())
+        self.assertEqual(self.jobs.estadisticas()['errores'], 1)
+
+    def test_cancelar_en_cola_no_lo_ejecuta(self):
+        ejecutados = []
+        primero = self.jobs.enviar('VENTAS', self._bloqueante, {})
+        _esperar(primero, {EJECUTANDO})
+        segundo = self.jobs.enviar('VENTAS', lambda parametros, avanzar: ejecutados.append(1), {})
+        self.assertEqual(segundo.estado, EN_COLA)
+
+        self.assertIs(self.jobs.cancelar(segundo.id), segundo)
+        self.assertEqual(segundo.estado, CANCELADO)
+        self.liberar.set()
+        primero.future.result(timeout=2)
+        self.assertEqual(primero.estado, COMPLETADO)
+        self.assertEqual(ejecutados, [])
+
+    def test_cancelar_en_ejecucion_se_detiene_en_la_proxima_etapa(self):
+        etapas = []
+
+        def pipeline(parametros, avanzar):
+            for etapa in ('datos', 'analisis_ia', 'archivos'):
+                avanzar(etapa, 0)
+                etapas.append(etapa)
+                self.liberar.wait(2)
+                self.liberar.clear()
+
+        job = self.jobs.enviar('VENTAS', pipeline, {})
+        _esperar(job, {EJECUTANDO})
+        while not etapas:
+            time.sleep(0.005)
+        self.jobs.cancelar(job.id)
+        self.assertEqual(job.estado, EJECUTANDO)
+        self.liberar.set()
+        _esperar(job, {CANCELADO})
+        self.assertEqual(etapas, ['datos'])
+        self.assertEqual(self.jobs.estadisticas()['cancelados'], 1)
+
+    def test_cancelar_inexistente_o_terminado(self):
+        self.assertIsNone(self.jobs.cancelar('no-existe'))
+        job = self.jobs.enviar('VENTAS', lambda parametros, avanzar: 1, {})
+        job.future.result(timeout=2)
+        self.assertIs(self.jobs.cancelar(job.id), job)
+        self.assertEqual(job.estado, COMPLETADO)
+
+    def test_cola_llena(self):
+        primero = self.jobs.enviar('VENTAS', self._bloqueante, {})
+        _esperar(primero, {EJECUTANDO})
+        self.jobs.enviar('VENTAS', self._bloqueante, {})
+        with self.assertRaises(ColaLlenaError):
+            self.jobs.enviar('VENTAS', self._bloqueante, {})
+        estadisticas = self.jobs.estadisticas()
+        self.assertEqual((estadisticas['ejecutando'], estadisticas['en_cola'], estadisticas['rechazados']), (1, 1, 1))
+
+    def test_purga_por_cantidad_y_por_retencion(self):
+        jobs = JobService(workers=1, max_cola=10, max_terminados=2)
+        try:
+            enviados = [jobs.enviar('VENTAS', lambda parametros, avanzar: None, {}) for _ in range(4)]
+            for job in enviados:
+                job.future.result(timeout=2)
+            # Se conservan los terminados más recientes
+            self.assertIsNone(jobs.obtener(enviados[0].id))
+            self.assertIsNone(jobs.obtener(enviados[1].id))
+            self.assertIsNotNone(jobs.obtener(enviados[3].id))
+            self.assertEqual(jobs.estadisticas()['retenidos'], 2)
+
+            jobs.retencion = 0
+            self.assertIsNone(jobs.obtener(enviados[3].id))
+            self.assertEqual(jobs.estadisticas()['retenidos'], 0)
+        finally:
+            jobs.detener()
+
+    def test_no_purga_los_que_no_terminaron(self):
+        self.jobs.retencion = 0
+        job = self.jobs.enviar('VENTAS', self._bloqueante, {})
+        _esperar(job, {EJECUTANDO})
+        self.assertIs(self.jobs.obtener(job.id), job)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Pruebas de la codificación compacta de datos del prompt y del reparto del presupuesto de tokens
+
+Ejecutar: python test_prompt_builder.py  (o python -m pytest test_prompt_builder.py)
+"""
+
+from datetime import date, timedelta
+from decimal import Decimal
+import unittest
+
+from src.prompts.prompt_builder import codificar_datos, construir_prompt_reporte, estimar_tokens
+
+INICIO = date(2024, 1, 1)
+
+
+def _ventas(cantidad: int) -> list:
+    return [
+        {'id': i, 'fecha_pedido': INICIO + timedelta(days=i % 365), 'cliente': f"Cliente {i % 7}",
+         'cantidad_items': i % 5 + 1, 'total': Decimal(i % 50) + Decimal('0.50')}
+        for i in range(cantidad)
+    ]
+
+
+def _productos(cantidad: int) -> list:
+    return [{'id': i, 'nombre': f"Producto {i}", 'stock': i % 30, 'stock_minimo': 5} for i in range(cantidad)]
+
+
+def _datos(ventas: int = 2000, productos: int = 2000, clientes: int = 5) -> dict:
+    return {
+        'tipo': 'VENTAS',
+        'total_ventas': 1234.5,
+        'por_categoria': [{'categoria': f"Categoría {i}", 'total_vendido': Decimal('10.25') * i} for i in range(8)],
+        'ventas': _ventas(ventas),
+        'productos': _productos(productos),
+        'clientes': [{'nombre': f"Cliente {i}", 'total_gastado': Decimal('3.5') * i} for i in range(clientes)],
+    }
+
+
+class TestCodificarDatos(unittest.TestCase):
+
+    def test_sin_presupuesto_van_todas_las_filas(self):
+        texto, estadisticas = codificar_datos(_datos(ventas=300, productos=50))
+        self.assertEqual(estadisticas['recortadas'], {})
+        self.assertIn('[ventas] 300 filas\nid,fecha_pedido,cliente,cantidad_items,total\n', texto)
+        self.assertIn('total_ventas: 1234.5', texto)
+        self.assertEqual(estadisticas['tokens'], estimar_tokens(texto))
+
+    def test_dentro_del_presupuesto_no_recorta(self):
+        datos = _datos(ventas=300, productos=50)
+        completo, _ = codificar_datos(datos)
+        texto, estadisticas = codificar_datos(datos, estimar_tokens(completo) * 2)
+        self.assertEqual(texto, completo)
+        self.assertEqual(estadisticas['recortadas'], {})
+
+    def test_reparto_del_presupuesto(self):
+        datos = _datos()
+        presupuesto = 8000
+        texto, estadisticas = codificar_datos(datos, presupuesto)
+        recortadas = estadisticas['recortadas']
+
+        # La sección chica entra completa en su parte; las grandes se recortan
+        self.assertEqual(set(recortadas), {'ventas', 'productos'})
+        self.assertIn('[clientes] 5 filas', texto)
+        # Los agregados nunca se recortan
+        self.assertIn('[por_categoria] 8 filas', texto)
+        self.assertIn('Categoría 7', texto)
+        self.assertLessEqual(estadisticas['tokens'], presupuesto * 1.01)
+        self.assertGreater(estadisticas['tokens_sin_recorte'], presupuesto)
+
+        # Partes iguales en tokens: la sección de filas más angostas manda más filas
+        self.assertGreater(recortadas['productos']['enviadas'], recortadas['ventas']['enviadas'])
+        for clave, filas in (('ventas', 2000), ('productos', 2000)):
+            self.assertEqual(recortadas[clave]['filas'], filas)
+            self.assertIn(f"[{clave}] muestra equiespaciada de {recortadas[clave]['enviadas']} de {filas} filas", texto)
+            self.assertIn(f"[{clave} - resumen de las {filas} filas]", texto)
+
+    def test_lo_que_no_usa_la_seccion_chica_queda_para_las_grandes(self):
+        _, con_chica = codificar_datos(_datos(clientes=5), 8000)
+        _, con_grande = codificar_datos(_datos(clientes=2000), 8000)
+        self.assertIn('clientes', con_grande['recortadas'])
+        self.assertGreater(con_chica['recortadas']['ventas']['enviadas'], con_grande['recortadas']['ventas']['enviadas'])
+
+    def test_muestra_equiespaciada_y_resumen_de_todas_las_filas(self):
+        datos = {'ventas': _ventas(1000)}
+        texto, estadisticas = codificar_datos(datos, 1500)
+        enviadas = estadisticas['recortadas']['ventas']['enviadas']
+        self.assertGreater(enviadas, 0)
+        bloque = texto[texto.index('[ventas] muestra'):texto.index('[ventas - resumen')]
+        muestra = bloque.splitlines()[2:]
+        self.assertEqual(len(muestra), enviadas)
+        ids = [int(linea.split(',')[0]) for linea in muestra]
+        # Cubre todo el período, no solo las primeras filas
+        self.assertEqual(ids[0], 0)
+        self.assertGreater(ids[-1], 1000 - 1000 / enviadas - 1)
+        suma = sum(float(fila['total']) for fila in datos['ventas'])
+        self.assertIn(f"total: suma={suma:.4f}".rstrip('0').rstrip('.'), texto)
+        self.assertIn('fecha_pedido: 2024-01-01 a 2024-12-30', texto)
+        self.assertIn('cliente: 7 distintos', texto)
+        # Los identificadores no se resumen
+        self.assertNotIn('\nid:', texto)
+
+    def test_agregados_sobre_el_presupuesto(self):
+        datos = {'por_categoria': [{'categoria': f"Categoría {i}", 'total': i} for i in range(500)], 'ventas': _ventas(100)}
+        with self.assertLogs('src.prompts.prompt_builder', level='WARNING'):
+            texto, estadisticas = codificar_datos(datos, 50)
+        self.assertIn('[por_categoria] 500 filas', texto)
+        self.assertEqual(estadisticas['recortadas']['ventas']['enviadas'], 0)
+
+    def test_construir_prompt(self):
+        datos = {'tipo': 'VENTAS', 'por_categoria': []}
+        self.assertIn('Analiza:\nDatos (tablas en CSV con encabezado):\ntipo: VENTAS\npor_categoria: sin datos',
+                      construir_prompt_reporte('Analiza:\n{datos}', datos))
+        self.assertTrue(construir_prompt_reporte('Sin marcador', datos).startswith('Sin marcador\n\nDatos'))
+
+
+if __name__ == '__main__':
+    unittest.main()
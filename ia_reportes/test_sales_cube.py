@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Pruebas de la actualización del cubo de ventas contra una BD falsa en memoria
+
+Ejecutar: python test_sales_cube.py  (o python -m pytest test_sales_cube.py)
+"""
+
+from contextlib import contextmanager
+from datetime import date, timedelta
+from decimal import Decimal
+import unittest
+
+import numpy as np
+
+from src.services.sales_cube import (
+    CuboVentas, QUERY_CUBO_TOPE, QUERY_CUBO_PEDIDOS, QUERY_CUBO_LINEAS, QUERY_CUBO_CLIENTES,
+    QUERY_CUBO_PRODUCTOS, _promedio
+)
+
+HOY = date.today()
+
+
+class _BDFalsa:
+    """Tablas en memoria que responden las queries del cubo como lo haría PostgreSQL"""
+
+    def __init__(self):
+        # id -> (fecha_pedido, total, ci_cliente); solo los pedidos ya confirmados
+        self.pedidos = {}
+        # [id_pedido, id_producto, cantidad, precio, total]
+        self.lineas = []
+        self.clientes = {'100': 'Ana', '200': 'Beto'}
+        self.productos = {1: ('Pan', 'Panes'), 2: ('Torta', 'Tortas')}
+
+    def pedido(self, id_pedido: int, fecha: date, ci: str = '100'):
+        """Pedido vacío, como lo crea el backend antes de agregar las líneas"""
+        self.pedidos[id_pedido] = (fecha, 0.0, ci)
+
+    def linea(self, id_pedido: int, id_producto: int, cantidad: int, precio: str):
+        total = float(Decimal(precio) * cantidad)
+        self.lineas.append([id_pedido, id_producto, cantidad, float(precio), total])
+        fecha, acumulado, ci = self.pedidos[id_pedido]
+        self.pedidos[id_pedido] = (fecha, round(acumulado + total, 2), ci)
+
+    @contextmanager
+    def sesion(self):
+        yield
+
+    def execute_query(self, query, params=None, usar_cache=True, nombre=None):
+        assert query == QUERY_CUBO_TOPE
+        return [{'tope': max(self.pedidos, default=0)}]
+
+    def execute_columnar(self, query, params=None, nombre=None):
+        if query == QUERY_CUBO_CLIENTES:
+            return {'ci': np.array(list(self.clientes), dtype=object),
+                    'nombre': np.array(list(self.clientes.values()), dtype=object)}
+        if query == QUERY_CUBO_PRODUCTOS:
+            return {'id': np.array(list(self.productos), dtype=np.int64),
+                    'nombre': np.array([p[0] for p in self.productos.values()], dtype=object),
+                    'categoria': np.array([p[1] for p in self.productos.values()], dtype=object)}
+
+        tope, desde, ventana, dias = params
+        incluidos = {
+            id_pedido for id_pedido, (fecha, _, _) in self.pedidos.items()
+            if id_pedido <= tope and (id_pedido > desde or fecha >= ventana or fecha in dias)
+        }
+        if query == QUERY_CUBO_PEDIDOS:
+            filas = sorted((self.pedidos[i][0], i, self.pedidos[i][1], self.pedidos[i][2]) for i in incluidos)
+            return {'id': np.array([f[1] for f in filas], dtype=np.int64),
+                    'fecha_pedido': np.array([f[0] for f in filas], dtype='datetime64[D]'),
+                    'total': np.array([f[2] for f in filas], dtype=np.float64),
+                    'ci_cliente': np.array([f[3] for f in filas], dtype=object)}
+        assert query == QUERY_CUBO_LINEAS
+        filas = sorted(
+            (self.pedidos[linea[0]][0], linea[0], *linea[1:]) for linea in self.lineas if linea[0] in incluidos
+        )
+        return {'id_pedido': np.array([f[1] for f in filas], dtype=np.int64),
+                'fecha_pedido': np.array([f[0] for f in filas], dtype='datetime64[D]'),
+                'id_producto': np.array([f[2] for f in filas], dtype=np.int64),
+                'cantidad': np.array([f[3] for f in filas], dtype=np.int64),
+                'precio': np.array([f[4] for f in filas], dtype=np.float64),
+                'total': np.array([f[5] for f in filas], dtype=np.float64)}
+
+
+class TestActualizacionCubo(unittest.TestCase):
+
+    def setUp(self):
+        self.bd = _BDFalsa()
+        self.bd.pedido(1, HOY - timedelta(days=40))
+        self.bd.linea(1, 1, 2, '1.50')
+        self.bd.pedido(2, HOY - timedelta(days=1), '200')
+        self.bd.linea(2, 2, 1, '10.00')
+        self.cubo = CuboVentas(self.bd, ventana_dias=7)
+        self.cubo.actualizar()
+
+    def _consultas(self, cubo) -> dict:
+        desde, hasta = HOY - timedelta(days=60), HOY
+        return {
+            'categorias': cubo.get_ventas_por_categoria(desde, hasta),
+            'productos': cubo.get_productos_mas_vendidos(desde, hasta),
+            'resumen': cubo.get_resumen_ventas(desde, hasta),
+            'clientes': cubo.get_clientes_datos(desde, hasta)
+        }
+
+    def assertIgualARecargar(self):
+        """El cubo actualizado da lo mismo que uno cargado de cero"""
+        nuevo = CuboVentas(self.bd)
+        nuevo.actualizar()
+        self.assertEqual(self._consultas(self.cubo), self._consultas(nuevo))
+
+    def test_linea_agregada_despues_de_cargar_el_pedido(self):
+        self.bd.pedido(3, HOY)
+        self.cubo.actualizar()
+        self.assertEqual(self.cubo.get_resumen_ventas(HOY, HOY)['productos_vendidos'], 0)
+
+        # El backend agrega las líneas en requests posteriores, ya cargado el pedido
+        self.bd.linea(3, 1, 4, '1.50')
+        self.bd.linea(3, 2, 1, '10.00')
+        self.cubo.actualizar()
+
+        resumen = self.cubo.get_resumen_ventas(HOY, HOY)
+        self.assertEqual(resumen['productos_vendidos'], 2)
+        self.assertEqual(resumen['total_ventas'], 16.0)
+        self.assertEqual(
+            {fila['producto']: fila['cantidad'] for fila in self.cubo.get_productos_mas_vendidos(HOY, HOY)},
+            {'Pan': 4, 'Torta': 1}
+        )
+        self.assertIgualARecargar()
+
+    def test_linea_borrada_y_editada_en_la_ventana(self):
+        self.bd.linea(2, 1, 3, '1.50')
+        self.cubo.actualizar()
+        del self.bd.lineas[1]
+        self.bd.lineas[-1][2:] = [5, 1.5, 7.5]
+        self.bd.pedidos[2] = (HOY - timedelta(days=1), 7.5, '200')
+        self.cubo.actualizar()
+        self.assertIgualARecargar()
+
+    def test_id_confirmado_fuera_de_orden(self):
+        # El 4 se confirma antes que el 3: la actualización avanza hasta el 4
+        self.bd.pedido(4, HOY)
+        self.bd.linea(4, 1, 1, '1.50')
+        self.cubo.actualizar()
+        self.bd.pedido(3, HOY)
+        self.bd.linea(3, 2, 2, '10.00')
+        self.cubo.actualizar()
+        self.assertEqual(self.cubo.get_resumen_ventas(HOY, HOY)['cantidad_ordenes'], 2)
+        self.assertIgualARecargar()
+
+    def test_cambio_notificado_fuera_de_la_ventana(self):
+        fecha = self.bd.pedidos[1][0]
+        self.bd.linea(1, 2, 1, '10.00')
+        self.cubo.actualizar()
+        # Fuera de la ventana y sin notificación el cambio no se ve
+        self.assertEqual(self.cubo.get_resumen_ventas(fecha, fecha)['productos_vendidos'], 1)
+
+        self.cubo.marcar_cambio(fecha.isoformat())
+        self.cubo.actualizar()
+        self.assertEqual(self.cubo.get_resumen_ventas(fecha, fecha)['productos_vendidos'], 2)
+        self.assertIgualARecargar()
+
+    def test_pedido_borrado(self):
+        self.bd.pedido(3, HOY)
+        self.bd.linea(3, 1, 1, '1.50')
+        self.cubo.actualizar()
+        del self.bd.pedidos[3]
+        self.bd.lineas = [linea for linea in self.bd.lineas if linea[0] != 3]
+        self.cubo.actualizar()
+        self.assertEqual(self.cubo.get_resumen_ventas(HOY, HOY)['cantidad_ordenes'], 0)
+        self.assertIgualARecargar()
+
+
+class TestTiposCubo(unittest.TestCase):
+
+    def test_tipos_como_la_bd(self):
+        bd = _BDFalsa()
+        bd.pedido(1, HOY)
+        for precio in ('1.00', '2.00', '2.00'):
+            bd.linea(1, 1, 1, precio)
+        cubo = CuboVentas(bd)
+        cubo.actualizar()
+
+        producto = cubo.get_productos_mas_vendidos(HOY, HOY)[0]
+        self.assertEqual(producto['total_vendido'], Decimal('5.00'))
+        self.assertEqual(str(producto['precio_promedio']), '1.6666666666666667')
+        self.assertIsInstance(producto['cantidad'], int)
+        self.assertIsInstance(cubo.get_ventas_por_categoria(HOY, HOY)[0]['total_vendido'], Decimal)
+        cliente = cubo.get_clientes_datos(HOY, HOY)[0]
+        self.assertEqual(cliente['ultima_compra'], HOY)
+        self.assertEqual(str(cliente['total_gastado']), '5.00')
+        self.assertEqual(str(cliente['ticket_promedio']), '5.0000000000000000')
+
+    def test_promedio_con_la_escala_de_postgres(self):
+        # Valores de AVG(numeric(12,2)) en PostgreSQL
+        self.assertEqual(str(_promedio(500, 3)), '1.6666666666666667')
+        self.assertEqual(str(_promedio(1234569, 3)), '4115.2300000000000000')
+        self.assertEqual(str(_promedio(4, 3)), '0.01333333333333333333')
+        self.assertEqual(str(_promedio(0, 2)), '0E-20')
+
+
+if __name__ == '__main__':
+    unittest.main()